@@ -0,0 +1,49 @@
+"""Add conversation_state table with materialized unread counters
+
+Revision ID: add_conversation_state
+Revises: add_hot_path_indexes
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_conversation_state'
+down_revision = 'add_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('conversation_state',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('peer_id', sa.Integer(), nullable=False),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['peer_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['last_message_id'], ['messages.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'peer_id')
+    )
+
+    # Заполняем из существующих сообщений (то же, что rebuild в app.crud.conversation)
+    op.execute("""
+        INSERT INTO conversation_state (user_id, peer_id, unread_count, last_message_id, updated_at)
+        SELECT user_id, peer_id, SUM(unread), MAX(id), CURRENT_TIMESTAMP
+        FROM (
+            SELECT recipient_id AS user_id, sender_id AS peer_id,
+                   CASE WHEN NOT is_read THEN 1 ELSE 0 END AS unread, id
+            FROM messages
+            UNION ALL
+            SELECT sender_id, recipient_id, 0, id
+            FROM messages
+        ) AS pairs
+        GROUP BY user_id, peer_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('conversation_state')
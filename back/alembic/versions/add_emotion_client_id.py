@@ -0,0 +1,27 @@
+"""Add client_id to emotions for offline batch sync
+
+Revision ID: add_emotion_client_id
+Revises: add_emotion_daily_rollup
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_emotion_client_id'
+down_revision = 'add_emotion_daily_rollup'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('emotions', sa.Column('client_id', sa.String(length=64), nullable=True))
+    # NULL не конфликтуют между собой - обычные записи индекс не ограничивает
+    op.create_index('uq_emotions_user_client', 'emotions', ['user_id', 'client_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_emotions_user_client', table_name='emotions')
+    op.drop_column('emotions', 'client_id')
@@ -0,0 +1,49 @@
+"""Add emotion_daily_rollup table with per-day emotion aggregates
+
+Revision ID: add_emotion_daily_rollup
+Revises: add_user_search_trgm
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_emotion_daily_rollup'
+down_revision = 'add_user_search_trgm'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('emotion_daily_rollup',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('emotion_type', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rated_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('intensity_sum', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('intensity_sumsq', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('min_intensity', sa.Integer(), nullable=True),
+        sa.Column('max_intensity', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'day', 'emotion_type')
+    )
+
+    # Заполняем из существующих записей (то же, что rebuild в app.crud.emotion_rollup)
+    op.execute("""
+        INSERT INTO emotion_daily_rollup (
+            user_id, day, emotion_type, count, rated_count,
+            intensity_sum, intensity_sumsq, min_intensity, max_intensity
+        )
+        SELECT user_id, DATE(created_at), emotion_type, COUNT(id), COUNT(intensity),
+               COALESCE(SUM(intensity), 0), COALESCE(SUM(intensity * intensity), 0),
+               MIN(intensity), MAX(intensity)
+        FROM emotions
+        GROUP BY user_id, DATE(created_at), emotion_type
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('emotion_daily_rollup')
@@ -0,0 +1,72 @@
+"""Add indexes for hot read paths
+
+Revision ID: add_hot_path_indexes
+Revises: add_messages_history_index
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_hot_path_indexes'
+down_revision = 'add_messages_history_index'
+branch_labels = None
+depends_on = None
+
+
+# Пара (sender_id, recipient_id) для get_chat_history уже покрыта
+# ix_messages_pair_timestamp из add_messages_history_index
+INDEXES = [
+    # get_unread_count, mark_messages_as_read, непрочитанные на дашборде психолога
+    dict(
+        index_name='ix_messages_unread',
+        table_name='messages',
+        columns=['recipient_id', 'sender_id'],
+        postgresql_where=sa.text('is_read = false'),
+        sqlite_where=sa.text('is_read = 0'),
+    ),
+    # get_user_emotions
+    dict(
+        index_name='ix_emotions_user_created',
+        table_name='emotions',
+        columns=['user_id', 'created_at'],
+    ),
+    # get_notifications_by_user / get_unread_count
+    dict(
+        index_name='ix_notifications_user_read_created',
+        table_name='notifications',
+        columns=['user_id', 'is_read', 'created_at'],
+    ),
+    # get_psychologist_slots
+    dict(
+        index_name='ix_sessions_psychologist_date_status',
+        table_name='sessions',
+        columns=['psychologist_id', 'scheduled_date', 'status'],
+    ),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY не блокирует запись, но не может
+    # выполняться внутри транзакции
+    with op.get_context().autocommit_block():
+        for index in INDEXES:
+            op.create_index(
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+                **index
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index in reversed(INDEXES):
+            op.drop_index(
+                index['index_name'],
+                table_name=index['table_name'],
+                postgresql_concurrently=True,
+                if_exists=True
+            )
@@ -0,0 +1,66 @@
+"""Add per-conversation message sequence numbers and receipts
+
+Revision ID: add_message_sequences
+Revises: add_conversation_state
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_message_sequences'
+down_revision = 'add_conversation_state'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('seq', sa.Integer(), nullable=True))
+    op.add_column('messages', sa.Column('delivered_at', sa.DateTime(), nullable=True))
+    op.add_column('messages', sa.Column('read_at', sa.DateTime(), nullable=True))
+    op.add_column('conversation_state',
+        sa.Column('last_seq', sa.Integer(), nullable=False, server_default='0'))
+
+    # В SQLite (dev) вместо LEAST/GREATEST - скалярные MIN/MAX от двух аргументов
+    if op.get_bind().dialect.name == 'postgresql':
+        low, high = 'LEAST(sender_id, recipient_id)', 'GREATEST(sender_id, recipient_id)'
+    else:
+        low, high = 'MIN(sender_id, recipient_id)', 'MAX(sender_id, recipient_id)'
+
+    # Нумеруем существующие сообщения в каждой переписке по времени
+    op.execute(f"""
+        UPDATE messages SET seq = numbered.seq
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY {low}, {high}
+                ORDER BY timestamp, id
+            ) AS seq
+            FROM messages
+        ) AS numbered
+        WHERE messages.id = numbered.id
+    """)
+    # Старые прочитанные сообщения считаем доставленными
+    op.execute("UPDATE messages SET delivered_at = timestamp WHERE is_read")
+
+    # Счётчик seq - в строке (меньший id, больший id)
+    # WHERE true: без него SQLite не разбирает INSERT ... SELECT ... ON CONFLICT
+    op.execute(f"""
+        INSERT INTO conversation_state (user_id, peer_id, unread_count, last_seq, updated_at)
+        SELECT {low}, {high}, 0, MAX(seq), CURRENT_TIMESTAMP
+        FROM messages
+        WHERE true
+        GROUP BY {low}, {high}
+        ON CONFLICT (user_id, peer_id) DO UPDATE SET last_seq = EXCLUDED.last_seq
+    """)
+
+    op.create_index('ix_messages_pair_seq', 'messages', ['sender_id', 'recipient_id', 'seq'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_pair_seq', table_name='messages')
+    op.drop_column('conversation_state', 'last_seq')
+    op.drop_column('messages', 'read_at')
+    op.drop_column('messages', 'delivered_at')
+    op.drop_column('messages', 'seq')
@@ -0,0 +1,29 @@
+"""Add composite index for chat history cursor pagination
+
+Revision ID: add_messages_history_index
+Revises: add_resources_table
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_messages_history_index'
+down_revision = 'add_resources_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Страница истории = диапазон по (sender_id, recipient_id) в порядке (timestamp, id)
+    op.create_index(
+        'ix_messages_pair_timestamp',
+        'messages',
+        ['sender_id', 'recipient_id', 'timestamp', 'id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_pair_timestamp', table_name='messages')
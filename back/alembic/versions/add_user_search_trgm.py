@@ -0,0 +1,56 @@
+"""Add pg_trgm GIN indexes for patient search
+
+Revision ID: add_user_search_trgm
+Revises: add_message_sequences
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_user_search_trgm'
+down_revision = 'add_message_sequences'
+branch_labels = None
+depends_on = None
+
+
+# Поля поиска на дашборде психолога (app.search). GIN с gin_trgm_ops
+# обслуживает ILIKE '%term%' и оператор схожести `%`; b-tree для них бесполезен.
+# В модели User не объявлены: create_all при старте не должен требовать pg_trgm
+COLUMNS = ['first_name', 'last_name', 'email']
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        # SQLite/dev: поиск через n-граммный индекс в памяти
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        for column in COLUMNS:
+            op.create_index(
+                f'ix_users_{column}_trgm',
+                'users',
+                [column],
+                unique=False,
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+                postgresql_concurrently=True,
+                if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        for column in reversed(COLUMNS):
+            op.drop_index(
+                f'ix_users_{column}_trgm',
+                table_name='users',
+                postgresql_concurrently=True,
+                if_exists=True
+            )
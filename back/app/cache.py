@@ -0,0 +1,168 @@
+"""
+Кэш агрегатов с явной инвалидацией при записи.
+
+Запись кэша - это ключ (например, id психолога) с набором полей: сводка,
+страницы списка и т.п. Инвалидация удаляет ключ целиком, поэтому все
+производные от одних данных значения сбрасываются одной операцией.
+TTL ограничивает устаревание значений, зависящих от времени.
+
+Бэкенды:
+- memory: LRU в памяти процесса (один воркер, dev);
+- redis: общий для всех воркеров (хэш на ключ), настройка CACHE_BACKEND.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Cache:
+    """Базовый интерфейс кэша и счётчики попаданий."""
+
+    def __init__(self, namespace: str, ttl: float):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: Any, field: str) -> Optional[Any]:
+        """Значение поля или None, если его нет в кэше."""
+        value = self._get(key, field)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: Any, field: str, value: Any):
+        """Сохранить значение поля."""
+        raise NotImplementedError
+
+    def invalidate(self, *keys: Any):
+        """Сбросить все поля указанных ключей."""
+        keys = [key for key in keys if key is not None]
+        if keys:
+            self.invalidations += len(keys)
+            self._invalidate(keys)
+
+    def _get(self, key: Any, field: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def _invalidate(self, keys: list):
+        raise NotImplementedError
+
+    def get_metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+class MemoryCache(Cache):
+    """LRU-кэш в памяти процесса с TTL на ключ."""
+
+    def __init__(self, namespace: str, ttl: float, max_entries: int = 1024):
+        super().__init__(namespace, ttl)
+        self.max_entries = max_entries
+        # key -> (истекает, {поле: значение})
+        self._entries: "OrderedDict[Any, tuple[float, dict]]" = OrderedDict()
+        # CRUD-функции выполняются в пуле потоков
+        self._lock = threading.Lock()
+
+    def _get(self, key, field):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, fields = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return fields.get(field)
+
+    def set(self, key, field, value):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                entry = (time.monotonic() + self.ttl, {})
+                self._entries[key] = entry
+            entry[1][field] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _invalidate(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def get_metrics(self) -> dict:
+        return {**super().get_metrics(), "entries": len(self._entries)}
+
+
+class RedisCache(Cache):
+    """
+    Кэш в Redis, общий для воркеров: хэш `cache:<namespace>:<key>` с TTL.
+
+    Ошибки Redis не ломают запрос - значение просто считается отсутствующим.
+    """
+
+    def __init__(self, namespace: str, ttl: float, url: str = None, client=None):
+        super().__init__(namespace, ttl)
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+        self._client = client
+        self.errors = 0
+
+    def _key(self, key) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    def _get(self, key, field):
+        try:
+            raw = self._client.hget(self._key(key), field)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis cache get failed: {e}")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, field, value):
+        try:
+            pipe = self._client.pipeline()
+            pipe.hset(self._key(key), field, json.dumps(value, default=str))
+            # TTL ставится только новому ключу: поля одной записи истекают вместе
+            pipe.expire(self._key(key), int(self.ttl), nx=True)
+            pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis cache set failed: {e}")
+
+    def _invalidate(self, keys):
+        try:
+            self._client.delete(*(self._key(key) for key in keys))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis cache invalidate failed: {e}")
+
+    def get_metrics(self) -> dict:
+        return {**super().get_metrics(), "errors": self.errors}
+
+
+def create_cache(namespace: str, ttl: float, max_entries: int = 1024) -> Cache:
+    """Создать кэш согласно настройке CACHE_BACKEND."""
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCache(namespace, ttl)
+    return MemoryCache(namespace, ttl, max_entries)
@@ -11,8 +11,51 @@ load_dotenv(env_path)
 class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "default-secret-key-change-in-production")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+    # Refresh-токен: одноразовый, при обновлении выдаётся новый (ротация)
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
+    # Потоки для синхронной работы с БД из async-обработчиков
+    DB_EXECUTOR_WORKERS: int = int(os.getenv("DB_EXECUTOR_WORKERS", "10"))
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
+    # Брокер WebSocket-сообщений: memory (один воркер) или redis (несколько воркеров)
+    CHAT_BROKER: str = os.getenv("CHAT_BROKER", "memory")
+    # Групповой коммит сообщений чата: одна транзакция на окно в несколько мс
+    CHAT_GROUP_COMMIT: bool = os.getenv("CHAT_GROUP_COMMIT", "false").lower() == "true"
+    CHAT_GROUP_COMMIT_WINDOW_MS: float = float(os.getenv("CHAT_GROUP_COMMIT_WINDOW_MS", "5"))
+    CHAT_GROUP_COMMIT_MAX_BATCH: int = int(os.getenv("CHAT_GROUP_COMMIT_MAX_BATCH", "500"))
+    # Очередь отправки на одно WebSocket-соединение и таймаут отправки (сек)
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+    WS_SEND_TIMEOUT: float = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+    # Кэш агрегатов: memory (один воркер) или redis (общий для воркеров)
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")
+    # TTL сводки активности пациентов для психолога (сек)
+    ACTIVITY_CACHE_TTL: float = float(os.getenv("ACTIVITY_CACHE_TTL", "60"))
+    # TTL когортной аналитики психолога (сек)
+    COHORT_CACHE_TTL: float = float(os.getenv("COHORT_CACHE_TTL", "300"))
+    # Детектор резкого снижения интенсивности: вес EWMA, порог в сигмах,
+    # минимум записей до первой тревоги, глубина восстановления при старте (дни)
+    ANOMALY_ALPHA: float = float(os.getenv("ANOMALY_ALPHA", "0.1"))
+    ANOMALY_SIGMAS: float = float(os.getenv("ANOMALY_SIGMAS", "3"))
+    ANOMALY_MIN_ENTRIES: int = int(os.getenv("ANOMALY_MIN_ENTRIES", "10"))
+    ANOMALY_REBUILD_DAYS: int = int(os.getenv("ANOMALY_REBUILD_DAYS", "90"))
+    # Кэш пользователя из токена: TTL (сек) и размер LRU (для CACHE_BACKEND=memory)
+    PRINCIPAL_CACHE_TTL: float = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+    PRINCIPAL_CACHE_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+    # Work factor bcrypt; хэши с другим значением пересчитываются при входе
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    # Процессы для bcrypt (0 - по числу ядер)
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+    # Фильтр Блума отозванных access-токенов: ёмкость, доля ложных срабатываний
+    # и как часто воркер дочитывает отзывы других воркеров (сек)
+    REVOCATION_FILTER_CAPACITY: int = int(os.getenv("REVOCATION_FILTER_CAPACITY", "100000"))
+    REVOCATION_FILTER_ERROR_RATE: float = float(os.getenv("REVOCATION_FILTER_ERROR_RATE", "0.001"))
+    REVOCATION_SYNC_INTERVAL: float = float(os.getenv("REVOCATION_SYNC_INTERVAL", "5"))
+    # LRU уже проверенных JWT (0 - выключен); запись живёт до exp токена
+    JWT_CACHE_SIZE: int = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+    # Доступ к метрикам воркеров (/.../metrics): заголовок X-Metrics-Token с
+    # этим значением; пустое - метрики не отдаются
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
 
 
 settings = Settings()
@@ -0,0 +1,109 @@
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.cache import create_cache
+from app.config import settings
+from app.models import Emotion, User
+from app.crud import conversation as conversation_crud
+from app.crud import user as user_crud
+
+# Сводки активности по id психолога. Сбрасываются при записи сообщений и
+# эмоций; TTL ограничивает устаревание окна "за последние 24 часа"
+activity_cache = create_cache("activity", ttl=settings.ACTIVITY_CACHE_TTL)
+
+NEW_ENTRIES_WINDOW = timedelta(days=1)
+
+# Кэшируются только первые страницы списка без поиска: иначе каждый
+# поисковый запрос или дальний offset добавлял бы поле в запись психолога
+CACHED_PAGES = 5
+DASHBOARD_SORTS = ("name", "last_seen", "entries")
+
+
+def _since() -> datetime:
+    return datetime.now() - NEW_ENTRIES_WINDOW
+
+
+def compute_summary(db: Session, psychologist_id: int) -> dict:
+    """Посчитать сводку активности пациентов психолога из БД"""
+    unread = conversation_crud.get_unread_by_peer(db, psychologist_id)
+    new_entries = dict(
+        db.query(Emotion.user_id, func.count(Emotion.id)).filter(
+            Emotion.user_id.in_(
+                db.query(User.id).filter(User.linked_psychologist_id == psychologist_id)
+            ),
+            Emotion.created_at >= _since()
+        ).group_by(Emotion.user_id).all()
+    )
+    patients = [
+        {
+            "patient_id": patient_id,
+            "unread_messages_count": unread.get(patient_id, 0),
+            "new_entries_count": new_entries.get(patient_id, 0),
+        }
+        for patient_id in sorted(set(unread) | set(new_entries))
+    ]
+    return {
+        "unread_messages_count": sum(unread.values()),
+        "new_entries_count": sum(new_entries.values()),
+        "patients_with_activity": len(patients),
+        "patients": patients,
+    }
+
+
+def get_summary(db: Session, psychologist_id: int) -> dict:
+    """Сводка активности пациентов психолога (из кэша, если есть)"""
+    summary = activity_cache.get(psychologist_id, "summary")
+    if summary is None:
+        summary = compute_summary(db, psychologist_id)
+        activity_cache.set(psychologist_id, "summary", summary)
+    return summary
+
+
+def get_dashboard_page(db: Session, psychologist_id: int, **params) -> dict:
+    """
+    Страница списка пациентов (user_crud.get_patient_dashboard) через кэш.
+
+    Страницы хранятся в той же записи, что и сводка, и сбрасываются вместе с ней.
+    Результаты поиска и страницы дальше CACHED_PAGES читаются из БД.
+    """
+    limit, offset = params.get("limit", 20), params.get("offset", 0)
+    if params.get("search") or offset >= CACHED_PAGES * limit:
+        return _load_dashboard_page(db, psychologist_id, params)
+
+    # Неизвестные значения sort/order работают как значения по умолчанию -
+    # и в ключе тоже, чтобы произвольные строки не плодили поля
+    key = dict(
+        params,
+        sort=params.get("sort") if params.get("sort") in DASHBOARD_SORTS else None,
+        order="desc" if params.get("order") == "desc" else "asc",
+    )
+    field = "patients:" + json.dumps(key, sort_keys=True)
+    page = activity_cache.get(psychologist_id, field)
+    if page is None:
+        page = _load_dashboard_page(db, psychologist_id, params)
+        activity_cache.set(psychologist_id, field, page)
+    return page
+
+
+def _load_dashboard_page(db: Session, psychologist_id: int, params: dict) -> dict:
+    rows, total = user_crud.get_patient_dashboard(db, psychologist_id, since=_since(), **params)
+    return {"patients": [dict(row._mapping) for row in rows], "total": total}
+
+
+def invalidate(*user_ids: int):
+    """
+    Сбросить сводки после записи.
+
+    Передаются все участники записи: лишний сброс для непсихолога ничего
+    не стоит, а роль так не нужно запрашивать.
+    """
+    activity_cache.invalidate(*user_ids)
+
+
+def invalidate_for_patient(db: Session, patient_id: int):
+    """Сбросить сводку психолога пациента"""
+    psychologist_id = db.query(User.linked_psychologist_id).filter(User.id == patient_id).scalar()
+    activity_cache.invalidate(psychologist_id)
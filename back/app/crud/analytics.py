@@ -0,0 +1,114 @@
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.cache import create_cache
+from app.config import settings
+from app.models import EmotionDailyRollup, User
+
+# Когортная аналитика по id психолога: только TTL, без инвалидации записью
+cohort_cache = create_cache("cohort", ttl=settings.COHORT_CACHE_TTL)
+
+
+def _nullable(values: np.ndarray) -> list:
+    """Массив float в список для JSON: NaN -> None"""
+    return [None if np.isnan(value) else round(float(value), 4) for value in values]
+
+
+def compute_cohort(db: Session, psychologist_id: int, weeks: int = 8, window: int = 4) -> dict:
+    """
+    Недельная динамика средней интенсивности по всем пациентам психолога.
+
+    Дневные агрегаты всех пациентов читаются одним запросом в столбцы
+    NumPy; недельные средние, скользящие средние за window недель,
+    изменение к прошлой неделе и ранжирование считаются векторно.
+    Ранг 1 - самое сильное снижение средней интенсивности.
+    """
+    patients = db.query(User.id, User.first_name, User.last_name).filter(
+        User.linked_psychologist_id == psychologist_id
+    ).order_by(User.id).all()
+
+    current_week = date.today() - timedelta(days=date.today().weekday())
+    first_week = current_week - timedelta(weeks=weeks - 1)
+    week_starts = [first_week + timedelta(weeks=i) for i in range(weeks)]
+
+    rows = db.execute(
+        select(
+            EmotionDailyRollup.user_id,
+            EmotionDailyRollup.day,
+            EmotionDailyRollup.count,
+            EmotionDailyRollup.rated_count,
+            EmotionDailyRollup.intensity_sum,
+        ).join(User, User.id == EmotionDailyRollup.user_id).where(
+            User.linked_psychologist_id == psychologist_id,
+            EmotionDailyRollup.day >= first_week
+        )
+    ).all()
+
+    size = len(patients) * weeks
+    entries = np.zeros(size)
+    rated = np.zeros(size)
+    totals = np.zeros(size)
+    if rows:
+        user_ids, days, counts, rated_counts, sums = (np.array(column) for column in zip(*rows))
+        patient_ids = np.array([patient.id for patient in patients])
+        # Строка матрицы - пациент (patient_ids отсортированы), столбец - неделя
+        patient_index = np.searchsorted(patient_ids, user_ids)
+        week_index = (days.astype("datetime64[D]") - np.datetime64(first_week, "D")).astype(np.int64) // 7
+        # Дни после текущей недели (часы клиента) не учитываются
+        valid = week_index < weeks
+        flat = (patient_index * weeks + week_index)[valid]
+        entries = np.bincount(flat, weights=counts[valid].astype(float), minlength=size)
+        rated = np.bincount(flat, weights=rated_counts[valid].astype(float), minlength=size)
+        totals = np.bincount(flat, weights=sums[valid].astype(float), minlength=size)
+    entries, rated, totals = (values.reshape(len(patients), weeks) for values in (entries, rated, totals))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weekly_means = totals / rated
+
+        # Скользящие суммы за window недель через кумулятивные суммы
+        def rolling(values):
+            cumulative = np.cumsum(values, axis=1)
+            shifted = np.zeros_like(cumulative)
+            shifted[:, window:] = cumulative[:, :-window]
+            return cumulative - shifted
+
+        rolling_means = rolling(totals) / rolling(rated)
+        cohort_means = totals.sum(axis=0) / rated.sum(axis=0)
+
+    deltas = weekly_means[:, -1] - weekly_means[:, -2] if weeks > 1 else np.full(len(patients), np.nan)
+    # Сначала самые сильные снижения; пациенты без данных за две недели - в конце
+    order = np.lexsort((np.arange(len(patients)), deltas, np.isnan(deltas)))
+    ranks = np.empty(len(patients), dtype=np.int64)
+    ranks[order] = np.arange(1, len(patients) + 1)
+
+    return {
+        "weeks": week_starts,
+        "window": window,
+        "cohort_weekly_means": _nullable(cohort_means),
+        "patients": [
+            {
+                "patient_id": patients[i].id,
+                "first_name": patients[i].first_name,
+                "last_name": patients[i].last_name,
+                "entries": int(entries[i].sum()),
+                "weekly_means": _nullable(weekly_means[i]),
+                "rolling_means": _nullable(rolling_means[i]),
+                "week_over_week_delta": _nullable(deltas[i:i + 1])[0],
+                "rank": int(ranks[i]) if not np.isnan(deltas[i]) else None,
+            }
+            for i in order
+        ],
+    }
+
+
+def get_cohort(db: Session, psychologist_id: int, weeks: int = 8, window: int = 4) -> dict:
+    """Когортная аналитика психолога (из кэша, если есть)"""
+    field = f"{weeks}:{window}"
+    cohort = cohort_cache.get(psychologist_id, field)
+    if cohort is None:
+        cohort = compute_cohort(db, psychologist_id, weeks, window)
+        cohort_cache.set(psychologist_id, field, cohort)
+    return cohort
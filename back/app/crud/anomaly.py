@@ -0,0 +1,131 @@
+"""
+Потоковый детектор резкого снижения интенсивности эмоций.
+
+Для каждого пациента хранится экспоненциально взвешенное среднее и
+дисперсия (EWMA) - O(1) памяти на пациента, O(1) на запись. Если новая
+оценка ниже среднего больше чем на ANOMALY_SIGMAS стандартных отклонений,
+психолог пациента получает уведомление типа EMOTION.
+
+Состояние живёт в памяти процесса и восстанавливается при старте из
+записей за последние ANOMALY_REBUILD_DAYS дней; при нескольких воркерах
+каждый видит свои записи и записи до своего старта.
+"""
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Emotion
+from app.crud import notification as notification_crud
+from app.crud import user as user_crud
+from app.schemas.notification import NotificationCreate, NotificationType
+
+# Нижняя граница стандартного отклонения: ровный ряд оценок не должен
+# давать тревогу на изменение в один балл
+MIN_STD = 1.0
+
+# Не чаще одного уведомления по пациенту за этот интервал (сек)
+ALERT_COOLDOWN = 6 * 60 * 60
+
+
+class _State:
+    __slots__ = ("mean", "var", "count", "last_alert")
+
+    def __init__(self, value: float):
+        self.mean = value
+        self.var = 0.0
+        self.count = 1
+        self.last_alert: Optional[float] = None
+
+
+class AnomalyDetector:
+    def __init__(self, alpha: float, sigmas: float, min_entries: int):
+        self.alpha = alpha
+        self.sigmas = sigmas
+        self.min_entries = min_entries
+        self._states: Dict[int, _State] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, user_id: int, intensity: Optional[int], alert: bool = True) -> Optional[tuple]:
+        """
+        Учесть оценку пациента.
+
+        Возвращает (z-оценка, среднее до этой записи), если оценка аномально
+        низкая и по пациенту можно отправлять уведомление, иначе None.
+        """
+        if intensity is None:
+            return None
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is None:
+                self._states[user_id] = _State(float(intensity))
+                return None
+
+            diff = intensity - state.mean
+            std = max(math.sqrt(state.var), MIN_STD)
+            z = diff / std
+            anomaly = (
+                alert
+                and state.count >= self.min_entries
+                and z <= -self.sigmas
+                and (state.last_alert is None or time.monotonic() - state.last_alert >= ALERT_COOLDOWN)
+            )
+
+            # Инкрементальные EWMA-среднее и дисперсия
+            increment = self.alpha * diff
+            state.mean += increment
+            state.var = (1 - self.alpha) * (state.var + diff * increment)
+            state.count += 1
+            if anomaly:
+                state.last_alert = time.monotonic()
+                return z, state.mean - increment
+        return None
+
+    def rebuild(self, db: Session) -> int:
+        """Восстановить состояние из записей emotions. Возвращает число пациентов"""
+        since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=settings.ANOMALY_REBUILD_DAYS)
+        rows = db.execute(
+            select(Emotion.user_id, Emotion.intensity).where(
+                Emotion.created_at >= since,
+                Emotion.intensity.isnot(None)
+            ).order_by(Emotion.user_id, Emotion.created_at).execution_options(yield_per=5000)
+        )
+        with self._lock:
+            self._states.clear()
+        for user_id, intensity in rows:
+            self.observe(user_id, intensity, alert=False)
+        return len(self._states)
+
+
+detector = AnomalyDetector(
+    alpha=settings.ANOMALY_ALPHA,
+    sigmas=settings.ANOMALY_SIGMAS,
+    min_entries=settings.ANOMALY_MIN_ENTRIES,
+)
+
+
+def check_emotion(db: Session, emotion: Emotion):
+    """Проверить новую запись и уведомить психолога при резком снижении"""
+    anomaly = detector.observe(emotion.user_id, emotion.intensity)
+    if anomaly is None:
+        return
+    _, mean = anomaly
+    patient = user_crud.get_user(db, emotion.user_id)
+    if patient is None or patient.linked_psychologist_id is None:
+        return
+    notification_crud.create_notification(db, NotificationCreate(
+        user_id=patient.linked_psychologist_id,
+        title="Резкое снижение настроения",
+        message=(
+            f"{patient.first_name} {patient.last_name}: интенсивность {emotion.intensity} "
+            f"при обычной {mean:.1f} ({emotion.emotion_type})"
+        ),
+        notification_type=NotificationType.EMOTION,
+        avatar_url=patient.avatar_url,
+        action_url="/psychologist/analytics",
+    ))
@@ -0,0 +1,137 @@
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.models import ConversationState, Message
+
+
+def _upsert(db: Session, user_id: int, peer_id: int, unread_delta: int, last_message_id: int):
+    """Увеличить счётчик непрочитанных и обновить последнее сообщение (без commit)"""
+    table = ConversationState.__table__
+    stmt = dialect_insert(db, table).values(
+        user_id=user_id,
+        peer_id=peer_id,
+        unread_count=unread_delta,
+        last_message_id=last_message_id,
+    )
+    # Параллельные транзакции могут закоммититься не по порядку id
+    previous_id = func.coalesce(table.c.last_message_id, 0)
+    if db.get_bind().dialect.name == "postgresql":
+        last_id = func.greatest(previous_id, last_message_id)
+    else:
+        last_id = func.max(previous_id, last_message_id)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.peer_id],
+        set_={
+            "unread_count": table.c.unread_count + unread_delta,
+            "last_message_id": last_id,
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt)
+
+
+def allocate_seq(db: Session, user1_id: int, user2_id: int, count: int = 1) -> int:
+    """
+    Выделить count последовательных seq для переписки; возвращает первый.
+
+    Upsert блокирует строку счётчика до конца транзакции, поэтому seq
+    в переписке выдаются строго по порядку коммитов.
+    """
+    low, high = sorted((user1_id, user2_id))
+    table = ConversationState.__table__
+    stmt = dialect_insert(db, table).values(
+        user_id=low, peer_id=high, unread_count=0, last_seq=count
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.peer_id],
+        set_={"last_seq": table.c.last_seq + count},
+    ).returning(table.c.last_seq)
+    last_seq = db.execute(stmt).scalar_one()
+    return last_seq - count + 1
+
+
+def record_message(db: Session, message: Message):
+    """Учесть новое сообщение в состоянии обеих сторон (в текущей транзакции, без commit)"""
+    record_messages(db, [(message.sender_id, message.recipient_id, message.id)])
+
+
+def record_messages(db: Session, messages: list[tuple[int, int, int]]):
+    """
+    Учесть пачку новых сообщений (sender_id, recipient_id, id) без commit.
+
+    Сообщения одной пары схлопываются в один upsert на каждую сторону.
+    """
+    pairs: dict[tuple[int, int], list[int]] = {}
+    for sender_id, recipient_id, message_id in messages:
+        pair = pairs.setdefault((sender_id, recipient_id), [0, 0])
+        pair[0] += 1
+        pair[1] = max(pair[1], message_id)
+    for (sender_id, recipient_id), (count, last_id) in pairs.items():
+        _upsert(db, recipient_id, sender_id, count, last_id)
+        _upsert(db, sender_id, recipient_id, 0, last_id)
+
+
+def mark_read(db: Session, user_id: int, peer_id: int, count: int):
+    """Уменьшить счётчик непрочитанных на число прочитанных сообщений (без commit)"""
+    if count <= 0:
+        return
+    db.query(ConversationState).filter(
+        ConversationState.user_id == user_id,
+        ConversationState.peer_id == peer_id
+    ).update(
+        {"unread_count": case(
+            (ConversationState.unread_count > count, ConversationState.unread_count - count),
+            else_=0
+        )},
+        synchronize_session=False
+    )
+
+
+def get_unread_total(db: Session, user_id: int) -> int:
+    """Всего непрочитанных сообщений пользователя"""
+    return db.query(func.coalesce(func.sum(ConversationState.unread_count), 0)).filter(
+        ConversationState.user_id == user_id
+    ).scalar()
+
+
+def get_unread_by_peer(db: Session, user_id: int) -> dict[int, int]:
+    """Непрочитанные по собеседникам: peer_id -> количество"""
+    rows = db.query(ConversationState.peer_id, ConversationState.unread_count).filter(
+        ConversationState.user_id == user_id,
+        ConversationState.unread_count > 0
+    ).all()
+    return {peer_id: unread for peer_id, unread in rows}
+
+
+def rebuild(db: Session) -> int:
+    """Пересобрать conversation_state из таблицы messages. Возвращает число строк"""
+    states: dict[tuple[int, int], dict] = {}
+
+    # Последнее сообщение и последний seq в каждой паре (в обе стороны)
+    last_rows = db.query(
+        Message.sender_id, Message.recipient_id, func.max(Message.id), func.max(Message.seq)
+    ).group_by(Message.sender_id, Message.recipient_id).all()
+    for sender_id, recipient_id, last_id, last_seq in last_rows:
+        for key in ((recipient_id, sender_id), (sender_id, recipient_id)):
+            state = states.setdefault(key, {"unread_count": 0, "last_message_id": None, "last_seq": 0})
+            state["last_message_id"] = max(state["last_message_id"] or 0, last_id)
+        # Счётчик seq ведётся в строке (меньший id, больший id)
+        canonical = states[tuple(sorted((sender_id, recipient_id)))]
+        canonical["last_seq"] = max(canonical["last_seq"], last_seq or 0)
+
+    # Непрочитанные: от peer к user
+    unread_rows = db.query(
+        Message.recipient_id, Message.sender_id, func.count(Message.id)
+    ).filter(Message.is_read == False).group_by(Message.recipient_id, Message.sender_id).all()
+    for recipient_id, sender_id, unread in unread_rows:
+        states[(recipient_id, sender_id)]["unread_count"] = unread
+
+    db.query(ConversationState).delete(synchronize_session=False)
+    if states:
+        db.execute(ConversationState.__table__.insert(), [
+            {"user_id": user_id, "peer_id": peer_id, **state}
+            for (user_id, peer_id), state in states.items()
+        ])
+    db.commit()
+    return len(states)
@@ -1,7 +1,18 @@
+import math
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import DateTime, cast, func, select
 from sqlalchemy.orm import Session
 
-from app.models import Emotion
+from app.database import dialect_insert
+from app.models import Emotion, EmotionDailyRollup
 from app.schemas import EmotionCreate
+from app.schemas.emotion import EmotionBatchItem
+from app.crud import activity as activity_crud
+from app.crud import anomaly as anomaly_crud
+from app.crud import emotion_rollup as rollup_crud
+from app.utils.downsample import lttb
 
 
 def create_emotion(db: Session, emotion: EmotionCreate, user_id: int):
@@ -13,13 +24,288 @@ def create_emotion(db: Session, emotion: EmotionCreate, user_id: int):
         note=emotion.note
     )
     db.add(db_emotion)
+    db.flush()
+    # Дневные агрегаты обновляются в той же транзакции
+    rollup_crud.record_emotions(db, [db_emotion])
     db.commit()
+    activity_crud.invalidate_for_patient(db, user_id)
     db.refresh(db_emotion)
+    anomaly_crud.check_emotion(db, db_emotion)
     return db_emotion
 
 
+# Допустимое опережение часов клиента
+CLIENT_CLOCK_SKEW = timedelta(minutes=5)
+
+
+def create_emotions_batch(db: Session, items: list[EmotionBatchItem], user_id: int) -> list[dict]:
+    """
+    Сохранить пачку офлайн-записей одним executemany и одним commit.
+
+    Дедупликация по (user_id, client_id): повтор синхронизации не создаёт
+    дублей, в том числе при параллельной отправке (ON CONFLICT DO NOTHING).
+    Возвращает результат для каждого элемента в порядке items.
+    """
+    now = datetime.now(timezone.utc)
+    results: dict[str, dict] = {}
+    values = []
+    for item in items:
+        if item.client_id in results:
+            continue
+        created_at = item.created_at or now
+        if created_at.tzinfo is None:
+            # Время без зоны считаем UTC
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        if created_at > now + CLIENT_CLOCK_SKEW:
+            results[item.client_id] = {
+                "client_id": item.client_id, "status": "rejected",
+                "detail": "created_at в будущем",
+            }
+            continue
+        results[item.client_id] = None
+        values.append({
+            "user_id": user_id,
+            "client_id": item.client_id,
+            "emotion_type": item.emotion_type,
+            "intensity": item.intensity,
+            "note": item.note,
+            # Храним UTC без зоны, как и остальные записи
+            "created_at": created_at.astimezone(timezone.utc).replace(tzinfo=None),
+        })
+
+    # Уже синхронизированные ранее - одним запросом по уникальному индексу
+    client_ids = [value["client_id"] for value in values]
+    existing = dict(
+        db.query(Emotion.client_id, Emotion.id).filter(
+            Emotion.user_id == user_id,
+            Emotion.client_id.in_(client_ids)
+        ).all()
+    ) if client_ids else {}
+    values = [value for value in values if value["client_id"] not in existing]
+
+    created = []
+    if values:
+        table = Emotion.__table__
+        created = db.execute(
+            dialect_insert(db, table).on_conflict_do_nothing(
+                index_elements=[table.c.user_id, table.c.client_id]
+            ).returning(
+                table.c.id, table.c.client_id, table.c.user_id,
+                table.c.created_at, table.c.emotion_type, table.c.intensity
+            ),
+            values
+        ).all()
+        rollup_crud.record_emotions(db, created)
+    db.commit()
+    if created:
+        activity_crud.invalidate_for_patient(db, user_id)
+        # Офлайн-записи задним числом: обновляют базовую линию без уведомлений
+        for row in sorted(created, key=lambda row: row.created_at):
+            anomaly_crud.detector.observe(user_id, row.intensity, alert=False)
+
+    created_ids = {row.client_id: row.id for row in created}
+    missing = [value["client_id"] for value in values if value["client_id"] not in created_ids]
+    if missing:
+        # Вставлены параллельным запросом между проверкой и INSERT
+        existing.update(db.query(Emotion.client_id, Emotion.id).filter(
+            Emotion.user_id == user_id,
+            Emotion.client_id.in_(missing)
+        ).all())
+
+    output = []
+    seen = set()
+    for item in items:
+        client_id = item.client_id
+        result = results[client_id]
+        if result is None:
+            if client_id in created_ids:
+                result = {"client_id": client_id, "status": "created", "id": created_ids[client_id]}
+            else:
+                result = {"client_id": client_id, "status": "duplicate", "id": existing.get(client_id)}
+        if client_id in seen and result["status"] == "created":
+            # Повтор client_id внутри одной пачки
+            result = {**result, "status": "duplicate"}
+        seen.add(client_id)
+        output.append(result)
+    return output
+
+
 def get_user_emotions(db: Session, user_id: int, skip: int = 0, limit: int = 100):
     """Получить эмоции пользователя"""
     return db.query(Emotion).filter(
         Emotion.user_id == user_id
     ).order_by(Emotion.created_at.desc()).offset(skip).limit(limit).all()
+
+
+def get_user_emotions_downsampled(db: Session, user_id: int, points: int):
+    """
+    Не более points записей с оценкой за всю историю для графика (LTTB).
+
+    Ряд (время, интенсивность) читается столбцами; полные записи
+    загружаются только для выбранных точек.
+    """
+    rows = db.execute(
+        select(Emotion.id, Emotion.created_at, Emotion.intensity).where(
+            Emotion.user_id == user_id,
+            Emotion.intensity.isnot(None)
+        ).order_by(Emotion.created_at, Emotion.id)
+    ).all()
+    if not rows:
+        return []
+    ids, created, intensity = (np.array(column) for column in zip(*rows))
+    seconds = created.astype("datetime64[us]").astype(np.int64) / 1e6
+    selected = ids[lttb(seconds, intensity, points)].tolist()
+    return db.query(Emotion).filter(
+        Emotion.id.in_(selected)
+    ).order_by(Emotion.created_at.desc()).all()
+
+
+def export_query(user_id: int):
+    """Запрос для потоковой выгрузки эмоций пользователя: (select, имена колонок)"""
+    columns = (Emotion.id, Emotion.created_at, Emotion.emotion_type, Emotion.intensity, Emotion.note)
+    statement = select(*columns).where(
+        Emotion.user_id == user_id
+    ).order_by(Emotion.created_at, Emotion.id)
+    return statement, [column.key for column in columns]
+
+
+BUCKETS = ("day", "week", "month")
+
+
+def _bucket_result(started: date, count, rated, total, total_sq, low, high, emotion_types: dict) -> dict:
+    """Корзина статистики из сумм по дневным агрегатам"""
+    mean = std = None
+    if rated:
+        mean = total / rated
+        # Дисперсия из суммы квадратов; max(0) гасит ошибку округления
+        std = math.sqrt(max(total_sq / rated - mean * mean, 0.0))
+    return {
+        "bucket_start": started,
+        "count": int(count),
+        "mean_intensity": mean,
+        "std_intensity": std,
+        "min_intensity": int(low) if rated else None,
+        "max_intensity": int(high) if rated else None,
+        "emotion_types": emotion_types,
+    }
+
+
+def _rollup_query(db: Session, user_id: int, date_from: date, date_to: date, *columns):
+    return db.query(*columns).filter(
+        EmotionDailyRollup.user_id == user_id,
+        EmotionDailyRollup.day >= date_from,
+        EmotionDailyRollup.day <= date_to
+    )
+
+
+def _stats_sql(db: Session, user_id: int, date_from: date, date_to: date, bucket: str) -> list[dict]:
+    """Агрегация в Postgres: date_trunc + GROUP BY по дневным агрегатам"""
+    bucket_start = func.date_trunc(bucket, cast(EmotionDailyRollup.day, DateTime)).label("bucket_start")
+    rows = _rollup_query(
+        db, user_id, date_from, date_to,
+        bucket_start,
+        EmotionDailyRollup.emotion_type,
+        func.sum(EmotionDailyRollup.count),
+        func.sum(EmotionDailyRollup.rated_count),
+        func.sum(EmotionDailyRollup.intensity_sum),
+        func.sum(EmotionDailyRollup.intensity_sumsq),
+        func.min(EmotionDailyRollup.min_intensity),
+        func.max(EmotionDailyRollup.max_intensity),
+    ).group_by(bucket_start, EmotionDailyRollup.emotion_type).order_by(bucket_start).all()
+
+    # Строки (корзина, тип) сворачиваются в корзины; их не больше корзин x типов
+    buckets: dict[date, list] = {}
+    for started, emotion_type, count, rated, total, total_sq, low, high in rows:
+        item = buckets.setdefault(started.date(), [0, 0, 0, 0, None, None, {}])
+        item[0] += count
+        item[6][emotion_type] = int(count)
+        if rated:
+            item[1] += rated
+            item[2] += total
+            item[3] += total_sq
+            item[4] = low if item[4] is None else min(item[4], low)
+            item[5] = high if item[5] is None else max(item[5], high)
+    return [_bucket_result(started, *item) for started, item in buckets.items()]
+
+
+def _truncate(days: np.ndarray, bucket: str) -> np.ndarray:
+    """Начало корзины для массива datetime64[D] (неделя - с понедельника, как date_trunc)"""
+    if bucket == "day":
+        return days
+    if bucket == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    # 1970-01-01 - четверг: сдвиг на 3 дня выравнивает номер дня на понедельник
+    ordinal = days.astype(np.int64)
+    return (ordinal - (ordinal + 3) % 7).astype("datetime64[D]")
+
+
+def _stats_numpy(db: Session, user_id: int, date_from: date, date_to: date, bucket: str) -> list[dict]:
+    """Агрегация без date_trunc (SQLite/dev): векторизованно в NumPy по дневным агрегатам"""
+    rows = _rollup_query(
+        db, user_id, date_from, date_to,
+        EmotionDailyRollup.day,
+        EmotionDailyRollup.emotion_type,
+        EmotionDailyRollup.count,
+        EmotionDailyRollup.rated_count,
+        EmotionDailyRollup.intensity_sum,
+        EmotionDailyRollup.intensity_sumsq,
+        EmotionDailyRollup.min_intensity,
+        EmotionDailyRollup.max_intensity,
+    ).all()
+    if not rows:
+        return []
+
+    days, types, counts, rated, totals, totals_sq, lows, highs = zip(*rows)
+    starts, bucket_index = np.unique(
+        _truncate(np.array(days, dtype="datetime64[D]"), bucket), return_inverse=True
+    )
+    size = len(starts)
+    sums = [
+        np.bincount(bucket_index, weights=np.array(values, dtype=float), minlength=size)
+        for values in (counts, rated, totals, totals_sq)
+    ]
+    # У дней без интенсивностей min/max = NULL - они не участвуют
+    bucket_lows = np.full(size, np.inf)
+    bucket_highs = np.full(size, -np.inf)
+    low_values = np.array([np.inf if v is None else v for v in lows], dtype=float)
+    high_values = np.array([-np.inf if v is None else v for v in highs], dtype=float)
+    np.minimum.at(bucket_lows, bucket_index, low_values)
+    np.maximum.at(bucket_highs, bucket_index, high_values)
+
+    # Распределение типов: счётчик по паре (корзина, тип)
+    type_names, type_index = np.unique(np.array(types, dtype=str), return_inverse=True)
+    by_type = np.bincount(
+        bucket_index * len(type_names) + type_index,
+        weights=np.array(counts, dtype=float),
+        minlength=size * len(type_names)
+    ).reshape(size, len(type_names))
+
+    return [
+        _bucket_result(
+            started, *(values[i] for values in sums), bucket_lows[i], bucket_highs[i],
+            {str(type_names[j]): int(by_type[i, j]) for j in np.flatnonzero(by_type[i])}
+        )
+        for i, started in enumerate(starts.astype(date))
+    ]
+
+
+def get_emotion_stats(
+    db: Session,
+    user_id: int,
+    date_from: date,
+    date_to: date,
+    bucket: str = "day"
+) -> list[dict]:
+    """
+    Статистика эмоций по корзинам day/week/month за [date_from, date_to].
+
+    Читает дневные агрегаты (emotion_daily_rollup), а не записи: год - это
+    ~365 строк на тип. Каждая корзина: начало, количество, средняя/СКО/
+    мин/макс интенсивность и распределение по типам. Пустые корзины не
+    возвращаются.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket}")
+    if db.get_bind().dialect.name == "postgresql":
+        return _stats_sql(db, user_id, date_from, date_to, bucket)
+    return _stats_numpy(db, user_id, date_from, date_to, bucket)
@@ -0,0 +1,119 @@
+from sqlalchemy import Date, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.models import Emotion, EmotionDailyRollup
+
+
+def _least(db: Session, *args):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.least(*args)
+    return func.min(*args)
+
+
+def _greatest(db: Session, *args):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.greatest(*args)
+    return func.max(*args)
+
+
+def record_emotions(db: Session, emotions: list[Emotion]):
+    """
+    Учесть новые записи в дневных агрегатах (в текущей транзакции, без commit).
+
+    Записи одного (user_id, день, тип) схлопываются в один upsert.
+    """
+    groups: dict[tuple, dict] = {}
+    for emotion in emotions:
+        key = (emotion.user_id, emotion.created_at.date(), emotion.emotion_type)
+        group = groups.setdefault(key, {
+            "count": 0, "rated_count": 0, "intensity_sum": 0,
+            "intensity_sumsq": 0, "min_intensity": None, "max_intensity": None,
+        })
+        group["count"] += 1
+        intensity = emotion.intensity
+        if intensity is not None:
+            group["rated_count"] += 1
+            group["intensity_sum"] += intensity
+            group["intensity_sumsq"] += intensity * intensity
+            group["min_intensity"] = intensity if group["min_intensity"] is None else min(group["min_intensity"], intensity)
+            group["max_intensity"] = intensity if group["max_intensity"] is None else max(group["max_intensity"], intensity)
+
+    table = EmotionDailyRollup.__table__
+    for (user_id, day, emotion_type), group in groups.items():
+        stmt = dialect_insert(db, table).values(
+            user_id=user_id, day=day, emotion_type=emotion_type, **group
+        )
+        update = {
+            "count": table.c.count + group["count"],
+            "rated_count": table.c.rated_count + group["rated_count"],
+            "intensity_sum": table.c.intensity_sum + group["intensity_sum"],
+            "intensity_sumsq": table.c.intensity_sumsq + group["intensity_sumsq"],
+        }
+        if group["rated_count"]:
+            # В строке может ещё не быть интенсивностей (NULL)
+            update["min_intensity"] = _least(
+                db, func.coalesce(table.c.min_intensity, group["min_intensity"]), group["min_intensity"]
+            )
+            update["max_intensity"] = _greatest(
+                db, func.coalesce(table.c.max_intensity, group["max_intensity"]), group["max_intensity"]
+            )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.day, table.c.emotion_type],
+            set_=update,
+        ))
+
+
+def _aggregate_from_emotions():
+    """Агрегаты, посчитанные заново из таблицы emotions"""
+    day = func.date(Emotion.created_at, type_=Date)
+    return select(
+        Emotion.user_id,
+        day.label("day"),
+        Emotion.emotion_type,
+        func.count(Emotion.id).label("count"),
+        func.count(Emotion.intensity).label("rated_count"),
+        func.coalesce(func.sum(Emotion.intensity), 0).label("intensity_sum"),
+        func.coalesce(func.sum(Emotion.intensity * Emotion.intensity), 0).label("intensity_sumsq"),
+        func.min(Emotion.intensity).label("min_intensity"),
+        func.max(Emotion.intensity).label("max_intensity"),
+    ).group_by(Emotion.user_id, day, Emotion.emotion_type)
+
+
+ROLLUP_COLUMNS = (
+    "user_id", "day", "emotion_type", "count", "rated_count",
+    "intensity_sum", "intensity_sumsq", "min_intensity", "max_intensity",
+)
+
+
+def rebuild(db: Session) -> int:
+    """Пересобрать emotion_daily_rollup из таблицы emotions. Возвращает число строк"""
+    db.query(EmotionDailyRollup).delete(synchronize_session=False)
+    db.execute(insert(EmotionDailyRollup).from_select(ROLLUP_COLUMNS, _aggregate_from_emotions()))
+    db.commit()
+    return db.query(func.count()).select_from(EmotionDailyRollup).scalar()
+
+
+def check(db: Session) -> list[tuple]:
+    """
+    Сверить агрегаты с таблицей emotions.
+
+    Возвращает расхождения: (ключ, ожидаемые значения, фактические значения);
+    None вместо значений - строки нет с этой стороны.
+    """
+    expected = {
+        (row.user_id, row.day, row.emotion_type): tuple(row)[3:]
+        for row in db.execute(_aggregate_from_emotions())
+    }
+    actual = {
+        (row.user_id, row.day, row.emotion_type): (
+            row.count, row.rated_count, row.intensity_sum, row.intensity_sumsq,
+            row.min_intensity, row.max_intensity,
+        )
+        for row in db.query(EmotionDailyRollup)
+    }
+    return [
+        (key, expected.get(key), actual.get(key))
+        for key in sorted(expected.keys() | actual.keys())
+        if expected.get(key) != actual.get(key)
+    ]
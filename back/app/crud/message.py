@@ -1,6 +1,10 @@
-from sqlalchemy.orm import Session
+import base64
+from sqlalchemy import func, insert, or_, select, tuple_, union_all, update
+from sqlalchemy.orm import Session, aliased
 from app.models import Message
 from app.schemas import MessageCreate
+from app.crud import conversation as conversation_crud
+from app.crud import activity as activity_crud
 from datetime import datetime
 
 
@@ -11,37 +15,245 @@ def create_message(db: Session, message: MessageCreate, sender_id: int):
         sender_id=sender_id,
         recipient_id=message.recipient_id,
         timestamp=datetime.utcnow(),
-        is_read=False
+        is_read=False,
+        seq=conversation_crud.allocate_seq(db, sender_id, message.recipient_id)
     )
     db.add(db_message)
+    db.flush()
+    # Счётчики переписки обновляются в той же транзакции
+    conversation_crud.record_message(db, db_message)
     db.commit()
+    activity_crud.invalidate(db_message.sender_id, db_message.recipient_id)
     db.refresh(db_message)
     return db_message
 
 
-def get_chat_history(db: Session, user1_id: int, user2_id: int, skip: int = 0, limit: int = 100):
-    """Получить историю чата между двумя пользователями"""
-    messages = db.query(Message).filter(
-        ((Message.sender_id == user1_id) & (Message.recipient_id == user2_id)) |
-        ((Message.sender_id == user2_id) & (Message.recipient_id == user1_id))
-    ).order_by(Message.timestamp.asc()).offset(skip).limit(limit).all()
-    return messages
+def create_messages_batch(db: Session, items: list[tuple[MessageCreate, int]]):
+    """
+    Создать пачку сообщений одним многострочным INSERT ... RETURNING и одним commit.
 
+    items - список (сообщение, sender_id). Возвращает строки с полями сообщения
+    в том же порядке, что и items.
+    """
+    now = datetime.utcnow()
 
-def mark_messages_as_read(db: Session, sender_id: int, recipient_id: int):
-    """Отметить все сообщения от отправителя как прочитанные"""
-    db.query(Message).filter(
-        Message.sender_id == sender_id,
-        Message.recipient_id == recipient_id,
-        Message.is_read == False
-    ).update({"is_read": True})
+    # Один диапазон seq на переписку, затем раздача по порядку items
+    pair_counts: dict[tuple[int, int], int] = {}
+    for message, sender_id in items:
+        pair = tuple(sorted((sender_id, message.recipient_id)))
+        pair_counts[pair] = pair_counts.get(pair, 0) + 1
+    next_seq = {
+        pair: conversation_crud.allocate_seq(db, *pair, count)
+        for pair, count in sorted(pair_counts.items())
+    }
+
+    values = []
+    for message, sender_id in items:
+        pair = tuple(sorted((sender_id, message.recipient_id)))
+        values.append({
+            "content": message.content,
+            "sender_id": sender_id,
+            "recipient_id": message.recipient_id,
+            "timestamp": now,
+            "is_read": False,
+            "seq": next_seq[pair],
+        })
+        next_seq[pair] += 1
+
+    rows = db.execute(
+        insert(Message).returning(
+            Message.id, Message.content, Message.sender_id,
+            Message.recipient_id, Message.timestamp, Message.is_read,
+            Message.seq, sort_by_parameter_order=True
+        ),
+        values
+    ).all()
+    conversation_crud.record_messages(
+        db, [(row.sender_id, row.recipient_id, row.id) for row in rows]
+    )
+    db.commit()
+    activity_crud.invalidate(*{
+        user_id for row in rows for user_id in (row.sender_id, row.recipient_id)
+    })
+    return rows
+
+
+def create_file_message(db: Session, sender_id: int, recipient_id: int, file_info: dict):
+    """Создать сообщение с вложением"""
+    db_message = Message(
+        content=f"Отправил файл: {file_info['file_name']}",
+        sender_id=sender_id,
+        recipient_id=recipient_id,
+        file_url=file_info['file_url'],
+        file_name=file_info['file_name'],
+        file_type=file_info['file_type'],
+        file_size=file_info['file_size'],
+        is_read=False,
+        seq=conversation_crud.allocate_seq(db, sender_id, recipient_id)
+    )
+    db.add(db_message)
+    db.flush()
+    conversation_crud.record_message(db, db_message)
+    db.commit()
+    activity_crud.invalidate(db_message.sender_id, db_message.recipient_id)
+    db.refresh(db_message)
+    return db_message
+
+
+def encode_cursor(message: Message) -> str:
+    """Курсор истории: позиция сообщения по (timestamp, id)"""
+    raw = f"{message.timestamp.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Разобрать курсор истории. ValueError если курсор некорректен"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, message_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def get_chat_history(
+    db: Session,
+    user1_id: int,
+    user2_id: int,
+    before: tuple[datetime, int] | None = None,
+    after: tuple[datetime, int] | None = None,
+    limit: int = 50
+) -> tuple[list[Message], bool]:
+    """
+    Получить страницу истории чата между двумя пользователями.
+
+    Без курсора возвращается самая новая страница; `before` - более старые
+    сообщения, `after` - более новые. Сообщения в странице идут по времени.
+    Возвращает (сообщения, есть_ли_ещё_в_этом_направлении).
+    """
+    position = tuple_(Message.timestamp, Message.id)
+    if after is not None:
+        order = (Message.timestamp.asc(), Message.id.asc())
+        cursor_filter = position > tuple_(*after)
+    else:
+        order = (Message.timestamp.desc(), Message.id.desc())
+        cursor_filter = position < tuple_(*before) if before is not None else None
+
+    # Каждое направление - отдельный диапазон по индексу
+    # (sender_id, recipient_id, timestamp, id), затем слияние двух страниц
+    directions = []
+    for sender_id, recipient_id in ((user1_id, user2_id), (user2_id, user1_id)):
+        query = select(Message).where(
+            Message.sender_id == sender_id,
+            Message.recipient_id == recipient_id
+        )
+        if cursor_filter is not None:
+            query = query.where(cursor_filter)
+        directions.append(query.order_by(*order).limit(limit + 1).subquery())
+
+    page = union_all(*(select(direction) for direction in directions)).subquery()
+    page_message = aliased(Message, page)
+    if after is not None:
+        page_order = (page.c.timestamp.asc(), page.c.id.asc())
+    else:
+        page_order = (page.c.timestamp.desc(), page.c.id.desc())
+    messages = db.execute(
+        select(page_message).order_by(*page_order).limit(limit + 1)
+    ).scalars().all()
+
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if after is None:
+        messages.reverse()
+    return messages, has_more
+
+
+def get_messages_after_seq(
+    db: Session,
+    user1_id: int,
+    user2_id: int,
+    after_seq: int,
+    limit: int = 100
+) -> tuple[list[Message], bool]:
+    """
+    Сообщения переписки с seq больше after_seq (дозагрузка после переподключения).
+
+    Возвращает (сообщения по возрастанию seq, есть_ли_ещё).
+    """
+    # Как и в истории: по диапазону индекса (sender_id, recipient_id, seq)
+    # на каждое направление, затем слияние
+    directions = [
+        select(Message).where(
+            Message.sender_id == sender_id,
+            Message.recipient_id == recipient_id,
+            Message.seq > after_seq
+        ).order_by(Message.seq.asc()).limit(limit + 1).subquery()
+        for sender_id, recipient_id in ((user1_id, user2_id), (user2_id, user1_id))
+    ]
+    page = union_all(*(select(direction) for direction in directions)).subquery()
+    messages = db.execute(
+        select(aliased(Message, page)).order_by(page.c.seq.asc()).limit(limit + 1)
+    ).scalars().all()
+    return messages[:limit], len(messages) > limit
+
+
+def export_query(user1_id: int, user2_id: int):
+    """Запрос для потоковой выгрузки переписки: (select, имена колонок)"""
+    columns = (
+        Message.id, Message.seq, Message.timestamp, Message.sender_id, Message.recipient_id,
+        Message.content, Message.file_name, Message.file_url, Message.is_read, Message.read_at,
+    )
+    statement = select(*columns).where(or_(
+        (Message.sender_id == user1_id) & (Message.recipient_id == user2_id),
+        (Message.sender_id == user2_id) & (Message.recipient_id == user1_id),
+    )).order_by(Message.timestamp, Message.id)
+    return statement, [column.key for column in columns]
+
+
+def mark_messages_as_delivered(db: Session, sender_id: int, recipient_id: int, up_to_seq: int) -> int:
+    """
+    Отметить сообщения от отправителя с seq <= up_to_seq как доставленные.
+
+    Возвращает максимальный seq среди отмеченных (0 если отмечать нечего).
+    """
+    seqs = db.execute(
+        update(Message).where(
+            Message.sender_id == sender_id,
+            Message.recipient_id == recipient_id,
+            Message.seq <= up_to_seq,
+            Message.delivered_at.is_(None)
+        ).values(delivered_at=datetime.utcnow()).returning(Message.seq)
+    ).scalars().all()
+    db.commit()
+    return max(seqs, default=0)
+
+
+def mark_messages_as_read(db: Session, sender_id: int, recipient_id: int) -> tuple[int, int]:
+    """
+    Отметить все сообщения от отправителя как прочитанные.
+
+    Возвращает (количество, максимальный seq среди отмеченных).
+    """
+    now = datetime.utcnow()
+    seqs = db.execute(
+        update(Message).where(
+            Message.sender_id == sender_id,
+            Message.recipient_id == recipient_id,
+            Message.is_read == False
+        ).values(
+            is_read=True,
+            read_at=now,
+            # Прочитанное считается и доставленным
+            delivered_at=func.coalesce(Message.delivered_at, now)
+        ).returning(Message.seq)
+    ).scalars().all()
+    conversation_crud.mark_read(db, recipient_id, sender_id, len(seqs))
     db.commit()
+    if seqs:
+        activity_crud.invalidate(recipient_id)
+    return len(seqs), max((seq for seq in seqs if seq is not None), default=0)
 
 
 def get_unread_count(db: Session, user_id: int):
     """Получить количество непрочитанных сообщений"""
-    count = db.query(Message).filter(
-        Message.recipient_id == user_id,
-        Message.is_read == False
-    ).count()
-    return count
+    return conversation_crud.get_unread_total(db, user_id)
@@ -1,10 +1,12 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
+from sqlalchemy.orm.attributes import set_committed_value
 from typing import List, Optional
 from datetime import date
 
 from app.models.session import Session as SessionModel, SessionStatus
 from app.schemas.session import SessionCreate, SessionUpdate
+from app.crud import user as user_crud
 
 def create_session(db: Session, session: SessionCreate, patient_id: int):
     db_session = SessionModel(
@@ -23,15 +25,22 @@ def create_session(db: Session, session: SessionCreate, patient_id: int):
 def get_session(db: Session, session_id: int):
     return db.query(SessionModel).filter(SessionModel.id == session_id).first()
 
+def _load_patients(db: Session, sessions: List[SessionModel]) -> List[SessionModel]:
+    # Пациенты всех сеансов одним запросом: ответ сериализует session.patient
+    patients = user_crud.get_users_by_ids(db, (session.patient_id for session in sessions))
+    for session in sessions:
+        set_committed_value(session, "patient", patients.get(session.patient_id))
+    return sessions
+
 def get_patient_sessions(db: Session, patient_id: int, skip: int = 0, limit: int = 100):
-    return db.query(SessionModel).filter(
+    return _load_patients(db, db.query(SessionModel).filter(
         SessionModel.patient_id == patient_id
-    ).offset(skip).limit(limit).all()
+    ).offset(skip).limit(limit).all())
 
 def get_psychologist_sessions(db: Session, psychologist_id: int, skip: int = 0, limit: int = 100):
-    return db.query(SessionModel).filter(
+    return _load_patients(db, db.query(SessionModel).filter(
         SessionModel.psychologist_id == psychologist_id
-    ).offset(skip).limit(limit).all()
+    ).offset(skip).limit(limit).all())
 
 def update_session(db: Session, session_id: int, update_data: SessionUpdate):
     db_session = get_session(db, session_id)
@@ -50,10 +59,10 @@ def update_session(db: Session, session_id: int, update_data: SessionUpdate):
 def get_psychologist_slots(db: Session, psychologist_id: int, date_obj: date):
     # This is a basic implementation. In a real app, you'd check for conflicts.
     # returning existing sessions for that day to filter out taken slots
-    return db.query(SessionModel).filter(
+    return _load_patients(db, db.query(SessionModel).filter(
         and_(
             SessionModel.psychologist_id == psychologist_id,
             SessionModel.scheduled_date == date_obj,
             SessionModel.status.in_([SessionStatus.PENDING, SessionStatus.APPROVED])
         )
-    ).all()
+    ).all())
@@ -1,10 +1,15 @@
+from sqlalchemy import func, literal, select
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+from datetime import datetime
 import random
 import string
 
-from app.models import User, UserRole
+from app.models import ConversationState, Emotion, User, UserRole
 from app.schemas import UserCreate, UserRole as SchemaUserRole, UserUpdate
 from app.security import get_password_hash
+from app.search import get_search_backend
+from app.principal import invalidate_principal
 
 
 def generate_psychologist_code(db: Session) -> str:
@@ -30,6 +35,33 @@ def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
 
+def get_user(db: Session, user_id: int | None):
+    """Получить пользователя по id; уже загруженный в сессии запроса - без запроса к БД"""
+    if user_id is None:
+        return None
+    return db.get(User, user_id)
+
+
+def get_users_by_ids(db: Session, user_ids) -> dict[int, User]:
+    """
+    Пользователи по id одним запросом.
+
+    Уже загруженные в сессии запроса берутся из её identity map. Identity
+    map хранит слабые ссылки: результат нужно держать, пока он используется.
+    """
+    users = {}
+    missing = []
+    for user_id in set(user_ids) - {None}:
+        user = db.identity_map.get(identity_key(User, user_id))
+        if user is not None:
+            users[user_id] = user
+        else:
+            missing.append(user_id)
+    if missing:
+        users.update((user.id, user) for user in db.query(User).filter(User.id.in_(missing)))
+    return users
+
+
 def create_user(db: Session, user: UserCreate):
     """Создать нового пользователя"""
     hashed_pass = get_password_hash(user.password)
@@ -55,6 +87,7 @@ def create_user(db: Session, user: UserCreate):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    get_search_backend(db).index_user(db_user)
     return db_user
 
 
@@ -65,14 +98,106 @@ def get_patients_by_psychologist(db: Session, psychologist_id: int):
     ).all()
 
 
+def get_patient_dashboard(
+    db: Session,
+    psychologist_id: int,
+    since: datetime,
+    search: str | None = None,
+    sort: str | None = "last_seen",
+    order: str | None = "desc",
+    new_activity_only: bool = False,
+    limit: int = 20,
+    offset: int = 0
+) -> tuple[list, int]:
+    """
+    Страница пациентов психолога со счётчиками активности - одним запросом.
+
+    Непрочитанные берутся из conversation_state, новые записи (эмоции с since)
+    - коррелированным подзапросом по индексу (user_id, created_at). Фильтр,
+    сортировка и LIMIT/OFFSET выполняются в БД; общее число строк для
+    пагинации считается оконной функцией в том же запросе. При поиске
+    результаты сначала упорядочены по схожести (app.search).
+    Возвращает (строки, всего).
+    """
+    unread = func.coalesce(ConversationState.unread_count, 0).label("unread_messages_count")
+    new_entries = (
+        select(func.count(Emotion.id))
+        .where(Emotion.user_id == User.id, Emotion.created_at >= since)
+        .correlate(User)
+        .scalar_subquery()
+        .label("new_entries_count")
+    )
+    if search:
+        search_condition, search_rank = get_search_backend(db).match(
+            db, search, scope=select(User.id).where(User.linked_psychologist_id == psychologist_id)
+        )
+    else:
+        search_condition, search_rank = None, literal(0.0)
+    patients = (
+        select(
+            User.id, User.first_name, User.last_name, User.email, User.last_seen,
+            unread, new_entries, search_rank.label("search_rank"),
+        )
+        .outerjoin(ConversationState, (ConversationState.user_id == psychologist_id)
+                   & (ConversationState.peer_id == User.id))
+        .where(User.linked_psychologist_id == psychologist_id)
+    )
+    if search_condition is not None:
+        patients = patients.where(search_condition)
+    patients = patients.subquery()
+
+    has_activity = (patients.c.unread_messages_count > 0) | (patients.c.new_entries_count > 0)
+    query = select(patients, has_activity.label("has_new_activity"), func.count().over().label("total"))
+    if new_activity_only:
+        query = query.where(has_activity)
+
+    descending = order == "desc"
+    # Самые похожие на поисковый запрос - первыми, затем выбранная сортировка
+    ordering = [patients.c.search_rank.desc()] if search else []
+    if sort == "name":
+        columns = (patients.c.first_name, patients.c.last_name)
+        ordering += [c.desc() if descending else c.asc() for c in columns]
+    elif sort == "last_seen":
+        # Никогда не заходившие - как самые давние
+        column = patients.c.last_seen
+        ordering.append(column.desc().nulls_last() if descending else column.asc().nulls_first())
+    elif sort == "entries":
+        column = patients.c.new_entries_count
+        ordering.append(column.desc() if descending else column.asc())
+    # id - для стабильного порядка между страницами
+    ordering.append(patients.c.id.desc() if descending else patients.c.id.asc())
+
+    rows = db.execute(query.order_by(*ordering).limit(limit).offset(offset)).all()
+    if rows:
+        return rows, rows[0].total
+    if offset == 0:
+        return [], 0
+    # Страница за концом списка: окно пустое, всего считаем отдельно
+    total = db.execute(select(func.count()).select_from(query.subquery())).scalar()
+    return [], total
+
+
 def get_psychologist_by_patient(db: Session, patient_id: int):
     """Получить психолога пациента"""
-    patient = db.query(User).filter(User.id == patient_id).first()
+    patient = get_user(db, patient_id)
     if patient and patient.linked_psychologist_id:
-        return db.query(User).filter(User.id == patient.linked_psychologist_id).first()
+        return get_user(db, patient.linked_psychologist_id)
     return None
 
 
+def get_contact_ids(db: Session, user_id: int) -> set[int]:
+    """Получить id контактов пользователя: его психолог и его пациенты"""
+    user = db.query(User.linked_psychologist_id).filter(User.id == user_id).first()
+    contacts = {
+        patient_id for (patient_id,) in db.query(User.id).filter(
+            User.linked_psychologist_id == user_id
+        )
+    }
+    if user and user.linked_psychologist_id:
+        contacts.add(user.linked_psychologist_id)
+    return contacts
+
+
 def get_all_psychologists(db: Session, limit: int = 10):
     """Получить список всех психологов"""
     return db.query(User).filter(
@@ -80,14 +205,30 @@ def get_all_psychologists(db: Session, limit: int = 10):
     ).limit(limit).all()
 
 
+def set_password_hash(db: Session, user_id: int, hashed_password: str, revoke_tokens: bool = False) -> int:
+    """
+    Сохранить новый хэш пароля. revoke_tokens - заодно сделать недействительными
+    выданные refresh-токены. Возвращает текущее поколение токенов
+    """
+    values = {"hashed_password": hashed_password}
+    if revoke_tokens:
+        values["token_version"] = User.token_version + 1
+    db.query(User).filter(User.id == user_id).update(values, synchronize_session=False)
+    db.commit()
+    return db.query(User.token_version).filter(User.id == user_id).scalar()
+
+
 def update_user(db: Session, db_user: User, user_update: UserUpdate):
     """Обновить данные пользователя"""
     update_data = user_update.model_dump(exclude_unset=True)
+    old_email = db_user.email
     
     for key, value in update_data.items():
         setattr(db_user, key, value)
         
     db.add(db_user)
     db.commit()
+    invalidate_principal(db_user.id, old_email)
     db.refresh(db_user)
+    get_search_backend(db).index_user(db_user)
     return db_user
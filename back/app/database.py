@@ -1,3 +1,7 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -14,6 +18,15 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def dialect_insert(db, table):
+    """INSERT с поддержкой ON CONFLICT для диалекта текущей БД (Postgres или SQLite)"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
 # Dependency для получения сессии БД
 def get_db():
     db = SessionLocal()
@@ -21,3 +34,32 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Ограниченный пул потоков для работы с БД из async-кода (WebSocket и т.п.).
+# Размер не больше пула соединений, чтобы потоки не ждали соединение.
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_EXECUTOR_WORKERS,
+    thread_name_prefix="db"
+)
+
+
+def _run_in_session(func, *args, **kwargs):
+    db = SessionLocal()
+    try:
+        return func(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    Выполнить func(db, *args, **kwargs) в пуле потоков с короткоживущей сессией.
+
+    Сессия закрывается сразу после операции, поэтому func должна вернуть
+    уже загруженные данные (dict, скаляры), а не ленивые ORM-атрибуты.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        db_executor, partial(_run_in_session, func, *args, **kwargs)
+    )
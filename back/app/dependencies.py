@@ -1,11 +1,18 @@
-from fastapi import Depends, HTTPException, status
+import hmac
+
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from jose import JWTError, jwt
+from jose import JWTError
 
-from app.database import SessionLocal
+from app.cache import MemoryCache
 from app.config import settings
+from app.database import SessionLocal, run_db
 from app.crud import user as user_crud
+from app.models import User
+from app.principal import Principal, cache_principal, get_principal, principal_cache
+from app.revocation import revocation_list
+from app.security import decode_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -19,25 +26,104 @@ def get_db():
         db.close()
 
 
-async def get_current_user(
-    db: Session = Depends(get_db), 
-    token: str = Depends(oauth2_scheme)
-):
-    """Получить текущего пользователя из токена"""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _decode(token: str) -> tuple:
+    """(payload, subject) access-токена; 401, если токен не подходит"""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
+        payload = decode_token(token)
     except JWTError:
-        raise credentials_exception
-    
-    user = user_crud.get_user_by_email(db, email=email)
+        raise _credentials_exception()
+    subject = payload.get("sub")
+    if subject is None:
+        raise _credentials_exception()
+    return payload, subject
+
+
+def _load_principal(db: Session, subject: str) -> Principal:
+    """Снимок пользователя из БД (промах кэша)"""
+    if subject.isdigit():
+        user = user_crud.get_user(db, int(subject))
+    else:
+        # Токены, выданные до перехода на id в sub, содержат email
+        user = user_crud.get_user_by_email(db, email=subject)
+    if user is None:
+        raise _credentials_exception()
+    return cache_principal(subject, user)
+
+
+def _check_role(payload, principal: Principal) -> Principal:
+    role = payload.get("role")
+    if role is not None and role != principal.role.value:
+        raise _credentials_exception()
+    return principal
+
+
+def authenticate_token(db: Session, token: str) -> Principal:
+    """Пользователь по access-токену - синхронно, для пула потоков; 401, если токен не подходит"""
+    payload, subject = _decode(token)
+    # Отозванные при выходе; в обычном случае - только фильтр в памяти
+    jti = payload.get("jti")
+    if jti is not None and revocation_list.is_revoked(db, jti):
+        raise _credentials_exception()
+    principal = get_principal(subject) or _load_principal(db, subject)
+    return _check_role(payload, principal)
+
+
+async def authenticate(token: str) -> Principal:
+    """
+    Пользователь по access-токену; 401, если токен не подходит.
+
+    Обычный запрос не трогает БД: подпись (кэш проверенных JWT), фильтр
+    отзыва и снимок пользователя - в памяти. Поиск jti после срабатывания
+    фильтра и загрузка пользователя при промахе - в пуле потоков (run_db).
+    """
+    if not isinstance(principal_cache, MemoryCache):
+        # Кэш в Redis - сетевой вызов: всю проверку выполняем в пуле потоков
+        return await run_db(authenticate_token, token)
+
+    payload, subject = _decode(token)
+    jti = payload.get("jti")
+    if jti is not None and revocation_list.might_be_revoked(jti):
+        if await run_db(revocation_list.lookup, jti):
+            raise _credentials_exception()
+    principal = get_principal(subject)
+    if principal is None:
+        principal = await run_db(_load_principal, subject)
+    return _check_role(payload, principal)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """Получить текущего пользователя из токена (снимок из кэша, без запроса к БД)"""
+    return await authenticate(token)
+
+
+def get_current_user_orm(
+    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_current_user)
+) -> User:
+    """Текущий пользователь как ORM-объект сессии запроса - для изменения профиля"""
+    user = user_crud.get_user(db, principal.id)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
+
+
+def require_metrics_token(x_metrics_token: str | None = Header(default=None)):
+    """
+    Доступ к метрикам воркера - для операторов, а не для пользователей
+    (роль психолога любой получает при регистрации): заголовок
+    X-Metrics-Token со значением METRICS_TOKEN. Без METRICS_TOKEN - 404
+    """
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_metrics_token is None or not hmac.compare_digest(
+        x_metrics_token.encode(), settings.METRICS_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Invalid metrics token")
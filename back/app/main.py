@@ -1,3 +1,5 @@
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -7,11 +9,13 @@ from fastapi.responses import FileResponse
 
 from app.middleware.logging import LoggingMiddleware, setup_logging
 from app.middleware.rate_limit import RateLimitMiddleware
-from app.database import engine
+from app.database import engine, SessionLocal
 from app.models import User, Emotion, Message, Session, PsychologistAvailability, Resource  # noqa: F401 - нужно для создания таблиц
 from app.database import Base
 from app.routers import auth, users, emotions, messages, sessions, availability, resources, psychologist, notifications
 from app.init_db import init_db
+from app.crud.anomaly import detector as anomaly_detector
+from app.revocation import revocation_list
 
 # Настройка логирования
 setup_logging()
@@ -22,7 +26,21 @@ Base.metadata.create_all(bind=engine)
 # Инициализируем тестовых пользователей
 init_db()
 
-app = FastAPI(title="Emotrack API")
+# Базовые линии детектора снижения настроения и фильтр отозванных токенов
+with SessionLocal() as db:
+    anomaly_detector.rebuild(db)
+    revocation_list.rebuild(db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Дочитывание отзывов токенов с других воркеров - в фоне, не в запросах
+    sync_task = asyncio.create_task(revocation_list.run_sync())
+    yield
+    sync_task.cancel()
+
+
+app = FastAPI(title="Emotrack API", lifespan=lifespan)
 
 # Logging middleware (добавляем первой)
 app.add_middleware(LoggingMiddleware)
@@ -0,0 +1,69 @@
+"""
+Служебные команды обслуживания БД.
+
+    python -m app.maintenance rebuild-conversation-state
+    python -m app.maintenance rebuild-emotion-rollup
+    python -m app.maintenance check-emotion-rollup
+"""
+import argparse
+import sys
+
+from app.database import SessionLocal
+from app.crud import conversation as conversation_crud
+from app.crud import emotion_rollup as rollup_crud
+
+
+def rebuild_conversation_state() -> int:
+    """Пересобрать счётчики непрочитанных из таблицы messages"""
+    db = SessionLocal()
+    try:
+        rows = conversation_crud.rebuild(db)
+        print(f"conversation_state rebuilt: {rows} rows")
+        return 0
+    finally:
+        db.close()
+
+
+def rebuild_emotion_rollup() -> int:
+    """Пересобрать дневные агрегаты эмоций из таблицы emotions"""
+    db = SessionLocal()
+    try:
+        rows = rollup_crud.rebuild(db)
+        print(f"emotion_daily_rollup rebuilt: {rows} rows")
+        return 0
+    finally:
+        db.close()
+
+
+def check_emotion_rollup() -> int:
+    """Сверить дневные агрегаты с emotions; код 1 при расхождениях"""
+    db = SessionLocal()
+    try:
+        mismatches = rollup_crud.check(db)
+    finally:
+        db.close()
+    for key, expected, actual in mismatches[:50]:
+        print(f"{key}: expected {expected}, actual {actual}")
+    if mismatches:
+        print(f"\n{len(mismatches)} mismatched rows - run rebuild-emotion-rollup")
+        return 1
+    print("emotion_daily_rollup is consistent")
+    return 0
+
+
+COMMANDS = {
+    "rebuild-conversation-state": rebuild_conversation_state,
+    "rebuild-emotion-rollup": rebuild_emotion_rollup,
+    "check-emotion-rollup": check_emotion_rollup,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Служебные команды Emotrack")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    return COMMANDS[args.command]()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
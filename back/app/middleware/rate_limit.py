@@ -63,6 +63,9 @@ class RateLimitConfig:
     # Emotion tracking (personal, moderate)
     emotions: tuple = (50, 60)  # 50 entries per minute
     
+    # Offline sync: one request carries up to 5000 entries
+    emotions_batch: tuple = (10, 60)  # 10 batches per minute
+    
     # Resource uploads (heavy, very restrictive)
     uploads: tuple = (10, 3600)  # 10 uploads per hour
 
@@ -77,22 +80,27 @@ def get_rate_limit_key(request: Request) -> str:
     return f"ip:{request.client.host}"
 
 
-def get_rate_limit_for_endpoint(path: str) -> tuple:
-    """Get rate limit configuration for an endpoint."""
-    config = RateLimitConfig()
-    
+def get_rate_limit_bucket(path: str) -> str:
+    """Get the RateLimitConfig field (limit bucket) for an endpoint."""
     if "/auth/login" in path:
-        return config.login
+        return "login"
     elif "/auth/register" in path:
-        return config.register
+        return "register"
     elif "/messages" in path:
-        return config.messages
+        return "messages"
+    elif "/emotions/batch" in path:
+        return "emotions_batch"
     elif "/emotions" in path:
-        return config.emotions
+        return "emotions"
     elif "/resources" in path and "upload" in path.lower():
-        return config.uploads
+        return "uploads"
     else:
-        return config.default
+        return "default"
+
+
+def get_rate_limit_for_endpoint(path: str) -> tuple:
+    """Get rate limit configuration for an endpoint."""
+    return getattr(RateLimitConfig(), get_rate_limit_bucket(path))
 
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
@@ -107,9 +115,11 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         if request.url.path == "/" or request.url.path.startswith("/health"):
             return await call_next(request)
         
-        # Get rate limit config for this endpoint
-        limit, window = get_rate_limit_for_endpoint(request.url.path)
-        key = get_rate_limit_key(request)
+        # Get rate limit config for this endpoint; each bucket has its own counter,
+        # so e.g. dashboard requests do not use up the batch sync limit
+        bucket = get_rate_limit_bucket(request.url.path)
+        limit, window = getattr(RateLimitConfig(), bucket)
+        key = f"{get_rate_limit_key(request)}:{bucket}"
         
         # Check rate limit
         remaining = self.storage.get_remaining(key, limit, window)
@@ -5,9 +5,13 @@ from app.models.session import Session, SessionStatus
 from app.models.availability import PsychologistAvailability
 from app.models.resource import Resource
 from app.models.notification import Notification, NotificationType
+from app.models.conversation import ConversationState
+from app.models.emotion_rollup import EmotionDailyRollup
+from app.models.revoked_token import RevokedToken
 
 __all__ = [
     "User", "UserRole", "Emotion", "Message", 
     "Session", "SessionStatus", "PsychologistAvailability", 
-    "Resource", "Notification", "NotificationType"
+    "Resource", "Notification", "NotificationType", "ConversationState",
+    "EmotionDailyRollup", "RevokedToken"
 ]
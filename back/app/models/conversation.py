@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from datetime import datetime
+
+from app.database import Base
+
+
+class ConversationState(Base):
+    """
+    Материализованное состояние переписки для пользователя с собеседником.
+
+    Обновляется в той же транзакции, что и сообщения, поэтому счётчик
+    непрочитанных читается за O(1) вместо COUNT(*) по messages.
+    """
+    __tablename__ = "conversation_state"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    peer_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # Непрочитанные сообщения от peer_id к user_id
+    unread_count = Column(Integer, nullable=False, default=0)
+    last_message_id = Column(Integer, ForeignKey("messages.id"), nullable=True)
+    # Последний выданный seq переписки. Счётчик ведётся только в строке
+    # (меньший id, больший id), чтобы у обеих сторон была одна нумерация
+    last_seq = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 
@@ -7,6 +7,12 @@ from app.database import Base
 
 class Emotion(Base):
     __tablename__ = "emotions"
+    __table_args__ = (
+        # get_user_emotions: записи пользователя по времени
+        Index("ix_emotions_user_created", "user_id", "created_at"),
+        # Дедупликация пакетной синхронизации офлайн-клиентов
+        Index("uq_emotions_user_client", "user_id", "client_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -14,6 +20,8 @@ class Emotion(Base):
     intensity = Column(Integer, default=5)  # 1-10
     note = Column(String, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    # Идентификатор записи на клиенте (POST /emotions/batch); NULL для обычных
+    client_id = Column(String(64), nullable=True)
     
     # Relationship
     user = relationship("User", backref="emotions")
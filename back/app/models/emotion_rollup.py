@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, BigInteger
+
+from app.database import Base
+
+
+class EmotionDailyRollup(Base):
+    """
+    Дневные агрегаты эмоций пользователя по типу.
+
+    Обновляется в той же транзакции, что и записи emotions, поэтому
+    аналитика за год читает ~365 строк на тип вместо всех записей.
+    Сумма квадратов позволяет считать дисперсию без исходных строк.
+    """
+    __tablename__ = "emotion_daily_rollup"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # День created_at (UTC)
+    day = Column(Date, primary_key=True)
+    emotion_type = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    # Записи с указанной интенсивностью и агрегаты по ним
+    rated_count = Column(Integer, nullable=False, default=0)
+    intensity_sum = Column(BigInteger, nullable=False, default=0)
+    intensity_sumsq = Column(BigInteger, nullable=False, default=0)
+    min_intensity = Column(Integer, nullable=True)
+    max_intensity = Column(Integer, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -7,6 +7,19 @@ from app.database import Base
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # История чата: диапазон по направлению переписки + курсор (timestamp, id)
+        Index("ix_messages_pair_timestamp", "sender_id", "recipient_id", "timestamp", "id"),
+        # Непрочитанные: частичный индекс только по is_read = false
+        Index(
+            "ix_messages_unread",
+            "recipient_id", "sender_id",
+            postgresql_where=text("is_read = false"),
+            sqlite_where=text("is_read = 0"),
+        ),
+        # Дозагрузка после переподключения: сообщения пары с seq больше известного
+        Index("ix_messages_pair_seq", "sender_id", "recipient_id", "seq"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=True)
@@ -15,6 +28,12 @@ class Message(Base):
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
     is_read = Column(Boolean, default=False)
     
+    # Порядковый номер в переписке (общий для обоих направлений)
+    seq = Column(Integer, nullable=True)
+    # Квитанции: доставлено на устройство получателя / прочитано
+    delivered_at = Column(DateTime, nullable=True)
+    read_at = Column(DateTime, nullable=True)
+    
     # File attachments
     file_url = Column(String, nullable=True)
     file_name = Column(String, nullable=True)
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
+
+from app.database import Base
+
+
+class RevokedToken(Base):
+    """
+    Отозванные JWT (по jti): использованные refresh-токены и токены при выходе,
+    а также отозванные цепочки refresh-токенов (по id цепочки).
+
+    Строка нужна только до истечения токена. Отозванные access-токены
+    отражены в памяти воркеров фильтром Блума (app/revocation.py); повтор
+    refresh-токена ловит вставка по первичному ключу.
+    """
+    __tablename__ = "revoked_tokens"
+    __table_args__ = (
+        # Синхронизация фильтра между воркерами - новые строки по времени
+        Index("ix_revoked_tokens_kind_revoked_at", "kind", "revoked_at"),
+    )
+
+    jti = Column(String(36), primary_key=True)
+    # access, refresh или family
+    kind = Column(String(16), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # exp токена (UTC без зоны): после него строку можно удалить
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=False)
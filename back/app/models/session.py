@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Date, Time, Enum as SQLEnum, Text, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Date, Time, Enum as SQLEnum, Text, DateTime, Index
 from sqlalchemy.orm import relationship
 import enum
 from datetime import datetime
@@ -14,6 +14,10 @@ class SessionStatus(str, enum.Enum):
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        # get_psychologist_slots: занятые слоты психолога на дату
+        Index("ix_sessions_psychologist_date_status", "psychologist_id", "scheduled_date", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey("users.id"))
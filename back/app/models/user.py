@@ -39,6 +39,10 @@ class User(Base):
     
     last_seen = Column(DateTime(timezone=True), nullable=True)
 
+    # Поколение refresh-токенов: смена пароля увеличивает, токены с другим
+    # поколением /auth/refresh отклоняет
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+
     # Self-referencing relationships
     psychologist = relationship(
         "User", 
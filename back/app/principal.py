@@ -0,0 +1,89 @@
+"""
+Кэш аутентифицированного пользователя (principal) для get_current_user.
+
+Без кэша каждый запрос после проверки JWT читает пользователя из БД.
+Здесь хранится неизменяемый снимок полей пользователя по subject токена -
+id пользователя (у токенов, выданных до перехода на id, - email).
+Кэш - ограниченный по размеру LRU с TTL или общий Redis при CACHE_BACKEND=redis.
+Хэш пароля в снимок не попадает. Поля-словари копируются при создании
+снимка: MemoryCache хранит сами объекты, и изменение снимка в обработчике
+не должно попасть в кэш.
+
+Изменения профиля, аватара и пароля сбрасывают запись; маршрутам, которые
+меняют пользователя, нужен живой ORM-объект - get_current_user_orm.
+"""
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from app.cache import create_cache
+from app.config import settings
+from app.models import User, UserRole
+
+principal_cache = create_cache(
+    "principal", ttl=settings.PRINCIPAL_CACHE_TTL, max_entries=settings.PRINCIPAL_CACHE_SIZE
+)
+
+# Изменяемые поля снимка
+CONTAINER_FIELDS = ("social_links", "notification_settings")
+
+
+def _copy_json(value):
+    """Копия JSON-значения (dict/list/скаляры) - заметно дешевле copy.deepcopy"""
+    if isinstance(value, dict):
+        return {key: _copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(item) for item in value]
+    return value
+
+
+def _copy_containers(data: dict) -> dict:
+    for field in CONTAINER_FIELDS:
+        if data.get(field) is not None:
+            data[field] = _copy_json(data[field])
+    return data
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Снимок пользователя для авторизации и ответа /users/me"""
+    id: int
+    email: str
+    role: UserRole
+    first_name: str
+    last_name: str
+    linked_psychologist_id: Optional[int] = None
+    psychologist_code: Optional[str] = None
+    phone: Optional[str] = None
+    avatar_url: Optional[str] = None
+    social_links: Optional[Dict[str, Any]] = None
+    notification_settings: Optional[Dict[str, Any]] = None
+    language: Optional[str] = None
+    currency: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(**_copy_containers({field: getattr(user, field) for field in cls.__dataclass_fields__}))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Principal":
+        return cls(**_copy_containers(dict(data, role=UserRole(data["role"]))))
+
+    def to_dict(self) -> dict:
+        return dict(asdict(self), role=self.role.value)
+
+
+def get_principal(subject: str) -> Optional[Principal]:
+    """Снимок из кэша или None"""
+    data = principal_cache.get(subject, "user")
+    return Principal.from_dict(data) if data is not None else None
+
+
+def cache_principal(subject: str, user: User) -> Principal:
+    principal = Principal.from_user(user)
+    principal_cache.set(subject, "user", principal.to_dict())
+    return principal
+
+
+def invalidate_principal(user_id: int, *emails: Optional[str]):
+    """Сбросить снимки пользователя: по id и по email старых токенов"""
+    principal_cache.invalidate(str(user_id), *emails)
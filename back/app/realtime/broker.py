@@ -0,0 +1,268 @@
+"""
+Pub/Sub брокер для доставки WebSocket-сообщений между воркерами.
+
+Каждый воркер подписывается на каналы своих локальных пользователей,
+а отправка идёт через брокер, поэтому сообщение доходит до получателя
+независимо от того, к какому воркеру он подключен. Присутствие
+(кто онлайн) хранится в брокере и общее для всех воркеров.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from typing import Awaitable, Callable, Iterable, Optional, Set
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Обработчик входящих сообщений: (user_id, message) -> None
+DeliveryHandler = Callable[[int, dict], Awaitable[None]]
+
+
+class Broker:
+    """Базовый интерфейс брокера."""
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self._handler: Optional[DeliveryHandler] = None
+
+    def set_handler(self, handler: DeliveryHandler):
+        """Установить обработчик сообщений для локальных пользователей."""
+        self._handler = handler
+
+    async def start(self):
+        """Запустить брокер (подключение, фоновые задачи)."""
+
+    async def stop(self):
+        """Остановить брокер."""
+
+    async def subscribe(self, user_id: int):
+        """Подписать воркер на сообщения пользователя."""
+        raise NotImplementedError
+
+    async def unsubscribe(self, user_id: int):
+        """Отписать воркер от сообщений пользователя."""
+        raise NotImplementedError
+
+    async def publish(self, user_id: int, message: dict) -> bool:
+        """
+        Опубликовать сообщение для пользователя на всех воркерах.
+
+        Возвращает True, если его получил хотя бы один другой воркер.
+        """
+        raise NotImplementedError
+
+    async def is_online(self, user_id: int) -> bool:
+        """Проверить онлайн ли пользователь на каком-либо воркере."""
+        raise NotImplementedError
+
+    async def is_online_elsewhere(self, user_id: int) -> bool:
+        """Проверить подключен ли пользователь к другому воркеру."""
+        raise NotImplementedError
+
+    async def online_among(self, user_ids: Iterable[int]) -> Set[int]:
+        """Кто из user_ids онлайн на каком-либо воркере (одним запросом)."""
+        raise NotImplementedError
+
+    async def get_online_users(self) -> Set[int]:
+        """Получить всех онлайн пользователей на всех воркерах."""
+        raise NotImplementedError
+
+
+class InMemoryBroker(Broker):
+    """Брокер в памяти процесса (один воркер, dev, тесты)."""
+
+    def __init__(self):
+        super().__init__()
+        self._subscriptions: Set[int] = set()
+
+    async def subscribe(self, user_id: int):
+        self._subscriptions.add(user_id)
+
+    async def unsubscribe(self, user_id: int):
+        self._subscriptions.discard(user_id)
+
+    async def publish(self, user_id: int, message: dict) -> bool:
+        # Все подключения в этом же процессе - доставляет сам ConnectionManager
+        return False
+
+    async def is_online(self, user_id: int) -> bool:
+        return user_id in self._subscriptions
+
+    async def is_online_elsewhere(self, user_id: int) -> bool:
+        return False
+
+    async def online_among(self, user_ids: Iterable[int]) -> Set[int]:
+        return self._subscriptions.intersection(user_ids)
+
+    async def get_online_users(self) -> Set[int]:
+        return set(self._subscriptions)
+
+
+class RedisBroker(Broker):
+    """
+    Брокер поверх Redis Pub/Sub.
+
+    - сообщения: канал `chat:user:<id>`, конверт `{"origin", "message"}`;
+    - присутствие: множество `chat:presence:<worker_id>` с TTL, список
+      живых воркеров - в `chat:workers`.
+    """
+
+    CHANNEL_PREFIX = "chat:user:"
+    WORKERS_KEY = "chat:workers"
+    PRESENCE_PREFIX = "chat:presence:"
+
+    def __init__(self, url: str = None, client=None, presence_ttl: int = 60):
+        super().__init__()
+        self.url = url or settings.REDIS_URL
+        self.presence_ttl = presence_ttl
+        self._client = client
+        self._pubsub = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._local_users: Set[int] = set()
+
+    @property
+    def _presence_key(self) -> str:
+        return f"{self.PRESENCE_PREFIX}{self.worker_id}"
+
+    def _channel(self, user_id: int) -> str:
+        return f"{self.CHANNEL_PREFIX}{user_id}"
+
+    async def start(self):
+        if self._client is None:
+            import redis.asyncio as redis
+            self._client = redis.from_url(self.url, decode_responses=True)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        await self._client.sadd(self.WORKERS_KEY, self.worker_id)
+        self._listener_task = asyncio.create_task(self._listen())
+        self._refresh_task = asyncio.create_task(self._refresh_presence())
+        logger.info(f"Redis broker started, worker {self.worker_id}")
+
+    async def stop(self):
+        for task in (self._listener_task, self._refresh_task):
+            if task:
+                task.cancel()
+        await self._client.srem(self.WORKERS_KEY, self.worker_id)
+        await self._client.delete(self._presence_key)
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+
+    async def subscribe(self, user_id: int):
+        self._local_users.add(user_id)
+        await self._pubsub.subscribe(self._channel(user_id))
+        await self._client.sadd(self._presence_key, user_id)
+        await self._client.expire(self._presence_key, self.presence_ttl)
+
+    async def unsubscribe(self, user_id: int):
+        self._local_users.discard(user_id)
+        await self._pubsub.unsubscribe(self._channel(user_id))
+        await self._client.srem(self._presence_key, user_id)
+
+    async def publish(self, user_id: int, message: dict) -> bool:
+        # Без предварительной проверки присутствия: один PUBLISH на фрейм.
+        # Воркеры без подключений пользователя на канал не подписаны, а
+        # PUBLISH возвращает число подписчиков - в том числе этот воркер
+        envelope = json.dumps({"origin": self.worker_id, "message": message})
+        receivers = await self._client.publish(self._channel(user_id), envelope)
+        return receivers > (1 if user_id in self._local_users else 0)
+
+    async def is_online(self, user_id: int) -> bool:
+        if user_id in self._local_users:
+            return True
+        return await self.is_online_elsewhere(user_id)
+
+    async def is_online_elsewhere(self, user_id: int) -> bool:
+        workers = await self._client.smembers(self.WORKERS_KEY)
+        workers.discard(self.worker_id)
+        if not workers:
+            return False
+        pipe = self._client.pipeline()
+        for worker_id in workers:
+            pipe.sismember(f"{self.PRESENCE_PREFIX}{worker_id}", user_id)
+        return any(await pipe.execute())
+
+    async def online_among(self, user_ids: Iterable[int]) -> Set[int]:
+        online = self._local_users.intersection(user_ids)
+        rest = [user_id for user_id in user_ids if user_id not in online]
+        if not rest:
+            return online
+        workers = await self._client.smembers(self.WORKERS_KEY)
+        workers.discard(self.worker_id)
+        if not workers:
+            return online
+        # SMISMEMBER по множеству каждого воркера - один round trip
+        pipe = self._client.pipeline()
+        for worker_id in workers:
+            pipe.smismember(f"{self.PRESENCE_PREFIX}{worker_id}", rest)
+        for flags in await pipe.execute():
+            online.update(user_id for user_id, flag in zip(rest, flags) if flag)
+        return online
+
+    async def get_online_users(self) -> Set[int]:
+        workers = await self._client.smembers(self.WORKERS_KEY)
+        if not workers:
+            return set(self._local_users)
+        keys = [f"{self.PRESENCE_PREFIX}{worker_id}" for worker_id in workers]
+        members = await self._client.sunion(keys)
+        return {int(user_id) for user_id in members} | self._local_users
+
+    async def _listen(self):
+        """Получение сообщений из подписанных каналов."""
+        while True:
+            try:
+                if not self._pubsub.subscribed:
+                    await asyncio.sleep(0.1)
+                    continue
+                item = await self._pubsub.get_message(timeout=1.0)
+                if item is None or item.get("type") != "message":
+                    continue
+                envelope = json.loads(item["data"])
+                # Локальные подключения уже получили сообщение напрямую
+                if envelope.get("origin") == self.worker_id:
+                    continue
+                user_id = int(item["channel"][len(self.CHANNEL_PREFIX):])
+                if self._handler is not None:
+                    await self._handler(user_id, envelope["message"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis broker listener error: {e}")
+                await asyncio.sleep(1)
+
+    async def _refresh_presence(self):
+        """
+        Продление TTL присутствия воркера.
+
+        Если воркер упал, его множество истечёт само и пользователи
+        перестанут считаться онлайн; мёртвые воркеры удаляются из списка.
+        """
+        while True:
+            await asyncio.sleep(self.presence_ttl / 3)
+            try:
+                pipe = self._client.pipeline()
+                pipe.sadd(self.WORKERS_KEY, self.worker_id)
+                if self._local_users:
+                    pipe.sadd(self._presence_key, *self._local_users)
+                    pipe.expire(self._presence_key, self.presence_ttl)
+                await pipe.execute()
+
+                workers = await self._client.smembers(self.WORKERS_KEY)
+                for worker_id in workers:
+                    if worker_id == self.worker_id:
+                        continue
+                    if not await self._client.exists(f"{self.PRESENCE_PREFIX}{worker_id}"):
+                        # Пустое или истёкшее множество - воркер без пользователей или мёртвый
+                        await self._client.srem(self.WORKERS_KEY, worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Redis presence refresh failed: {e}")
+
+
+def create_broker() -> Broker:
+    """Создать брокер согласно настройке CHAT_BROKER."""
+    if settings.CHAT_BROKER == "redis":
+        return RedisBroker(settings.REDIS_URL)
+    return InMemoryBroker()
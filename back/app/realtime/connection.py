@@ -0,0 +1,121 @@
+"""
+Одно WebSocket-соединение с собственной очередью отправки.
+
+Отправка никогда не ждёт клиента: сообщение кладётся в ограниченную
+очередь, а отдельная задача-писатель отправляет их по порядку. Если
+клиент не успевает читать (очередь переполнена или send висит дольше
+таймаута), соединение закрывается - медленный клиент не тормозит
+остальных.
+"""
+import asyncio
+import itertools
+import logging
+from typing import Awaitable, Callable, Optional
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# Код закрытия для медленного клиента: "Try Again Later"
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+_connection_ids = itertools.count(1)
+
+
+class ClientConnection:
+    """Соединение пользователя: очередь отправки, писатель, активность."""
+
+    __slots__ = (
+        "id", "user_id", "websocket", "queue", "send_timeout",
+        "last_activity", "connected_at", "sent_count", "closed",
+        "close_code", "wheel_slot", "_writer_task", "_on_close",
+    )
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: int,
+        queue_size: int,
+        send_timeout: float,
+        on_close: Callable[["ClientConnection"], Awaitable[None]],
+    ):
+        now = asyncio.get_running_loop().time()
+        self.id = next(_connection_ids)
+        self.user_id = user_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.send_timeout = send_timeout
+        self.last_activity = now
+        self.connected_at = now
+        self.sent_count = 0
+        self.closed = False
+        self.close_code: Optional[int] = None
+        # Слот в колесе HeartbeatScheduler
+        self.wheel_slot: Optional[int] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._on_close = on_close
+
+    def start(self):
+        """Запустить задачу-писатель."""
+        self._writer_task = asyncio.create_task(self._writer())
+
+    def touch(self):
+        """Обновить время последней активности."""
+        self.last_activity = asyncio.get_running_loop().time()
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    def send(self, message: dict) -> bool:
+        """Поставить сообщение в очередь. False если соединение закрыто или переполнено."""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            if self.close_code is None:
+                # Закрытие уже запланировано - повторно не логируем
+                self.close_code = SLOW_CONSUMER_CLOSE_CODE
+                logger.warning(
+                    f"Slow consumer: user {self.user_id} connection {self.id}, "
+                    f"queue full ({self.queue.maxsize})"
+                )
+                asyncio.create_task(self.close(SLOW_CONSUMER_CLOSE_CODE, "Slow consumer"))
+            return False
+
+    async def _writer(self):
+        """Отправка сообщений из очереди по порядку."""
+        try:
+            while True:
+                message = await self.queue.get()
+                await asyncio.wait_for(
+                    self.websocket.send_json(message),
+                    timeout=self.send_timeout
+                )
+                self.sent_count += 1
+        except asyncio.CancelledError:
+            return
+        except asyncio.TimeoutError:
+            logger.warning(f"Send timeout for user {self.user_id} connection {self.id}")
+            await self.close(SLOW_CONSUMER_CLOSE_CODE, "Slow consumer")
+        except Exception as e:
+            logger.warning(f"Send failed for user {self.user_id} connection {self.id}: {e}")
+            await self.close()
+
+    async def close(self, code: int = 1000, reason: str = None):
+        """Закрыть соединение и снять его с учёта в менеджере."""
+        if self.closed:
+            return
+        self.closed = True
+        if self.close_code is None:
+            self.close_code = code
+        if self._writer_task is not None and self._writer_task is not asyncio.current_task():
+            self._writer_task.cancel()
+        await self._on_close(self)
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            # Сокет уже закрыт клиентом
+            pass
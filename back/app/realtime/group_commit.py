@@ -0,0 +1,74 @@
+"""
+Групповой коммит сообщений чата.
+
+Сообщения со всех сокетов воркера собираются в течение короткого окна
+и записываются одним многострочным INSERT ... RETURNING в одной
+транзакции - один fsync на пачку вместо одного на сообщение.
+Отправитель получает подтверждение только после commit пачки, так что
+гарантии сохранности те же, что и при записи по одному.
+"""
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from app.crud import message as message_crud
+from app.database import run_db
+from app.schemas import MessageCreate
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitWriter:
+    """Сбор сообщений в пачки и запись одной транзакцией."""
+
+    def __init__(self, window_ms: float = 5, max_batch: int = 500):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.messages = 0
+
+    async def submit(self, message: MessageCreate, sender_id: int):
+        """Записать сообщение; возвращается строка сообщения после commit."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((message, sender_id, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[MessageCreate, int, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        # Окно набора пачки отсчитывается от первого сообщения
+        await asyncio.sleep(self.window)
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                rows = await run_db(
+                    message_crud.create_messages_batch,
+                    [(message, sender_id) for message, sender_id, _ in batch]
+                )
+            except Exception as e:
+                logger.error(f"Group commit of {len(batch)} messages failed: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.messages += len(batch)
+            for (_, _, future), row in zip(batch, rows):
+                if not future.done():
+                    future.set_result(row)
+
+    def get_metrics(self) -> dict:
+        return {
+            "group_commit_batches": self.batches,
+            "group_commit_messages": self.messages,
+            "group_commit_avg_batch": round(self.messages / self.batches, 2) if self.batches else 0,
+        }
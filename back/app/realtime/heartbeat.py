@@ -0,0 +1,100 @@
+"""
+Планировщик heartbeat на хэшированном колесе таймеров.
+
+Интервал делится на слоты; соединение лежит в слоте своего следующего
+дедлайна. Каждый тик обрабатывается только один слот, поэтому ping
+равномерно распределены по интервалу, а проверка и отключение мёртвых
+соединений стоят O(соединений в слоте), а не полного обхода.
+"""
+import asyncio
+import logging
+import math
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.realtime.connection import ClientConnection
+
+logger = logging.getLogger(__name__)
+
+
+class HeartbeatScheduler:
+    """Один планировщик ping/таймаутов на все соединения воркера."""
+
+    def __init__(
+        self,
+        interval: float,
+        on_expired: Callable[[ClientConnection], Awaitable[None]],
+        slots: int = 64,
+    ):
+        self.interval = interval
+        self.slots = slots
+        self.tick = interval / slots
+        self.on_expired = on_expired
+        self._wheel: List[Dict[int, ClientConnection]] = [{} for _ in range(slots)]
+        self._cursor = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Запустить колесо, если ещё не запущено."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def add(self, conn: ClientConnection):
+        """Поставить новое соединение; первый ping - через хэшированный сдвиг."""
+        self._place(conn, (conn.id % self.slots) or self.slots)
+
+    def discard(self, conn: ClientConnection):
+        """Снять соединение с колеса за O(1)."""
+        if conn.wheel_slot is not None:
+            self._wheel[conn.wheel_slot].pop(conn.id, None)
+            conn.wheel_slot = None
+
+    def _place(self, conn: ClientConnection, ticks: int):
+        ticks = min(max(ticks, 1), self.slots)
+        slot = (self._cursor + ticks) % self.slots
+        self._wheel[slot][conn.id] = conn
+        conn.wheel_slot = slot
+
+    def _schedule_at(self, conn: ClientConnection, deadline: float, now: float):
+        self._place(conn, math.ceil((deadline - now) / self.tick))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self.tick
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            self._cursor = (self._cursor + 1) % self.slots
+            bucket, self._wheel[self._cursor] = self._wheel[self._cursor], {}
+            if bucket:
+                try:
+                    await self._process(bucket, loop.time())
+                except Exception as e:
+                    logger.error(f"Heartbeat tick failed: {e}")
+
+    async def _process(self, bucket: Dict[int, ClientConnection], now: float):
+        expired = []
+        for conn in bucket.values():
+            conn.wheel_slot = None
+            idle = now - conn.last_activity
+            if idle > self.interval * 2:
+                # Соединение неактивно более 2 интервалов
+                expired.append(conn)
+            elif idle < self.interval:
+                # Клиент недавно был активен - ping не нужен
+                self._schedule_at(conn, conn.last_activity + self.interval, now)
+            else:
+                # Ping ставится в очередь соединения; отправка идёт
+                # параллельно в писателях с их таймаутом
+                conn.send({"type": "ping", "timestamp": now})
+                self._place(conn, self.slots)
+
+        for conn in expired:
+            logger.info(f"Heartbeat timeout for user {conn.user_id} connection {conn.id}")
+            await self.on_expired(conn)
+
+    def get_metrics(self) -> dict:
+        return {
+            "heartbeat_interval": self.interval,
+            "heartbeat_slots": self.slots,
+            "heartbeat_scheduled": sum(len(bucket) for bucket in self._wheel),
+        }
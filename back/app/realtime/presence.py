@@ -0,0 +1,89 @@
+"""
+Рассылка изменений присутствия (онлайн/офлайн) только заинтересованным.
+
+Вместо полного списка онлайн-пользователей при каждом подключении
+отправляются дельты `user_online` / `user_offline` и только контактам
+пользователя: психологу пациента и пациентам психолога. Частые
+переподключения склеиваются в один пакет за короткий тик.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set
+
+from app.crud import user as user_crud
+from app.database import run_db
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceTracker:
+    """Отслеживание присутствия и пакетная рассылка дельт контактам."""
+
+    def __init__(self, manager, tick: float = 0.25):
+        self.manager = manager
+        self.tick = tick
+        # Контакты подключенных пользователей (загружаются при подключении)
+        self.contacts: Dict[int, Set[int]] = {}
+        # Последнее разосланное состояние: user_id -> online
+        self._published: Dict[int, bool] = {}
+        self._dirty: Set[int] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def load_contacts(self, user_id: int) -> Set[int]:
+        """Загрузить контакты пользователя из БД."""
+        contacts = await run_db(user_crud.get_contact_ids, user_id)
+        self.contacts[user_id] = contacts
+        return contacts
+
+    async def get_online_contacts(self, user_id: int) -> List[int]:
+        """Онлайн-контакты пользователя (начальный снимок при подключении)."""
+        contacts = self.contacts.get(user_id)
+        if not contacts:
+            return []
+        return list(await self.manager.online_among(list(contacts)))
+
+    def mark_changed(self, user_id: int):
+        """Отметить изменение присутствия; рассылка будет в ближайший тик."""
+        self._dirty.add(user_id)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # Изменения, пришедшие во время рассылки, уходят следующим тиком
+        while self._dirty:
+            await asyncio.sleep(self.tick)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Presence flush failed: {e}")
+
+    async def flush(self):
+        """Разослать накопленные дельты, по одному пакету на получателя."""
+        dirty, self._dirty = self._dirty, set()
+        outbox: Dict[int, List[dict]] = {}
+        # Фактическое состояние с учётом других воркеров, одним запросом:
+        # connect+disconnect за один тик не порождают событий
+        online_now = await self.manager.online_among(list(dirty)) if dirty else set()
+
+        for user_id in dirty:
+            online = user_id in online_now
+            if self._published.get(user_id, False) != online:
+                event = {"type": "user_online" if online else "user_offline", "user_id": user_id}
+                for watcher_id in self.contacts.get(user_id, ()):
+                    outbox.setdefault(watcher_id, []).append(event)
+
+            # Состояние помним, только пока у пользователя есть сокеты на этом
+            # воркере: его переходы на других воркерах сюда не доходят, и
+            # при повторном подключении сюда user_online должен уйти снова
+            if online and self.manager.has_local_connection(user_id):
+                self._published[user_id] = True
+            else:
+                self._published.pop(user_id, None)
+                if not self.manager.has_local_connection(user_id):
+                    self.contacts.pop(user_id, None)
+
+        for watcher_id, events in outbox.items():
+            await self.manager.send_personal_message({
+                "type": "presence",
+                "events": events
+            }, watcher_id)
@@ -0,0 +1,206 @@
+"""
+Отзыв JWT: таблица revoked_tokens и фильтр Блума в памяти воркера.
+
+Каждый запрос проверяет jti access-токена. Фильтр отвечает "точно не
+отозван" без запроса к БД; только при срабатывании фильтра (отозванный
+токен или ложное срабатывание, ~REVOCATION_FILTER_ERROR_RATE) jti ищется
+в таблице. В фильтре только access-токены: они живут минуты, поэтому он
+остаётся маленьким. Использованные refresh-токены (ротация) хранятся до
+своего истечения, но проверяются только на /auth/refresh - вставкой.
+Повтор уже использованного refresh-токена отзывает всю его цепочку ротаций
+(fam): строка kind=family с id цепочки вместо jti, её тоже проверяет только
+/auth/refresh.
+
+- при старте фильтр строится из неистёкших строк, истёкшие удаляются;
+- отзыв на этом воркере попадает в фильтр сразу, отзывы других воркеров -
+  не позже чем через REVOCATION_SYNC_INTERVAL: фоновая задача (run_sync)
+  дочитывает новые строки по revoked_at (с перекрытием на разницу часов и
+  долгие транзакции) в пуле потоков со своей сессией;
+- раз в PURGE_INTERVAL и при переполнении фильтр перестраивается заново,
+  истёкшие строки удаляются.
+
+Проверка в запросе - только фильтр и, при срабатывании, поиск по jti.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import run_db
+from app.models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+# Перекрытие окна синхронизации
+SYNC_OVERLAP = timedelta(seconds=60)
+
+# Как часто фильтр перестраивается без переполнения (сек): истёкшие
+# access-токены уходят из фильтра, истёкшие строки - из таблицы
+PURGE_INTERVAL = 60 * 60
+
+ACCESS = "access"
+REFRESH = "refresh"
+FAMILY = "family"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class BloomFilter:
+    """Фильтр Блума на bytearray: m бит и k хэшей из одного blake2b (double hashing)."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(capacity, 1)
+        self.size = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    def __init__(self, capacity: int, error_rate: float, sync_interval: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._filter = BloomFilter(capacity, error_rate)
+        self._lock = threading.Lock()
+        self._synced_until = _utcnow()
+        self._rebuilt_at = time.monotonic()
+        self.checks = 0
+        self.lookups = 0
+        self.false_positives = 0
+
+    def rebuild(self, db: Session) -> int:
+        """Удалить истёкшие строки и построить фильтр заново. Возвращает число jti"""
+        started = _utcnow()
+        db.query(RevokedToken).filter(RevokedToken.expires_at < started).delete(synchronize_session=False)
+        db.commit()
+        jtis = [jti for (jti,) in db.query(RevokedToken.jti).filter(RevokedToken.kind == ACCESS)]
+        bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        with self._lock:
+            self._filter = bloom
+            self._synced_until = started
+            self._rebuilt_at = time.monotonic()
+        return len(jtis)
+
+    def sync(self, db: Session) -> int:
+        """Дочитать отзывы других воркеров; при переполнении - перестроить фильтр"""
+        since = self._synced_until - SYNC_OVERLAP
+        started = _utcnow()
+        jtis = [jti for (jti,) in db.query(RevokedToken.jti).filter(
+            RevokedToken.kind == ACCESS,
+            RevokedToken.revoked_at >= since
+        )]
+        with self._lock:
+            for jti in jtis:
+                # Окна пересекаются: уже добавленные не считаем повторно
+                if jti not in self._filter:
+                    self._filter.add(jti)
+            self._synced_until = started
+            overflow = self._filter.count > self._filter.capacity
+        if overflow:
+            self.rebuild(db)
+        return len(jtis)
+
+    async def run_sync(self):
+        """Фоновая задача воркера: sync каждые sync_interval, rebuild раз в PURGE_INTERVAL"""
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                if time.monotonic() - self._rebuilt_at >= PURGE_INTERVAL:
+                    await run_db(self.rebuild)
+                else:
+                    await run_db(self.sync)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Revocation list sync failed: {e}")
+
+    def might_be_revoked(self, jti: str) -> bool:
+        """Проверка по фильтру, без БД: False - токен точно не отозван"""
+        self.checks += 1
+        return jti in self._filter
+
+    def lookup(self, db: Session, jti: str) -> bool:
+        """Отозван ли токен - по таблице (после срабатывания фильтра)"""
+        self.lookups += 1
+        if db.get(RevokedToken, jti) is not None:
+            return True
+        self.false_positives += 1
+        return False
+
+    def is_revoked(self, db: Session, jti: str) -> bool:
+        """Отозван ли access-токен; запрос к БД только при срабатывании фильтра"""
+        return self.might_be_revoked(jti) and self.lookup(db, jti)
+
+    def revoke(self, db: Session, jti: str, kind: str, expires_at: datetime, user_id: int | None = None) -> bool:
+        """
+        Отозвать токен. False - он уже был отозван (в том числе параллельным
+        запросом): вставка по первичному ключу jti атомарна.
+        """
+        if expires_at.tzinfo is not None:
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+        db.add(RevokedToken(
+            jti=jti, kind=kind, user_id=user_id, expires_at=expires_at, revoked_at=_utcnow()
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return False
+        if kind == ACCESS:
+            with self._lock:
+                self._filter.add(jti)
+        return True
+
+    def revoke_family(self, db: Session, family: str, user_id: int | None = None) -> bool:
+        """Отозвать цепочку refresh-токенов. False - она уже отозвана"""
+        # Последний токен цепочки выдан не позже, чем сейчас
+        expires_at = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        return self.revoke(db, family, FAMILY, expires_at, user_id)
+
+    def is_family_revoked(self, db: Session, family: str) -> bool:
+        """Отозвана ли цепочка refresh-токенов - по таблице"""
+        row = db.get(RevokedToken, family)
+        return row is not None and row.kind == FAMILY
+
+    def get_metrics(self) -> dict:
+        return {
+            "checks": self.checks,
+            "db_lookups": self.lookups,
+            "false_positives": self.false_positives,
+            "filter_entries": self._filter.count,
+            "filter_bits": self._filter.size,
+            "filter_hashes": self._filter.hashes,
+        }
+
+
+revocation_list = RevocationList(
+    capacity=settings.REVOCATION_FILTER_CAPACITY,
+    error_rate=settings.REVOCATION_FILTER_ERROR_RATE,
+    sync_interval=settings.REVOCATION_SYNC_INTERVAL,
+)
@@ -1,11 +1,21 @@
+from datetime import datetime, timezone
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from jose import JWTError
 from sqlalchemy.orm import Session
 
 from app.crud import user as user_crud
-from app.schemas import UserCreate, UserOut, Token
-from app.security import verify_password, create_access_token
-from app.dependencies import get_db
+from app.crud import activity as activity_crud
+from app.schemas import UserCreate, UserOut, Token, RefreshRequest
+from app.security import (
+    decode_token, hash_password_async, issue_tokens,
+    password_needs_rehash, verify_password_async, verified_tokens
+)
+from app.dependencies import get_db, get_current_user, oauth2_scheme, require_metrics_token
+from app.principal import Principal, principal_cache
+from app.revocation import ACCESS, REFRESH, revocation_list
+from app.database import run_db
 
 router = APIRouter(
     prefix="/auth",
@@ -22,24 +32,100 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
             status_code=400, 
             detail="Email already registered"
         )
-    return user_crud.create_user(db=db, user=user)
+    db_user = user_crud.create_user(db=db, user=user)
+    # Новый пациент появляется в списке психолога
+    activity_crud.invalidate(db_user.linked_psychologist_id)
+    return db_user
 
 
 @router.post("/login", response_model=Token)
-def login_for_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(get_db)
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends()
 ):
     """Авторизация и получение токена"""
     # OAuth2PasswordRequestForm всегда использует поле .username
-    user = user_crud.get_user_by_email(db, email=form_data.username)
+    user = await run_db(user_crud.get_user_by_email, email=form_data.username)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token = create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
+    # Хэш со старым work factor пересчитываем, пока знаем пароль
+    if password_needs_rehash(user.hashed_password):
+        hashed_password = await hash_password_async(form_data.password)
+        await run_db(user_crud.set_password_hash, user.id, hashed_password)
+
+    return issue_tokens(user.id, user.role.value, user.token_version)
+
+
+@router.post("/refresh", response_model=Token)
+def refresh_access_token(body: RefreshRequest, db: Session = Depends(get_db)):
+    """
+    Новая пара токенов по refresh-токену.
+
+    Refresh-токен одноразовый: использованный отзывается, повторное
+    предъявление (в том числе параллельное) отклоняется и отзывает всю
+    цепочку - токен мог утечь. После смены пароля выданные раньше
+    refresh-токены не принимаются.
+    """
+    invalid_token = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = decode_token(body.refresh_token, REFRESH)
+    except JWTError:
+        raise invalid_token
+    subject = payload.get("sub")
+    if payload.get("jti") is None or subject is None or not subject.isdigit():
+        raise invalid_token
+
+    user = user_crud.get_user(db, int(subject))
+    if user is None or payload.get("ver", 0) != user.token_version:
+        raise invalid_token
+    # У токенов, выданных до цепочек, fam нет - ротация начинает новую
+    family = payload.get("fam")
+    if family is not None and revocation_list.is_family_revoked(db, family):
+        raise invalid_token
+    expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc)
+    if not revocation_list.revoke(db, payload["jti"], REFRESH, expires_at, user.id):
+        if family is not None:
+            revocation_list.revoke_family(db, family, user.id)
+        raise invalid_token
+    return issue_tokens(user.id, user.role.value, user.token_version, family)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    body: RefreshRequest | None = None,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Отозвать текущий access-токен и (если передан) refresh-токен"""
+    payload = decode_token(token)
+    if payload.get("jti") is not None:
+        expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc)
+        revocation_list.revoke(db, payload["jti"], ACCESS, expires_at, current_user.id)
+    if body is not None:
+        try:
+            refresh = decode_token(body.refresh_token, REFRESH)
+        except JWTError:
+            return
+        if refresh.get("jti") is not None and refresh.get("sub") == str(current_user.id):
+            expires_at = datetime.fromtimestamp(refresh["exp"], timezone.utc)
+            revocation_list.revoke(db, refresh["jti"], REFRESH, expires_at, current_user.id)
+
+
+@router.get("/metrics", dependencies=[Depends(require_metrics_token)])
+def get_auth_metrics():
+    """Метрики проверки токенов этого воркера: кэш JWT, кэш пользователей, отзыв"""
+    return {
+        "jwt_cache": verified_tokens.get_metrics(),
+        "principal_cache": principal_cache.get_metrics(),
+        "revocation": revocation_list.get_metrics(),
+    }
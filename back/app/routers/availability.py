@@ -5,7 +5,8 @@ from typing import List
 
 from app.database import get_db
 from app.dependencies import get_current_user
-from app.models.user import User, UserRole
+from app.principal import Principal
+from app.models.user import UserRole
 from app.schemas.availability import AvailabilityCreate, AvailabilityResponse, AvailabilityBulkCreate
 from app.crud import availability as crud_availability
 
@@ -18,7 +19,7 @@ router = APIRouter(
 def create_availability(
     availability: AvailabilityCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Создать доступное время для психолога"""
     if current_user.role != UserRole.PSYCHOLOGIST:
@@ -32,7 +33,7 @@ def create_availability(
 def bulk_create_availability(
     bulk_data: AvailabilityBulkCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Массовое добавление доступных времён на дату"""
     if current_user.role != UserRole.PSYCHOLOGIST:
@@ -70,7 +71,7 @@ def get_availability(
 def delete_availability(
     availability_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Удалить доступное время"""
     if current_user.role != UserRole.PSYCHOLOGIST:
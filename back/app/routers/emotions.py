@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import date, datetime, timedelta, timezone
 
 from app.crud import user as user_crud, emotion as emotion_crud
-from app.schemas import EmotionCreate, EmotionOut, PatientOut
+from app.schemas import (
+    EmotionCreate, EmotionOut, EmotionStats, EmotionBatchCreate, EmotionBatchOut, PatientOut
+)
 from app.models import User, UserRole
 from app.dependencies import get_db, get_current_user
+from app.principal import Principal
+from app.utils.export import export_response
 
 router = APIRouter(
     prefix="/emotions",
@@ -17,7 +22,7 @@ router = APIRouter(
 def create_emotion(
     emotion: EmotionCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Создать запись об эмоции (только для пациентов)"""
     if current_user.role == UserRole.PSYCHOLOGIST:
@@ -28,26 +33,75 @@ def create_emotion(
     return emotion_crud.create_emotion(db=db, emotion=emotion, user_id=current_user.id)
 
 
+@router.post("/batch", response_model=EmotionBatchOut)
+def create_emotions_batch(
+    batch: EmotionBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Синхронизировать офлайн-записи пачкой (до 5000); повторы по client_id пропускаются"""
+    if current_user.role == UserRole.PSYCHOLOGIST:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Психологи не могут создавать записи об эмоциях"
+        )
+    results = emotion_crud.create_emotions_batch(db, batch.items, current_user.id)
+    return {
+        "created": sum(1 for result in results if result["status"] == "created"),
+        "duplicates": sum(1 for result in results if result["status"] == "duplicate"),
+        "rejected": sum(1 for result in results if result["status"] == "rejected"),
+        "results": results
+    }
+
+
+# points: прореженный ряд для графика за всю историю вместо страницы skip/limit
+POINTS_QUERY = Query(None, ge=3, le=5000)
+
+
+def _list_emotions(db: Session, user_id: int, skip: int, limit: int, points: Optional[int]):
+    if points is not None:
+        return emotion_crud.get_user_emotions_downsampled(db, user_id, points)
+    return emotion_crud.get_user_emotions(db=db, user_id=user_id, skip=skip, limit=limit)
+
+
 @router.get("/", response_model=List[EmotionOut])
 def get_my_emotions(
     skip: int = 0,
     limit: int = 100,
+    points: Optional[int] = POINTS_QUERY,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Получить свои эмоции (для пациентов)"""
-    return emotion_crud.get_user_emotions(db=db, user_id=current_user.id, skip=skip, limit=limit)
+    return _list_emotions(db, current_user.id, skip, limit, points)
 
 
-@router.get("/patient/{patient_id}", response_model=List[EmotionOut])
-def get_patient_emotions(
-    patient_id: int,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Получить эмоции пациента (только для психолога, к которому привязан пациент)"""
+def _build_stats(
+    db: Session,
+    user_id: int,
+    bucket: str,
+    date_from: Optional[date],
+    date_to: Optional[date]
+) -> dict:
+    """Статистика за период; по умолчанию - последние 30 дней"""
+    # Дни - в UTC, как и в дневных агрегатах (emotion_daily_rollup)
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from не может быть позже date_to"
+        )
+    return {
+        "bucket": bucket,
+        "date_from": date_from,
+        "date_to": date_to,
+        "buckets": emotion_crud.get_emotion_stats(db, user_id, date_from, date_to, bucket)
+    }
+
+
+def _get_linked_patient(db: Session, patient_id: int, current_user: Principal) -> User:
+    """Пациент психолога; 403/404 если доступа нет"""
     # Проверяем, что текущий пользователь — психолог
     if current_user.role != UserRole.PSYCHOLOGIST:
         raise HTTPException(
@@ -56,7 +110,7 @@ def get_patient_emotions(
         )
     
     # Проверяем, что пациент привязан к этому психологу
-    patient = db.query(User).filter(User.id == patient_id).first()
+    patient = user_crud.get_user(db, patient_id)
     if not patient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -68,14 +122,67 @@ def get_patient_emotions(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Этот пациент не привязан к вам"
         )
-    
-    return emotion_crud.get_user_emotions(db=db, user_id=patient_id, skip=skip, limit=limit)
+    return patient
+
+
+@router.get("/stats", response_model=EmotionStats)
+def get_my_emotion_stats(
+    bucket: str = Query("day", pattern="^(day|week|month)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Статистика своих эмоций по дням/неделям/месяцам"""
+    return _build_stats(db, current_user.id, bucket, date_from, date_to)
+
+
+@router.get("/patient/{patient_id}", response_model=List[EmotionOut])
+def get_patient_emotions(
+    patient_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    points: Optional[int] = POINTS_QUERY,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Получить эмоции пациента (только для психолога, к которому привязан пациент)"""
+    _get_linked_patient(db, patient_id, current_user)
+    return _list_emotions(db, patient_id, skip, limit, points)
+
+
+@router.get("/patient/{patient_id}/export")
+def export_patient_emotions(
+    patient_id: int,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Выгрузить всю историю эмоций пациента потоком (CSV или NDJSON, опционально gzip)"""
+    _get_linked_patient(db, patient_id, current_user)
+    statement, columns = emotion_crud.export_query(patient_id)
+    return export_response(statement, columns, format, f"emotions_patient_{patient_id}", gzip)
+
+
+@router.get("/patient/{patient_id}/stats", response_model=EmotionStats)
+def get_patient_emotion_stats(
+    patient_id: int,
+    bucket: str = Query("day", pattern="^(day|week|month)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Статистика эмоций пациента (только для психолога, к которому привязан пациент)"""
+    _get_linked_patient(db, patient_id, current_user)
+    return _build_stats(db, patient_id, bucket, date_from, date_to)
 
 
 @router.get("/patients", response_model=List[PatientOut])
 def get_my_patients(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Получить список своих пациентов (только для психологов)"""
     if current_user.role != UserRole.PSYCHOLOGIST:
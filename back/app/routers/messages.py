@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, UploadFile, File, Form, Query
 from sqlalchemy.orm import Session
-from typing import Dict, List
+from pydantic import ValidationError
+from typing import Dict, List, Optional, Set
 import json
 import asyncio
 import logging
 
-from app.models import User, UserRole, Message
-from app.schemas import PatientOut, UserOut, MessageCreate, MessageOut
-from app.dependencies import get_db, get_current_user
+from app.models import User, UserRole
+from app.schemas import PatientOut, UserOut, MessageCreate, MessageOut, MessageHistoryPage
+from app.dependencies import authenticate, get_db, get_current_user, require_metrics_token
+from app.principal import Principal
+from app.database import run_db
 from app.crud import message as message_crud
+from app.crud import user as user_crud
 from app.utils.files import save_upload_file
+from app.utils.export import export_response
+from app.config import settings
+from app.realtime.broker import Broker, create_broker
+from app.realtime.connection import ClientConnection, SLOW_CONSUMER_CLOSE_CODE
+from app.realtime.heartbeat import HeartbeatScheduler
+from app.realtime.group_commit import GroupCommitWriter
+from app.realtime.presence import PresenceTracker
 
 logger = logging.getLogger(__name__)
 
@@ -21,214 +32,374 @@ router = APIRouter(
 
 # WebSocket manager для управления соединениями
 class ConnectionManager:
-    """Улучшенный менеджер соединений с поддержкой heartbeats."""
+    """
+    Менеджер соединений с поддержкой heartbeats.
+
+    У пользователя может быть несколько соединений (вкладки, устройства);
+    у каждого своя очередь отправки, поэтому медленный клиент не блокирует
+    отправителя.
+    """
     
-    def __init__(self, heartbeat_interval: int = 30):
-        self.active_connections: Dict[int, WebSocket] = {}
-        self.last_activity: Dict[int, float] = {}
+    def __init__(
+        self,
+        heartbeat_interval: int = 30,
+        broker: Broker = None,
+        send_queue_size: int = None,
+        send_timeout: float = None,
+    ):
+        self.active_connections: Dict[int, Set[ClientConnection]] = {}
         self.heartbeat_interval = heartbeat_interval
-        self._heartbeat_task = None
+        self.send_queue_size = send_queue_size or settings.WS_SEND_QUEUE_SIZE
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT
+        self.heartbeat = HeartbeatScheduler(heartbeat_interval, on_expired=self.disconnect)
+        self.broker = broker or create_broker()
+        self.broker.set_handler(self._deliver_local)
+        self._broker_started = False
+        self.presence = PresenceTracker(self)
+        self.slow_consumer_disconnects = 0
     
-    async def start_heartbeat(self):
-        """Запустить background задачу для отправки heartbeats."""
-        if self._heartbeat_task is None or self._heartbeat_task.done():
-            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+    async def start_broker(self):
+        """Запустить брокер при первом подключении."""
+        if not self._broker_started:
+            self._broker_started = True
+            await self.broker.start()
     
-    async def _heartbeat_loop(self):
-        """Периодическая отправка ping всем активным соединениям."""
-        while True:
-            await asyncio.sleep(self.heartbeat_interval)
-            now = asyncio.get_event_loop().time()
-            
-            # Проверяем и отправляем heartbeat
-            disconnected = []
-            for user_id in list(self.active_connections.keys()):
-                try:
-                    # Проверяем время последней активности
-                    last_active = self.last_activity.get(user_id, now)
-                    if now - last_active > self.heartbeat_interval * 2:
-                        # Соеждение неактивно более 2 интервалов
-                        disconnected.append(user_id)
-                        continue
-                    
-                    # Отправляем ping
-                    ws = self.active_connections[user_id]
-                    await ws.send_json({"type": "ping", "timestamp": now})
-                except Exception as e:
-                    logger.warning(f"Heartbeat failed for user {user_id}: {e}")
-                    disconnected.append(user_id)
-            
-            # Отключаем неактивные соединения
-            for user_id in disconnected:
-                self.disconnect(user_id)
+    def start_heartbeat(self):
+        """Запустить планировщик heartbeats, если ещё не запущен."""
+        self.heartbeat.start()
     
-    async def connect(self, websocket: WebSocket, user_id: int):
-        """Подключение нового пользователя."""
+    async def connect(self, websocket: WebSocket, user_id: int) -> ClientConnection:
+        """Подключение нового соединения пользователя."""
         await websocket.accept()
-        self.active_connections[user_id] = websocket
-        self.last_activity[user_id] = asyncio.get_event_loop().time()
+        conn = ClientConnection(
+            websocket,
+            user_id,
+            queue_size=self.send_queue_size,
+            send_timeout=self.send_timeout,
+            on_close=self._remove,
+        )
+        conn.start()
+        self.heartbeat.add(conn)
+        
+        connections = self.active_connections.setdefault(user_id, set())
+        connections.add(conn)
+        
+        if len(connections) == 1:
+            # Подписываемся на сообщения пользователя с других воркеров
+            await self.start_broker()
+            await self.broker.subscribe(user_id)
+            
+            # Контакты для рассылки присутствия; сама рассылка - в ближайший тик
+            await self.presence.load_contacts(user_id)
+            self.presence.mark_changed(user_id)
         
         # Запускаем heartbeat если ещё не запущен
-        await self.start_heartbeat()
+        self.start_heartbeat()
         
-        logger.info(f"User {user_id} connected via WebSocket")
+        logger.info(f"User {user_id} connected via WebSocket (connection {conn.id})")
+        return conn
+    
+    async def disconnect(self, conn: ClientConnection):
+        """Отключение соединения."""
+        await conn.close()
     
-    def disconnect(self, user_id: int):
-        """Отключение пользователя."""
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-        if user_id in self.last_activity:
-            del self.last_activity[user_id]
-        logger.info(f"User {user_id} disconnected from WebSocket")
+    async def _remove(self, conn: ClientConnection):
+        """Снять закрытое соединение с учёта."""
+        connections = self.active_connections.get(conn.user_id)
+        if not connections or conn not in connections:
+            return
+        connections.discard(conn)
+        self.heartbeat.discard(conn)
+        if conn.close_code == SLOW_CONSUMER_CLOSE_CODE:
+            self.slow_consumer_disconnects += 1
+        if not connections:
+            # Последнее соединение пользователя на этом воркере
+            del self.active_connections[conn.user_id]
+            await self.broker.unsubscribe(conn.user_id)
+            self.presence.mark_changed(conn.user_id)
+        logger.info(f"User {conn.user_id} disconnected from WebSocket (connection {conn.id})")
     
-    def update_activity(self, user_id: int):
-        """Обновить время последней активности."""
-        self.last_activity[user_id] = asyncio.get_event_loop().time()
+    def has_local_connection(self, user_id: int) -> bool:
+        """Подключен ли пользователь к этому воркеру."""
+        return user_id in self.active_connections
+    
+    async def _deliver_local(self, user_id: int, message: dict) -> bool:
+        """Поставить сообщение в очереди всех локальных соединений пользователя."""
+        delivered = False
+        for conn in list(self.active_connections.get(user_id, ())):
+            delivered = conn.send(message) or delivered
+        return delivered
     
     async def send_personal_message(self, message: dict, user_id: int) -> bool:
         """Отправить сообщение пользователю. Возвращает True если успешно."""
-        if user_id in self.active_connections:
-            try:
-                await self.active_connections[user_id].send_json(message)
-                self.update_activity(user_id)
-                return True
-            except Exception as e:
-                logger.error(f"Failed to send message to user {user_id}: {e}")
-                self.disconnect(user_id)
-        return False
+        delivered = await self._deliver_local(user_id, message)
+        # Пользователь может быть подключен и к другим воркерам
+        if await self.broker.publish(user_id, message):
+            delivered = True
+        return delivered
     
-    def get_online_users(self) -> List[int]:
-        """Получить список онлайн пользователей."""
-        return list(self.active_connections.keys())
+    def get_metrics(self) -> dict:
+        """Метрики соединений и очередей отправки этого воркера."""
+        depths = [
+            conn.queue_depth
+            for connections in self.active_connections.values()
+            for conn in connections
+        ]
+        return {
+            "users": len(self.active_connections),
+            "connections": len(depths),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "queue_capacity": self.send_queue_size,
+            "slow_consumer_disconnects": self.slow_consumer_disconnects,
+            **self.heartbeat.get_metrics(),
+        }
     
-    def is_online(self, user_id: int) -> bool:
-        """Проверить онлайн ли пользователь."""
-        return user_id in self.active_connections
+    async def get_online_users(self) -> List[int]:
+        """Получить список онлайн пользователей (на всех воркерах)."""
+        return list(await self.broker.get_online_users())
+    
+    async def is_online(self, user_id: int) -> bool:
+        """Проверить онлайн ли пользователь (на любом воркере)."""
+        return await self.broker.is_online(user_id)
+
+    async def online_among(self, user_ids) -> Set[int]:
+        """Кто из user_ids онлайн (на любом воркере), одним запросом к брокеру."""
+        return await self.broker.online_among(user_ids)
 
 
 manager = ConnectionManager(heartbeat_interval=30)
 
 
+# Групповой коммит включается настройкой CHAT_GROUP_COMMIT
+message_writer = GroupCommitWriter(
+    window_ms=settings.CHAT_GROUP_COMMIT_WINDOW_MS,
+    max_batch=settings.CHAT_GROUP_COMMIT_MAX_BATCH
+) if settings.CHAT_GROUP_COMMIT else None
+
+
+def _message_payload(db_message) -> dict:
+    """Сообщение (ORM-объект или строка RETURNING) в виде dict для WebSocket."""
+    return {
+        "id": db_message.id,
+        "content": db_message.content,
+        "sender_id": db_message.sender_id,
+        "recipient_id": db_message.recipient_id,
+        "timestamp": db_message.timestamp.isoformat(),
+        "is_read": db_message.is_read,
+        "seq": db_message.seq
+    }
+
+
+def _resume_payload(db: Session, user_id: int, peer_id: int, last_seq: int, limit: int) -> dict:
+    """Сообщения переписки, пропущенные клиентом (seq > last_seq)."""
+    messages, has_more = message_crud.get_messages_after_seq(db, user_id, peer_id, last_seq, limit)
+    return {
+        "type": "resume",
+        "peer_id": peer_id,
+        "messages": [_message_payload(m) for m in messages],
+        "has_more": has_more
+    }
+
+
+def _create_message_payload(db: Session, message: MessageCreate, sender_id: int) -> dict:
+    """Сохранить сообщение и вернуть его в виде dict для отправки по WebSocket."""
+    return _message_payload(message_crud.create_message(db, message, sender_id))
+
+
+async def persist_message(message: MessageCreate, sender_id: int) -> dict:
+    """Сохранить сообщение из WebSocket; подтверждение возвращается только после commit."""
+    if message_writer is not None:
+        return _message_payload(await message_writer.submit(message, sender_id))
+    # Коммит выполняется в пуле потоков и не блокирует event loop
+    return await run_db(_create_message_payload, message, sender_id)
+
+
+class FrameError(ValueError):
+    """Некорректный фрейм клиента: отвечаем фреймом error, соединение не рвём."""
+
+
+def _frame_int(frame: dict, key: str, default: Optional[int] = None) -> int:
+    value = frame.get(key, default)
+    if value is None:
+        raise FrameError(f"Поле {key} обязательно")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise FrameError(f"Поле {key} должно быть числом")
+
+
+def _can_chat(db: Session, principal: Principal, peer_id: int) -> bool:
+    """Те же правила, что и для истории чата: пациент - психолог"""
+    try:
+        _check_chat_access(db, principal, peer_id)
+    except HTTPException:
+        return False
+    return True
+
+
+async def _authenticate_websocket(token: Optional[str], user_id: int) -> Optional[Principal]:
+    """Пользователь по токену подключения; None, если токена нет или он чужой"""
+    if not token:
+        return None
+    try:
+        principal = await authenticate(token)
+    except HTTPException:
+        return None
+    return principal if principal.id == user_id else None
+
+
 @router.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int, db: Session = Depends(get_db)):
-    await manager.connect(websocket, user_id)
+async def websocket_endpoint(websocket: WebSocket, user_id: int, token: Optional[str] = Query(None)):
+    # Браузерный WebSocket не передаёт заголовки - access-токен в query-параметре
+    principal = await _authenticate_websocket(token, user_id)
+    if principal is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    conn = await manager.connect(websocket, user_id)
+    # Результаты проверки доступа к перепискам на время соединения
+    allowed_peers: Dict[int, bool] = {}
+
+    async def peer_from(frame: dict, key: str) -> int:
+        peer_id = _frame_int(frame, key)
+        if peer_id not in allowed_peers:
+            allowed_peers[peer_id] = await run_db(_can_chat, principal, peer_id)
+        if not allowed_peers[peer_id]:
+            raise FrameError("Нет доступа к переписке")
+        return peer_id
     
-    # Проверка авторизации (опционально)
     try:
-        # Отправляем список онлайн пользователей
-        await websocket.send_json({
+        # Отправляем начальный снимок: какие из контактов сейчас онлайн.
+        # Дальше клиент получает только дельты presence от PresenceTracker
+        conn.send({
             "type": "online_status",
-            "online_users": manager.get_online_users(),
+            "online_users": await manager.presence.get_online_contacts(user_id),
             "heartbeat_interval": manager.heartbeat_interval
         })
-        
-        # Уведомляем других о новом онлайн пользователе
-        for uid in manager.get_online_users():
-            if uid != user_id:
-                await manager.send_personal_message({
-                    "type": "online_status",
-                    "online_users": manager.get_online_users()
-                }, uid)
 
         while True:
+            # Ping и отключение по таймауту делает общий HeartbeatScheduler
+            data = await websocket.receive_text()
+            
+            # Обновляем активность
+            conn.touch()
+
             try:
-                # Таймаут для receive - позволяет обрабатывать heartbeats
-                data = await asyncio.wait_for(
-                    websocket.receive_text(),
-                    timeout=manager.heartbeat_interval * 2
-                )
                 message_data = json.loads(data)
-                
-                msg_type = message_data.get("type")
-                
-                # Обновляем активность
-                manager.update_activity(user_id)
-                
-                if msg_type == "ping":
-                    # Отвечаем на ping
-                    await websocket.send_json({
-                        "type": "pong",
-                        "timestamp": asyncio.get_event_loop().time()
-                    })
-                    
-                elif msg_type == "message":
-                    # Создаем сообщение в БД
-                    message = MessageCreate(
-                        content=message_data["content"],
-                        recipient_id=message_data["recipient_id"]
-                    )
-                    db_message = message_crud.create_message(db, message, user_id)
-                    
-                    # Отправляем получателю
-                    await manager.send_personal_message({
-                        "type": "message",
-                        "message": {
-                            "id": db_message.id,
-                            "content": db_message.content,
-                            "sender_id": db_message.sender_id,
-                            "recipient_id": db_message.recipient_id,
-                            "timestamp": db_message.timestamp.isoformat(),
-                            "is_read": db_message.is_read
-                        }
-                    }, message_data["recipient_id"])
-                    
-                    # Отправляем отправителю подтверждение
-                    await manager.send_personal_message({
-                        "type": "message",
-                        "message": {
-                            "id": db_message.id,
-                            "content": db_message.content,
-                            "sender_id": db_message.sender_id,
-                            "recipient_id": db_message.recipient_id,
-                            "timestamp": db_message.timestamp.isoformat(),
-                            "is_read": db_message.is_read
-                        }
-                    }, user_id)
-                    
-                elif msg_type == "typing":
-                    # Уведомляем получателя о печати
-                    await manager.send_personal_message({
-                        "type": "typing",
-                        "user_id": user_id
-                    }, message_data["recipient_id"])
-                    
-                elif msg_type == "mark_read":
-                    # Отмечаем сообщения как прочитанные
-                    message_crud.mark_messages_as_read(
-                        db, 
-                        message_data["sender_id"], 
-                        user_id
-                    )
-                    
-            except asyncio.TimeoutError:
-                # Таймаут - отправляем ping
-                try:
-                    await websocket.send_json({"type": "ping", "timestamp": asyncio.get_event_loop().time()})
-                except:
-                    break
+                if not isinstance(message_data, dict):
+                    raise FrameError("Фрейм должен быть JSON-объектом")
+                await _handle_frame(conn, user_id, message_data, peer_from)
+            except (FrameError, ValidationError, json.JSONDecodeError) as e:
+                conn.send({"type": "error", "detail": str(e)})
                 
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
-        # Уведомляем других об отключении
-        for uid in manager.get_online_users():
-            await manager.send_personal_message({
-                "type": "online_status",
-                "online_users": manager.get_online_users()
-            }, uid)
+        # Контакты получат user_offline через PresenceTracker
+        await manager.disconnect(conn)
     except Exception as e:
         logger.error(f"WebSocket error for user {user_id}: {e}")
-        manager.disconnect(user_id)
+        await manager.disconnect(conn)
+
+
+async def _handle_frame(conn: ClientConnection, user_id: int, message_data: dict, peer_from):
+    """Обработать один фрейм клиента; FrameError - фрейм некорректен"""
+    msg_type = message_data.get("type")
+    
+    if msg_type == "ping":
+        # Отвечаем на ping
+        conn.send({
+            "type": "pong",
+            "timestamp": asyncio.get_event_loop().time()
+        })
+        
+    elif msg_type == "message":
+        recipient_id = await peer_from(message_data, "recipient_id")
+        # Создаем сообщение в БД
+        message = MessageCreate(
+            content=message_data.get("content"),
+            recipient_id=recipient_id
+        )
+        payload = await persist_message(message, user_id)
+        
+        # Отправляем получателю
+        await manager.send_personal_message({
+            "type": "message",
+            "message": payload
+        }, recipient_id)
+        
+        # Отправляем отправителю подтверждение
+        await manager.send_personal_message({
+            "type": "message",
+            "message": payload
+        }, user_id)
+        
+    elif msg_type == "typing":
+        # Уведомляем получателя о печати
+        await manager.send_personal_message({
+            "type": "typing",
+            "user_id": user_id
+        }, await peer_from(message_data, "recipient_id"))
+        
+    elif msg_type == "resume":
+        # Клиент переподключился: досылаем сообщения после его last_seq
+        peer_id = await peer_from(message_data, "peer_id")
+        last_seq = _frame_int(message_data, "last_seq", 0)
+        limit = min(max(_frame_int(message_data, "limit", 100), 1), 500)
+        conn.send(await run_db(_resume_payload, user_id, peer_id, last_seq, limit))
+
+    elif msg_type == "ack":
+        # Клиент получил сообщения собеседника до seq включительно
+        peer_id = await peer_from(message_data, "peer_id")
+        up_to_seq = await run_db(
+            message_crud.mark_messages_as_delivered,
+            peer_id,
+            user_id,
+            _frame_int(message_data, "seq")
+        )
+        if up_to_seq:
+            await manager.send_personal_message({
+                "type": "receipt",
+                "status": "delivered",
+                "peer_id": user_id,
+                "up_to_seq": up_to_seq
+            }, peer_id)
+
+    elif msg_type == "mark_read":
+        # Отмечаем сообщения как прочитанные
+        sender_id = await peer_from(message_data, "sender_id")
+        count, up_to_seq = await run_db(
+            message_crud.mark_messages_as_read,
+            sender_id,
+            user_id
+        )
+        if count:
+            # Квитанция о прочтении отправителю
+            await manager.send_personal_message({
+                "type": "receipt",
+                "status": "read",
+                "peer_id": user_id,
+                "up_to_seq": up_to_seq
+            }, sender_id)
+
+
+@router.get("/ws/metrics", dependencies=[Depends(require_metrics_token)])
+def get_ws_metrics():
+    """Метрики WebSocket-соединений этого воркера (очереди отправки, отключения)"""
+    metrics = manager.get_metrics()
+    if message_writer is not None:
+        metrics.update(message_writer.get_metrics())
+    return metrics
 
 
 @router.post("/", response_model=MessageOut)
 def send_message(
     message: MessageCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Отправить сообщение (HTTP fallback)"""
     # Проверяем права доступа
-    recipient = db.query(User).filter(User.id == message.recipient_id).first()
+    recipient = user_crud.get_user(db, message.recipient_id)
     if not recipient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -257,7 +428,7 @@ def send_message(
 @router.get("/patients", response_model=List[PatientOut])
 def get_my_patients(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Получить список своих пациентов для чата (только для психологов)"""
     if current_user.role != UserRole.PSYCHOLOGIST:
@@ -277,7 +448,7 @@ def get_my_patients(
 @router.get("/therapist", response_model=UserOut)
 def get_my_therapist(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Получить своего психолога для чата (только для пациентов)"""
     if current_user.role != UserRole.USER:
@@ -292,7 +463,7 @@ def get_my_therapist(
             detail="У вас нет привязанного психолога"
         )
     
-    therapist = db.query(User).filter(User.id == current_user.linked_psychologist_id).first()
+    therapist = user_crud.get_user(db, current_user.linked_psychologist_id)
     
     if not therapist:
         raise HTTPException(
@@ -303,15 +474,9 @@ def get_my_therapist(
     return therapist
 
 
-@router.get("/history/{recipient_id}", response_model=List[MessageOut])
-def get_chat_history(
-    recipient_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Получить историю чата с пользователем"""
-    # Проверяем права доступа
-    recipient = db.query(User).filter(User.id == recipient_id).first()
+def _check_chat_access(db: Session, current_user: Principal, recipient_id: int):
+    """Проверить, что пользователь может читать переписку с recipient_id"""
+    recipient = user_crud.get_user(db, recipient_id)
     if not recipient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -333,14 +498,78 @@ def get_chat_history(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Вы можете общаться только с вашим психологом"
             )
+
+
+@router.get("/history/{recipient_id}", response_model=MessageHistoryPage)
+def get_chat_history(
+    recipient_id: int,
+    before: Optional[str] = Query(None, description="Курсор: сообщения старше этого"),
+    after: Optional[str] = Query(None, description="Курсор: сообщения новее этого"),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Получить страницу истории чата с пользователем.
+
+    Без курсоров возвращаются последние сообщения. Для прокрутки назад
+    передайте `before=before_cursor`, для новых сообщений - `after=after_cursor`.
+    """
+    if before and after:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Укажите только один из курсоров: before или after"
+        )
+    try:
+        before_position = message_crud.decode_cursor(before) if before else None
+        after_position = message_crud.decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор"
+        )
+    
+    _check_chat_access(db, current_user, recipient_id)
     
-    return message_crud.get_chat_history(db, current_user.id, recipient_id)
+    messages, has_more = message_crud.get_chat_history(
+        db, current_user.id, recipient_id,
+        before=before_position, after=after_position, limit=limit
+    )
+    
+    before_cursor = None
+    if messages and (has_more or after_position is not None):
+        before_cursor = message_crud.encode_cursor(messages[0])
+    after_cursor = message_crud.encode_cursor(messages[-1]) if messages else after
+    
+    return MessageHistoryPage(
+        messages=messages,
+        before_cursor=before_cursor,
+        after_cursor=after_cursor,
+        has_more=has_more
+    )
+
+
+@router.get("/history/{recipient_id}/export")
+def export_chat_history(
+    recipient_id: int,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Выгрузить всю переписку с пользователем потоком (CSV или NDJSON, опционально gzip)"""
+    _check_chat_access(db, current_user, recipient_id)
+    statement, columns = message_crud.export_query(current_user.id, recipient_id)
+    return export_response(
+        statement, columns, format,
+        f"chat_{min(current_user.id, recipient_id)}_{max(current_user.id, recipient_id)}", gzip
+    )
 
 
 @router.get("/unread-count")
 def get_unread_count(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Получить количество непрочитанных сообщений"""
     count = message_crud.get_unread_count(db, current_user.id)
@@ -352,12 +581,12 @@ async def upload_file(
     file: UploadFile = File(...),
     recipient_id: int = Form(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Загрузить файл и отправить как сообщение"""
     
     # Проверяем права доступа
-    recipient = db.query(User).filter(User.id == recipient_id).first()
+    recipient = user_crud.get_user(db, recipient_id)
     if not recipient:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -384,18 +613,4 @@ async def upload_file(
     file_info = await save_upload_file(file, current_user.id)
     
     # Создаём сообщение
-    db_message = Message(
-        content=f"Отправил файл: {file_info['file_name']}",
-        sender_id=current_user.id,
-        recipient_id=recipient_id,
-        file_url=file_info['file_url'],
-        file_name=file_info['file_name'],
-        file_type=file_info['file_type'],
-        file_size=file_info['file_size'],
-        is_read=False
-    )
-    db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
-    
-    return db_message
+    return message_crud.create_file_message(db, current_user.id, recipient_id, file_info)
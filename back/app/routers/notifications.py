@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from typing import Optional
 
 from app.dependencies import get_db, get_current_user
-from app.models.user import User
+from app.principal import Principal
 from app.crud import notification as notification_crud
 from app.schemas.notification import (
     NotificationOut, 
@@ -23,7 +23,7 @@ async def get_notifications(
     limit: int = Query(50, ge=1, le=100),
     unread_only: bool = Query(False),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Получить список уведомлений текущего пользователя"""
     notifications = notification_crud.get_notifications_by_user(
@@ -46,7 +46,7 @@ async def get_notifications(
 @router.get("/unread-count")
 async def get_unread_count(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Получить количество непрочитанных уведомлений"""
     count = notification_crud.get_unread_count(db, current_user.id)
@@ -57,7 +57,7 @@ async def get_unread_count(
 async def get_notification(
     notification_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Получить конкретное уведомление"""
     notification = notification_crud.get_notification_by_id(db, notification_id)
@@ -75,7 +75,7 @@ async def get_notification(
 async def mark_notification_as_read(
     notification_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Отметить уведомление как прочитанное"""
     notification = notification_crud.mark_as_read(
@@ -96,7 +96,7 @@ async def mark_notification_as_read(
 @router.patch("/mark-all-read")
 async def mark_all_notifications_as_read(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Отметить все уведомления как прочитанные"""
     count = notification_crud.mark_all_as_read(db, current_user.id)
@@ -107,7 +107,7 @@ async def mark_all_notifications_as_read(
 async def delete_notification(
     notification_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Удалить уведомление"""
     success = notification_crud.delete_notification(
@@ -128,7 +128,7 @@ async def delete_notification(
 @router.delete("")
 async def delete_read_notifications(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Удалить все прочитанные уведомления"""
     count = notification_crud.delete_all_read(db, current_user.id)
@@ -140,7 +140,7 @@ async def delete_read_notifications(
 async def create_notification(
     notification: NotificationCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Создать уведомление (внутренний API)"""
     # Только для создания уведомлений самому себе или если есть права
@@ -7,9 +7,10 @@ import os
 from pathlib import Path
 from datetime import datetime
 
-from app.models import User, UserRole, Resource
+from app.models import UserRole, Resource
 from app.schemas import ResourceOut, ResourceCreate, ResourceUpdate
 from app.dependencies import get_db, get_current_user
+from app.principal import Principal
 
 router = APIRouter(
     prefix="/resources",
@@ -28,7 +29,7 @@ async def upload_resource(
     tags: Optional[str] = Form(None), # Expecting JSON string
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role != UserRole.PSYCHOLOGIST:
         raise HTTPException(status_code=403, detail="Only psychologists can upload resources")
@@ -74,7 +75,7 @@ async def upload_resource(
 @router.get("/psychologist", response_model=List[ResourceOut])
 def get_my_resources(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role != UserRole.PSYCHOLOGIST:
         raise HTTPException(status_code=403, detail="Only psychologists can view their resources")
@@ -83,7 +84,7 @@ def get_my_resources(
 @router.get("/patient", response_model=List[ResourceOut])
 def get_patient_resources(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role != UserRole.USER:
         raise HTTPException(status_code=403, detail="Only patients can view patient resources")
@@ -100,7 +101,7 @@ def get_patient_resources(
 def download_resource(
     resource_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     resource = db.query(Resource).filter(Resource.id == resource_id).first()
     if not resource:
@@ -131,7 +132,7 @@ def download_resource(
 def delete_resource(
     resource_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     resource = db.query(Resource).filter(Resource.id == resource_id).first()
     if not resource:
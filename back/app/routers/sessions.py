@@ -5,7 +5,8 @@ from datetime import date
 
 from app.database import get_db
 from app.dependencies import get_current_user
-from app.models.user import User, UserRole
+from app.principal import Principal
+from app.models.user import UserRole
 from app.schemas.session import SessionCreate, SessionResponse, SessionUpdate
 from app.crud import session as crud_session
 from app.models.session import SessionStatus
@@ -19,7 +20,7 @@ router = APIRouter(
 def request_session(
     session: SessionCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role != UserRole.USER:
         raise HTTPException(
@@ -33,7 +34,7 @@ def get_my_sessions(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role == UserRole.USER:
         return crud_session.get_patient_sessions(db, current_user.id, skip, limit)
@@ -45,7 +46,7 @@ def update_session_status(
     session_id: int,
     status_update: SessionUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     session = crud_session.get_session(db, session_id)
     if not session:
@@ -69,6 +70,6 @@ def get_slots(
     psychologist_id: int,
     date: date,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     return crud_session.get_psychologist_slots(db, psychologist_id, date)
@@ -4,10 +4,12 @@ from typing import List
 
 from app.models import User
 from app.schemas import UserOut, PatientOut, UserUpdate, PasswordChange, Toggle2FA
-from app.dependencies import get_current_user, get_db
+from app.dependencies import get_current_user, get_current_user_orm, get_db
+from app.principal import Principal, invalidate_principal
 from app.crud import user as user_crud
+from app.database import run_db
 from app.utils.files import save_upload_file
-from app.security import verify_password, get_password_hash
+from app.security import hash_password_async, issue_tokens, verify_password_async
 
 router = APIRouter(
     prefix="/users",
@@ -16,10 +18,10 @@ router = APIRouter(
 
 
 @router.get("/me", response_model=UserOut)
-def read_users_me(current_user: User = Depends(get_current_user)):
+def read_users_me(current_user: Principal = Depends(get_current_user)):
     """
     Возвращает данные текущего авторизованного пользователя.
-    Зависимость get_current_user сама проверяет токен и ищет юзера в БД.
+    Зависимость get_current_user сама проверяет токен и берёт юзера из кэша или БД.
     """
     return current_user
 
@@ -27,20 +29,20 @@ def read_users_me(current_user: User = Depends(get_current_user)):
 @router.get("/my-psychologist", response_model=UserOut | None)
 def get_my_psychologist(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Получить психолога текущего пациента.
     Возвращает null если психолог не назначен.
     """
-    psychologist = user_crud.get_psychologist_by_patient(db, current_user.id)
-    return psychologist
+    # id психолога уже есть в снимке пользователя из токена
+    return user_crud.get_user(db, current_user.linked_psychologist_id)
 
 
 @router.get("/psychologists", response_model=List[UserOut])
 def get_psychologists(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Получить список рекомендуемых психологов.
@@ -53,7 +55,7 @@ def get_psychologists(
 def update_user_me(
     user_update: UserUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_orm)
 ):
     """Обновить профиль текущего пользователя"""
     return user_crud.update_user(db, current_user, user_update)
@@ -63,7 +65,7 @@ def update_user_me(
 async def upload_avatar(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_orm)
 ):
     """Загрузить аватар"""
     file_info = await save_upload_file(file, current_user.id)
@@ -71,6 +73,7 @@ async def upload_avatar(
     # Обновляем URL аватара
     current_user.avatar_url = file_info["file_url"]
     db.commit()
+    invalidate_principal(current_user.id, current_user.email)
     db.refresh(current_user)
     return current_user
 
@@ -78,24 +81,27 @@ async def upload_avatar(
 @router.delete("/me/avatar", response_model=UserOut)
 def delete_avatar(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_orm)
 ):
     """Удалить аватар"""
     current_user.avatar_url = None
     db.commit()
+    invalidate_principal(current_user.id, current_user.email)
     db.refresh(current_user)
     return current_user
 
 
 @router.put("/change-password", response_model=dict)
-def change_password(
+async def change_password(
     password_data: PasswordChange,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Изменить пароль пользователя"""
+    # Обработчик асинхронный (bcrypt - в пуле процессов), поэтому БД - через run_db
+    user = await run_db(user_crud.get_user, current_user.id)
+
     # Проверяем текущий пароль
-    if not verify_password(password_data.current_password, current_user.hashed_password):
+    if user is None or not await verify_password_async(password_data.current_password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Неверный текущий пароль")
     
     # Проверяем длину нового пароля
@@ -103,17 +109,25 @@ def change_password(
         raise HTTPException(status_code=400, detail="Пароль должен содержать минимум 6 символов")
     
     # Обновляем пароль
-    current_user.hashed_password = get_password_hash(password_data.new_password)
-    db.commit()
+    hashed_password = await hash_password_async(password_data.new_password)
+    # Refresh-токены, выданные со старым паролем, больше не принимаются;
+    # этот клиент получает новую пару
+    token_version = await run_db(
+        user_crud.set_password_hash, current_user.id, hashed_password, revoke_tokens=True
+    )
+    invalidate_principal(current_user.id, current_user.email)
     
-    return {"message": "Пароль успешно изменён"}
+    return {
+        "message": "Пароль успешно изменён",
+        **issue_tokens(current_user.id, current_user.role.value, token_version),
+    }
 
 
 @router.put("/toggle-2fa", response_model=dict)
 def toggle_2fa(
     toggle_data: Toggle2FA,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Включить/выключить двухфакторную аутентификацию"""
     # В будущем здесь будет реальная логика 2FA
@@ -1,7 +1,7 @@
 from app.schemas.user import UserCreate, UserOut, UserRole, PatientOut, UserUpdate, PasswordChange, Toggle2FA
-from app.schemas.emotion import EmotionCreate, EmotionOut
-from app.schemas.token import Token, TokenData
-from app.schemas.message import MessageCreate, MessageOut
+from app.schemas.emotion import EmotionCreate, EmotionOut, EmotionStats, EmotionBatchCreate, EmotionBatchOut
+from app.schemas.token import Token, TokenData, RefreshRequest
+from app.schemas.message import MessageCreate, MessageOut, MessageHistoryPage
 from app.schemas.resource import ResourceCreate, ResourceOut, ResourceUpdate
 from app.schemas.notification import (
     NotificationCreate, NotificationOut, NotificationUpdate, 
@@ -10,9 +10,9 @@ from app.schemas.notification import (
 
 __all__ = [
     "UserCreate", "UserOut", "UserRole", "PatientOut", "UserUpdate", "PasswordChange", "Toggle2FA",
-    "EmotionCreate", "EmotionOut",
-    "Token", "TokenData",
-    "MessageCreate", "MessageOut",
+    "EmotionCreate", "EmotionOut", "EmotionStats", "EmotionBatchCreate", "EmotionBatchOut",
+    "Token", "TokenData", "RefreshRequest",
+    "MessageCreate", "MessageOut", "MessageHistoryPage",
     "ResourceCreate", "ResourceOut", "ResourceUpdate",
     "NotificationCreate", "NotificationOut", "NotificationUpdate",
     "NotificationListOut", "NotificationType"
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+from typing import Dict, List, Literal
 
 
 class EmotionCreate(BaseModel):
@@ -18,3 +19,66 @@ class EmotionOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class EmotionBatchItem(EmotionCreate):
+    """Запись, сделанная офлайн: с id и временем клиента"""
+    client_id: str = Field(min_length=1, max_length=64)
+    created_at: datetime | None = None
+
+
+class EmotionBatchCreate(BaseModel):
+    items: List[EmotionBatchItem] = Field(min_length=1, max_length=5000)
+
+
+class EmotionBatchItemResult(BaseModel):
+    client_id: str
+    # created - сохранена, duplicate - уже была, rejected - не принята
+    status: Literal["created", "duplicate", "rejected"]
+    id: int | None = None
+    detail: str | None = None
+
+
+class EmotionBatchOut(BaseModel):
+    created: int
+    duplicates: int
+    rejected: int
+    results: List[EmotionBatchItemResult]
+
+
+class EmotionStatsBucket(BaseModel):
+    """Агрегаты эмоций за один день/неделю/месяц"""
+    bucket_start: date
+    count: int
+    mean_intensity: float | None
+    std_intensity: float | None
+    min_intensity: int | None
+    max_intensity: int | None
+    emotion_types: Dict[str, int]
+
+
+class CohortPatientTrend(BaseModel):
+    patient_id: int
+    first_name: str
+    last_name: str
+    entries: int
+    weekly_means: List[float | None]
+    rolling_means: List[float | None]
+    week_over_week_delta: float | None
+    # 1 - самое сильное снижение; None - нет данных за две последние недели
+    rank: int | None
+
+
+class CohortAnalytics(BaseModel):
+    """Недельная динамика интенсивности по всем пациентам психолога"""
+    weeks: List[date]
+    window: int
+    cohort_weekly_means: List[float | None]
+    patients: List[CohortPatientTrend]
+
+
+class EmotionStats(BaseModel):
+    bucket: str
+    date_from: date
+    date_to: date
+    buckets: List[EmotionStatsBucket]
@@ -14,6 +14,9 @@ class MessageOut(BaseModel):
     recipient_id: int
     timestamp: datetime
     is_read: bool
+    seq: int | None = None
+    delivered_at: datetime | None = None
+    read_at: datetime | None = None
     file_url: str | None = None
     file_name: str | None = None
     file_type: str | None = None
@@ -21,3 +24,13 @@ class MessageOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class MessageHistoryPage(BaseModel):
+    """Страница истории чата с курсорами для догрузки"""
+    messages: list[MessageOut]
+    # Курсор для более старых сообщений (None - это начало переписки)
+    before_cursor: str | None = None
+    # Курсор для более новых сообщений (для догрузки после последнего)
+    after_cursor: str | None = None
+    has_more: bool = False
@@ -5,6 +5,12 @@ class Token(BaseModel):
     """Описание того, что сервер возвращает при успешном входе"""
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+
+
+class RefreshRequest(BaseModel):
+    """Тело /auth/refresh и /auth/logout"""
+    refresh_token: str
 
 
 class TokenData(BaseModel):
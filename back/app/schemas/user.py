@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, field_serializer
 from enum import Enum
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from typing import Optional
 
@@ -82,3 +82,25 @@ class PatientEnhancedOut(PatientOut):
     unread_messages_count: int = 0
     new_entries_count: int = 0
     has_new_activity: bool = False
+
+
+class PatientActivity(BaseModel):
+    patient_id: int
+    unread_messages_count: int = 0
+    new_entries_count: int = 0
+
+
+class ActivitySummary(BaseModel):
+    """Сводка новой активности пациентов психолога"""
+    unread_messages_count: int
+    new_entries_count: int
+    patients_with_activity: int
+    patients: List[PatientActivity]
+
+
+class PatientPage(BaseModel):
+    """Страница пациентов психолога с общим количеством для пагинации"""
+    patients: List[PatientEnhancedOut]
+    total: int
+    page: int
+    per_page: int
@@ -0,0 +1,173 @@
+"""
+Нечёткий поиск пользователей по имени, фамилии и email.
+
+- Postgres: триграммы pg_trgm. GIN-индексы (gin_trgm_ops) из миграции
+  add_user_search_trgm обслуживают и ILIKE '%term%', и оператор схожести `%`;
+  ранжирование - по similarity().
+- SQLite/dev: n-граммный индекс в памяти процесса с той же метрикой
+  (доля общих триграмм); в SQL передаются только найденные id из scope
+  (не больше MAX_MATCHES), короткие запросы - обычный ILIKE.
+
+Обе реализации возвращают условие для WHERE и выражение ранга, поэтому
+запрос, в который встраивается поиск, от бэкенда не зависит.
+"""
+import heapq
+import re
+import threading
+from operator import itemgetter
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import Select, case, false, func, literal, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ColumnElement
+
+from app.models import User
+
+# Порог схожести, как pg_trgm.similarity_threshold по умолчанию
+SIMILARITY_THRESHOLD = 0.3
+
+# Сколько лучших совпадений n-граммного поиска попадает в IN (...) запроса
+MAX_MATCHES = 500
+
+SEARCH_COLUMNS = (User.first_name, User.last_name, User.email)
+
+_WORD = re.compile(r"\w+")
+
+
+def trigrams(text: str) -> Set[str]:
+    """Триграммы строки по правилам pg_trgm: слова в нижнем регистре, дополненные пробелами."""
+    result = set()
+    for word in _WORD.findall((text or "").lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(left: Set[str], right: Set[str]) -> float:
+    """Схожесть наборов триграмм (как similarity() в pg_trgm)."""
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class SearchBackend:
+    """Поиск: условие WHERE и ранг для запроса по User."""
+
+    def match(
+        self, db: Session, term: str, scope: Optional[Select] = None
+    ) -> Tuple[ColumnElement, ColumnElement]:
+        """
+        Условие и ранг для поиска term.
+
+        scope - SELECT id пользователей, среди которых ищет запрос (он же
+        фильтрует и сам запрос); бэкенд может сузить им свои кандидаты.
+        """
+        raise NotImplementedError
+
+    def index_user(self, user: User):
+        """Учесть нового или изменённого пользователя."""
+
+
+class TrigramSearch(SearchBackend):
+    """pg_trgm: всё считается в Postgres по GIN-индексам."""
+
+    def match(self, db, term, scope=None):
+        pattern = f"%{term}%"
+        condition = or_(*(
+            clause
+            for column in SEARCH_COLUMNS
+            for clause in (column.ilike(pattern), column.op("%")(term))
+        ))
+        rank = func.greatest(*(func.similarity(column, term) for column in SEARCH_COLUMNS))
+        return condition, rank
+
+
+class NgramSearch(SearchBackend):
+    """
+    N-граммный индекс в памяти процесса (SQLite, dev).
+
+    Строится из БД при первом поиске; create_user / update_user обновляют
+    записи. Индекс не разделяется между воркерами - только для dev.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = False
+        # id -> (строки полей в нижнем регистре, триграммы каждого поля)
+        self._docs: Dict[int, Tuple[Tuple[str, ...], Tuple[Set[str], ...]]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+
+    def _add(self, user_id: int, fields: Iterable[Optional[str]]):
+        self._remove(user_id)
+        texts = tuple((value or "").lower() for value in fields)
+        grams = tuple(trigrams(text) for text in texts)
+        self._docs[user_id] = (texts, grams)
+        for gram in set().union(*grams):
+            self._postings.setdefault(gram, set()).add(user_id)
+
+    def _remove(self, user_id: int):
+        doc = self._docs.pop(user_id, None)
+        if doc is None:
+            return
+        for gram in set().union(*doc[1]):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(user_id)
+                if not postings:
+                    del self._postings[gram]
+
+    def _ensure_built(self, db: Session):
+        if self._built:
+            return
+        for user_id, *fields in db.query(User.id, *SEARCH_COLUMNS):
+            self._add(user_id, fields)
+        self._built = True
+
+    def index_user(self, user: User):
+        with self._lock:
+            if self._built:
+                self._add(user.id, (user.first_name, user.last_name, user.email))
+
+    def search(self, db: Session, term: str, user_ids: Optional[Set[int]] = None) -> Dict[int, float]:
+        """Найденные пользователи (среди user_ids, если заданы): id -> ранг, не больше MAX_MATCHES."""
+        needle = term.lower()
+        term_grams = trigrams(term)
+        with self._lock:
+            self._ensure_built(db)
+            candidates = set()
+            for gram in term_grams:
+                candidates |= self._postings.get(gram, set())
+            if user_ids is not None:
+                candidates &= user_ids
+
+            scores = {}
+            for user_id in candidates:
+                texts, grams = self._docs[user_id]
+                rank = max(similarity(term_grams, field_grams) for field_grams in grams)
+                if rank >= SIMILARITY_THRESHOLD or any(needle in text for text in texts):
+                    scores[user_id] = rank
+        if len(scores) > MAX_MATCHES:
+            scores = dict(heapq.nlargest(MAX_MATCHES, scores.items(), key=itemgetter(1)))
+        return scores
+
+    def match(self, db, term, scope=None):
+        if len(term) < 3 or not trigrams(term):
+            # Короткий запрос - только подстрока: ILIKE по уже отфильтрованному запросу
+            pattern = f"%{term}%"
+            return or_(*(column.ilike(pattern) for column in SEARCH_COLUMNS)), literal(0.0)
+        user_ids = set(db.scalars(scope)) if scope is not None else None
+        scores = self.search(db, term, user_ids)
+        if not scores:
+            return false(), literal(0.0)
+        return User.id.in_(scores), case(scores, value=User.id, else_=0.0)
+
+
+_backends: Dict[str, SearchBackend] = {}
+
+
+def get_search_backend(db: Session) -> SearchBackend:
+    """Бэкенд поиска для диалекта БД сессии."""
+    dialect = db.get_bind().dialect.name
+    if dialect not in _backends:
+        _backends[dialect] = TrigramSearch() if dialect == "postgresql" else NgramSearch()
+    return _backends[dialect]
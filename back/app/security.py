@@ -1,14 +1,25 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+import uuid
 import bcrypt
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from jose import jwt
+from types import MappingProxyType
+from typing import Mapping, Optional
+from jose import JWTError, jwt
 
 from app.config import settings
 
 
-def get_password_hash(password: str) -> str:
+def get_password_hash(password: str, rounds: int | None = None) -> str:
     """Хеширование пароля"""
     pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=rounds or settings.BCRYPT_ROUNDS)
     hashed_password = bcrypt.hashpw(pwd_bytes, salt)
     return hashed_password.decode('utf-8')
 
@@ -20,13 +31,157 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(password_byte_enc, hashed_password_byte_enc)
 
 
-def create_access_token(data: dict) -> str:
-    """Создание JWT-токена"""
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Хэш посчитан с другим work factor, чем BCRYPT_ROUNDS"""
+    try:
+        # $2b$<rounds>$<соль и хэш>
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+# bcrypt занимает ядро на сотни мс; в пуле потоков FastAPI такой вызов держит
+# поток, нужный обычным запросам. Отдельный пул процессов по числу ядер
+# ограничивает нагрузку от всплеска логинов и не занимает эти потоки.
+_hash_executor: ProcessPoolExecutor | None = None
+
+
+def _get_hash_executor() -> ProcessPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ProcessPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1,
+            # spawn: процессы не наследуют потоки и соединения приложения
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _hash_executor
+
+
+async def hash_password_async(password: str) -> str:
+    """get_password_hash в пуле процессов, не блокируя event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_hash_executor(), get_password_hash, password, settings.BCRYPT_ROUNDS
+    )
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password в пуле процессов, не блокируя event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_hash_executor(), verify_password, plain_password, hashed_password
+    )
+
+
+def _create_token(data: dict, token_type: str, lifetime: timedelta) -> str:
     to_encode = data.copy()
-    # Устанавливаем время жизни токена
-    expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # Время жизни, тип и уникальный id токена (jti - для отзыва)
+    expire = datetime.now(timezone.utc) + lifetime
+    to_encode.update({"exp": expire, "type": token_type, "jti": str(uuid.uuid4())})
     
     # Кодируем данные с нашим SECRET_KEY
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
+
+
+def create_access_token(data: dict) -> str:
+    """Создание JWT-токена"""
+    return _create_token(data, "access", timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+
+
+def create_refresh_token(data: dict) -> str:
+    """Создание refresh-токена"""
+    return _create_token(data, "refresh", timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS))
+
+
+def issue_tokens(user_id: int, role: str, token_version: int = 0, family: str | None = None) -> dict:
+    """
+    Пара access/refresh-токенов. В refresh-токене: ver - поколение токенов
+    пользователя (см. User.token_version), fam - цепочка ротаций, начатая
+    одним входом (новая, если family не передан)
+    """
+    # sub - id пользователя: get_current_user ищет его по первичному ключу
+    data = {"sub": str(user_id), "role": role}
+    refresh_data = {**data, "ver": token_version, "fam": family or str(uuid.uuid4())}
+    return {
+        "access_token": create_access_token(data),
+        "refresh_token": create_refresh_token(refresh_data),
+        "token_type": "bearer",
+    }
+
+
+class VerifiedTokenCache:
+    """
+    LRU уже проверенных JWT: digest токена -> (exp, payload).
+
+    Клиент шлёт один и тот же access-токен в каждом запросе, поэтому
+    повторная проверка подписи и разбор JSON не нужны: попадание - это хэш
+    строки и поиск в словаре. Запись живёт до exp токена; payload хранится
+    только для чтения. Отзыв проверяется отдельно, на каждом запросе.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        # Сам токен в памяти не держим - только его хэш
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[Mapping]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: bytes, payload: Mapping):
+        exp = payload.get("exp")
+        if self.max_entries <= 0 or not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._entries[key] = (exp, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+
+verified_tokens = VerifiedTokenCache(settings.JWT_CACHE_SIZE)
+
+
+def decode_token(token: str, token_type: str = "access") -> Mapping:
+    """Проверить подпись, срок и тип токена; JWTError, если токен не подходит"""
+    key = verified_tokens.key(token)
+    payload = verified_tokens.get(key)
+    if payload is None:
+        payload = MappingProxyType(
+            jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        )
+        verified_tokens.set(key, payload)
+    # У токенов, выданных до refresh-токенов, типа нет - это access
+    if payload.get("type", "access") != token_type:
+        raise JWTError("Wrong token type")
+    return payload
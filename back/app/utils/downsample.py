@@ -0,0 +1,43 @@
+"""
+Прореживание временных рядов для графиков: Largest-Triangle-Three-Buckets.
+
+Первая и последняя точки сохраняются, остальные делятся на n - 2 корзины;
+из каждой берётся точка, образующая наибольший треугольник с выбранной
+точкой предыдущей корзины и средним следующей. Так пики и провалы
+остаются на графике, в отличие от усреднения.
+"""
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Индексы не более n (n >= 3) точек ряда; x отсортирован по возрастанию"""
+    size = len(x)
+    if n >= size:
+        return np.arange(size)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Границы корзин внутренних точек [1, size - 1)
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    # Среднее каждой корзины и последней точки - вершина C треугольника
+    counts = np.diff(edges)
+    bucket_of = np.repeat(np.arange(n - 2), counts)
+    mean_x = np.bincount(bucket_of, weights=x[1:size - 1], minlength=n - 2) / counts
+    mean_y = np.bincount(bucket_of, weights=y[1:size - 1], minlength=n - 2) / counts
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(n, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = size - 1
+    previous = 0
+    for bucket in range(n - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Удвоенная площадь треугольника (A, точка корзины, C) для всей корзины
+        areas = np.abs(
+            (x[previous] - next_x[bucket]) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y[bucket] - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
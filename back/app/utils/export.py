@@ -0,0 +1,101 @@
+"""
+Потоковая выгрузка истории в CSV / NDJSON.
+
+Строки читаются серверным курсором (yield_per) в собственной сессии и
+сразу пишутся в ответ пачками, поэтому память не зависит от размера
+истории. Сессия запроса (get_db) к моменту отправки тела уже закрыта,
+поэтому генератор открывает свою.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from enum import Enum
+from typing import Iterable, Iterator, Sequence
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+
+from app.database import SessionLocal
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Строк на чтение из курсора и на один кусок ответа
+BATCH_SIZE = 1000
+
+
+def stream_rows(statement: Select) -> Iterator[tuple]:
+    """Строки запроса серверным курсором; сессия живёт, пока идёт выгрузка."""
+    db = SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(yield_per=BATCH_SIZE))
+        for row in result:
+            yield tuple(row)
+    finally:
+        db.close()
+
+
+def _value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def encode_csv(columns: Sequence[str], rows: Iterable[tuple]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_value(value) for value in row])
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def encode_ndjson(columns: Sequence[str], rows: Iterable[tuple]) -> Iterator[bytes]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(
+            {column: _value(value) for column, value in zip(columns, row)},
+            ensure_ascii=False
+        ))
+        if len(lines) == BATCH_SIZE:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Сжать поток кусков в один gzip-поток без буферизации целиком."""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_response(
+    statement: Select,
+    columns: Sequence[str],
+    export_format: str,
+    filename: str,
+    gzip: bool = False
+) -> StreamingResponse:
+    """StreamingResponse с выгрузкой statement в выбранном формате."""
+    encode = encode_csv if export_format == "csv" else encode_ndjson
+    body = encode(columns, stream_rows(statement))
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    if gzip:
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=EXPORT_FORMATS[export_format], headers=headers)
@@ -0,0 +1,239 @@
+"""
+Проверка планов запросов горячих путей.
+
+Вызывает настоящие CRUD-функции, перехватывает их SELECT- и
+UPDATE-запросы и выполняет для каждого EXPLAIN. Если в плане есть последовательное
+чтение проверяемой таблицы (Seq Scan в Postgres, SCAN без индекса в
+SQLite) - проверка падает с кодом 1.
+
+    python -m app.utils.query_plans            # на текущей БД
+    python -m app.utils.query_plans --seed 20000  # сначала наполнить БД
+
+Запускайте на тестовой/dev базе: --seed добавляет синтетические данные,
+а проверка отметки прочтения меняет сообщения.
+"""
+import argparse
+import json
+import random
+import sys
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.database import Base, SessionLocal, engine
+from app.crud import emotion as emotion_crud
+from app.crud import message as message_crud
+from app.crud import notification as notification_crud
+from app.crud import session as session_crud
+from app.models import (
+    ConversationState, Emotion, Message, Notification, NotificationType,
+    Session as SessionModel, SessionStatus, User, UserRole,
+)
+
+CHECKED_TABLES = {"messages", "conversation_state", "emotions", "notifications", "sessions"}
+
+
+def seed(db: Session, rows: int):
+    """Наполнить БД синтетическими данными для реалистичной статистики планировщика"""
+    psychologist = User(
+        first_name="Plan", last_name="Check", email=f"plan-psy-{random.random()}@example.com",
+        hashed_password="-", role=UserRole.PSYCHOLOGIST,
+    )
+    db.add(psychologist)
+    db.flush()
+    patients = [
+        User(
+            first_name="Plan", last_name=str(i), email=f"plan-{i}-{random.random()}@example.com",
+            hashed_password="-", role=UserRole.USER, linked_psychologist_id=psychologist.id,
+        )
+        for i in range(50)
+    ]
+    db.add_all(patients)
+    db.flush()
+
+    now = datetime.utcnow()
+    messages, emotions, notifications, sessions = [], [], [], []
+    # Счётчики seq и непрочитанных по переписке, как их ведёт conversation_state
+    last_seq = {patient.id: 0 for patient in patients}
+    unread = {}
+    for i in range(rows):
+        patient = random.choice(patients)
+        moment = now - timedelta(minutes=i)
+        to_patient = bool(i % 2)
+        sender_id = psychologist.id if to_patient else patient.id
+        recipient_id = patient.id if to_patient else psychologist.id
+        last_seq[patient.id] += 1
+        is_read = i % 20 != 0
+        if not is_read:
+            unread[recipient_id, sender_id] = unread.get((recipient_id, sender_id), 0) + 1
+        messages.append({
+            "content": f"seed {i}",
+            "sender_id": sender_id,
+            "recipient_id": recipient_id,
+            "timestamp": moment,
+            "is_read": is_read,
+            "seq": last_seq[patient.id],
+        })
+        emotions.append({
+            "user_id": patient.id, "emotion_type": "calm",
+            "intensity": random.randint(1, 10), "created_at": moment,
+        })
+        notifications.append({
+            "user_id": patient.id, "title": "seed", "message": "seed",
+            "notification_type": NotificationType.SYSTEM,
+            "is_read": i % 10 != 0, "created_at": moment,
+        })
+        sessions.append({
+            "patient_id": patient.id, "psychologist_id": psychologist.id,
+            "scheduled_date": date.today() + timedelta(days=i % 365),
+            "scheduled_time": time(9 + i % 8), "status": SessionStatus.PENDING,
+        })
+    db.execute(Message.__table__.insert(), messages)
+    db.execute(Emotion.__table__.insert(), emotions)
+    db.execute(Notification.__table__.insert(), notifications)
+    db.execute(SessionModel.__table__.insert(), sessions)
+    conversations = []
+    for patient in patients:
+        low, high = sorted((psychologist.id, patient.id))
+        for user_id, peer_id in ((patient.id, psychologist.id), (psychologist.id, patient.id)):
+            conversations.append({
+                "user_id": user_id,
+                "peer_id": peer_id,
+                "unread_count": unread.get((user_id, peer_id), 0),
+                # Счётчик seq - только в строке (меньший id, больший id)
+                "last_seq": last_seq[patient.id] if (user_id, peer_id) == (low, high) else 0,
+            })
+    db.execute(ConversationState.__table__.insert(), conversations)
+    db.commit()
+
+    # Свежая статистика для планировщика (есть и в Postgres, и в SQLite)
+    db.execute(text("ANALYZE"))
+    db.commit()
+    return psychologist.id, patients[0].id
+
+
+def capture_statements(db: Session, func, *args, **kwargs) -> list:
+    """Выполнить func и вернуть выполненные ею SELECT/UPDATE-запросы с параметрами"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE")):
+            statements.append((statement, parameters))
+
+    # Слушаем engine, а не соединение: func может закоммитить и взять новое
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        func(db, *args, **kwargs)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def sequential_scans(db: Session, statement: str, parameters, planner_default: bool = False) -> list:
+    """Таблицы, которые план читает целиком"""
+    connection = db.connection()
+    if engine.dialect.name == "postgresql":
+        if not planner_default:
+            # На маленькой базе планировщик честно выбирает Seq Scan; с
+            # enable_seqscan = off он остаётся только если подходящего индекса нет.
+            # SET LOCAL действует до конца транзакции и не остаётся на
+            # соединении, которое вернётся в пул
+            connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        plan = connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}", parameters
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        found = []
+        stack = [plan[0]["Plan"]]
+        while stack:
+            node = stack.pop()
+            if node.get("Node Type") == "Seq Scan":
+                found.append(node.get("Relation Name"))
+            stack.extend(node.get("Plans", []))
+        return found
+
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    found = []
+    for row in rows:
+        detail = row[-1]
+        # SQLite: "SCAN messages" - полный проход, "SEARCH ... USING INDEX" - по индексу
+        if detail.startswith("SCAN ") and "USING" not in detail:
+            found.append(detail.split()[1])
+    return found
+
+
+def hot_paths(psychologist_id: int, patient_id: int) -> dict:
+    """Проверяемые горячие пути: имя -> (функция, аргументы)"""
+    return {
+        "message.get_unread_count": (message_crud.get_unread_count, (psychologist_id,)),
+        "message.get_chat_history": (message_crud.get_chat_history, (psychologist_id, patient_id)),
+        "message.get_messages_after_seq": (
+            message_crud.get_messages_after_seq, (psychologist_id, patient_id, 0),
+        ),
+        "message.mark_messages_as_delivered": (
+            message_crud.mark_messages_as_delivered, (patient_id, psychologist_id, 2 ** 31 - 1),
+        ),
+        "message.mark_messages_as_read": (
+            message_crud.mark_messages_as_read, (patient_id, psychologist_id),
+        ),
+        "emotion.get_user_emotions": (emotion_crud.get_user_emotions, (patient_id,)),
+        "notification.get_notifications_by_user": (
+            lambda db, user_id: notification_crud.get_notifications_by_user(db, user_id, unread_only=True),
+            (patient_id,),
+        ),
+        "notification.get_unread_count": (notification_crud.get_unread_count, (patient_id,)),
+        "session.get_psychologist_slots": (
+            session_crud.get_psychologist_slots, (psychologist_id, date.today()),
+        ),
+    }
+
+
+def check(db: Session, psychologist_id: int, patient_id: int, planner_default: bool = False) -> list:
+    """Проверить все горячие пути; вернуть список (путь, таблица) с seq scan"""
+    failures = []
+    for name, (func, args) in hot_paths(psychologist_id, patient_id).items():
+        for statement, parameters in capture_statements(db, func, *args):
+            tables = [
+                t for t in sequential_scans(db, statement, parameters, planner_default)
+                if t in CHECKED_TABLES
+            ]
+            status = "SEQ SCAN: " + ", ".join(tables) if tables else "ok"
+            print(f"{name:45} {status}")
+            failures.extend((name, table) for table in tables)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN-проверка горячих запросов")
+    parser.add_argument("--seed", type=int, default=0, help="добавить N синтетических строк в каждую таблицу")
+    parser.add_argument("--planner-default", action="store_true", help="не отключать seq scan в Postgres")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.seed:
+            psychologist_id, patient_id = seed(db, args.seed)
+        else:
+            patient = db.query(User).filter(User.linked_psychologist_id.isnot(None)).first()
+            if patient is None:
+                print("Нет пациентов с психологом - запустите с --seed")
+                return 1
+            psychologist_id, patient_id = patient.linked_psychologist_id, patient.id
+
+        failures = check(db, psychologist_id, patient_id, args.planner_default)
+        db.rollback()
+    finally:
+        db.close()
+
+    if failures:
+        print(f"\n{len(failures)} sequential scan(s) on hot paths")
+        return 1
+    print("\nAll hot paths use indexes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Микробенчмарк зависимости get_current_user.
+
+Вызывает get_current_user напрямую (без сети и FastAPI) --requests раз с
+--tokens разными access-токенами по кругу - как клиенты, которые шлют свой
+токен в каждом запросе. Кэш пользователей прогрет, поэтому время - это
+проверка JWT и фильтра отзыва.
+
+    python -m benchmarks.auth_dependency --requests 20000 --tokens 100
+    python -m benchmarks.auth_dependency --requests 20000 --tokens 100 --no-jwt-cache
+
+--no-jwt-cache выключает кэш проверенных JWT (как JWT_CACHE_SIZE=0).
+По умолчанию используется SQLite во временной папке.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+
+def seed_user() -> int:
+    from app.database import Base, SessionLocal, engine
+    from app.models import User, UserRole
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(
+            first_name="Bench",
+            last_name="Auth",
+            email=f"auth_{time.time_ns()}@example.com",
+            hashed_password="-",
+            role=UserRole.USER,
+        )
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+async def run(requests: int, tokens: int, jwt_cache: bool):
+    from app.dependencies import get_current_user
+    from app.security import issue_tokens
+    from app.security import verified_tokens
+
+    if not jwt_cache:
+        verified_tokens.max_entries = 0
+    verified_tokens.clear()
+
+    user_id = seed_user()
+    access_tokens = [issue_tokens(user_id, "user")["access_token"] for _ in range(tokens)]
+    latencies = []
+    # Прогрев: кэш пользователя, кэш JWT
+    for token in access_tokens:
+        await get_current_user(token)
+    verified_tokens.hits = verified_tokens.misses = 0
+    for i in range(requests):
+        token = access_tokens[i % tokens]
+        started = time.perf_counter()
+        await get_current_user(token)
+        latencies.append(time.perf_counter() - started)
+
+    latencies.sort()
+    metrics = verified_tokens.get_metrics()
+    print(f"jwt_cache={'on' if jwt_cache else 'off'} requests={requests} tokens={tokens}")
+    print(
+        f"get_current_user mean: {statistics.fmean(latencies) * 1e6:.1f} us  "
+        f"p50: {statistics.median(latencies) * 1e6:.1f} us  "
+        f"p99: {latencies[int(len(latencies) * 0.99) - 1] * 1e6:.1f} us"
+    )
+    print(f"jwt cache hit rate: {metrics['hit_rate']:.4f} ({metrics['hits']} hits, {metrics['misses']} misses)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--no-jwt-cache", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.tokens, not args.no_jwt_cache))
+
+
+if __name__ == "__main__":
+    main()
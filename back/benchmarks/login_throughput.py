@@ -0,0 +1,125 @@
+"""
+Бенчмарк пропускной способности /auth/login.
+
+Вызывает обработчик логина напрямую (без сети) с --concurrency параллельными
+запросами и параллельно меряет задержку короткого вызова в пуле потоков -
+так же выполняются обычные синхронные эндпоинты FastAPI.
+
+    python -m benchmarks.login_throughput --logins 200 --concurrency 32 --mode pool
+    python -m benchmarks.login_throughput --logins 200 --concurrency 32 --mode thread
+    python -m benchmarks.login_throughput --logins 200 --rounds 10
+
+`pool` - текущее поведение (bcrypt в пуле процессов), `thread` - старое
+(bcrypt в пуле потоков). --rounds задаёт BCRYPT_ROUNDS. По умолчанию
+используется SQLite во временной папке.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+PASSWORD = "bench-password"
+
+
+def seed_user(rounds: int) -> str:
+    from app.database import Base, SessionLocal, engine
+    from app.models import User, UserRole
+    from app.security import get_password_hash
+
+    Base.metadata.create_all(bind=engine)
+    email = f"login_{time.time_ns()}@example.com"
+    db = SessionLocal()
+    try:
+        db.add(User(
+            first_name="Bench",
+            last_name="Login",
+            email=email,
+            hashed_password=get_password_hash(PASSWORD, rounds),
+            role=UserRole.USER,
+        ))
+        db.commit()
+    finally:
+        db.close()
+    return email
+
+
+async def probe(latencies: list, stop: asyncio.Event):
+    """Задержка пустого вызова в пуле потоков, пока идут логины"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.to_thread(lambda: None)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+
+
+async def run(logins: int, concurrency: int, mode: str):
+    from fastapi.security import OAuth2PasswordRequestForm
+
+    from app.config import settings
+    from app.routers import auth as auth_router
+    from app.security import verify_password
+
+    if mode == "thread":
+        async def verify_in_thread(plain_password, hashed_password):
+            return await asyncio.to_thread(verify_password, plain_password, hashed_password)
+        auth_router.verify_password_async = verify_in_thread
+
+    email = seed_user(settings.BCRYPT_ROUNDS)
+    form = OAuth2PasswordRequestForm(username=email, password=PASSWORD)
+    # Прогрев: запуск процессов пула
+    await auth_router.login_for_access_token(form)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    login_latencies: list = []
+
+    async def login():
+        async with semaphore:
+            started = time.perf_counter()
+            await auth_router.login_for_access_token(form)
+            login_latencies.append(time.perf_counter() - started)
+
+    probe_latencies: list = []
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(probe_latencies, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+
+    cores = os.cpu_count() or 1
+    workers = settings.PASSWORD_HASH_WORKERS or cores
+    rate = logins / elapsed
+    login_latencies.sort()
+    probe_latencies.sort()
+    print(f"mode={mode} rounds={settings.BCRYPT_ROUNDS} logins={logins} concurrency={concurrency}")
+    print(f"throughput: {rate:.1f} logins/s, {rate / min(workers, cores):.1f} logins/s per core")
+    print(
+        f"login p50: {statistics.median(login_latencies) * 1000:.0f} ms  "
+        f"p99: {login_latencies[int(len(login_latencies) * 0.99) - 1] * 1000:.0f} ms"
+    )
+    print(
+        f"threadpool probe p50: {statistics.median(probe_latencies) * 1000:.1f} ms  "
+        f"max: {probe_latencies[-1] * 1000:.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=None)
+    parser.add_argument("--mode", choices=["pool", "thread"], default="pool")
+    args = parser.parse_args()
+    if args.rounds is not None:
+        os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    asyncio.run(run(args.logins, args.concurrency, args.mode))
+
+
+if __name__ == "__main__":
+    main()
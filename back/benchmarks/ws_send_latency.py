@@ -0,0 +1,220 @@
+"""
+Бенчмарк задержки отправки сообщения через WebSocket-обработчик чата.
+
+Запускает N "сокетов" прямо через websocket_endpoint (без сети) и меряет
+время от получения фрейма `message` до подтверждения отправителю.
+
+    python -m benchmarks.ws_send_latency --sockets 1000 --messages 5 --mode pool
+    python -m benchmarks.ws_send_latency --sockets 1000 --messages 5 --mode inline
+    python -m benchmarks.ws_send_latency --sockets 1000 --messages 5 --mode group
+
+    python -m benchmarks.ws_send_latency --sockets 200 --messages 5 --broker redis
+
+`inline` воспроизводит старое поведение (синхронный коммит прямо в event loop),
+`pool` - текущее (run_db в пуле потоков), `group` - групповой коммит
+(CHAT_GROUP_COMMIT). По умолчанию используется SQLite
+во временной папке; для реальных цифр задайте DATABASE_URL на Postgres.
+
+`--broker redis` - RedisBroker поверх fakeredis (requirements-dev.txt) и
+второй воркер, подписанный на всех получателей: проверяется, что каждое
+сообщение дошло до него через Pub/Sub.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from fastapi import WebSocketDisconnect  # noqa: E402
+
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models import User, UserRole  # noqa: E402
+from app.routers import messages as messages_router  # noqa: E402
+from app.security import issue_tokens  # noqa: E402
+from app.realtime.broker import RedisBroker  # noqa: E402
+from app.realtime.group_commit import GroupCommitWriter  # noqa: E402
+
+
+class BenchWebSocket:
+    """Минимальная замена WebSocket: входящие фреймы берутся из очереди."""
+
+    def __init__(self, user_id: int, latencies: list):
+        self.user_id = user_id
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.pending: dict = {}
+        self.latencies = latencies
+        self.acked = asyncio.Event()
+        self.expected = 0
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000, reason: str = None):
+        pass
+
+    async def receive_text(self) -> str:
+        item = await self.inbox.get()
+        if item is None:
+            raise WebSocketDisconnect()
+        return item
+
+    async def send_json(self, data: dict):
+        if data.get("type") != "message":
+            return
+        message = data["message"]
+        if message["sender_id"] != self.user_id:
+            return
+        started = self.pending.pop(message["content"], None)
+        if started is not None:
+            self.latencies.append(time.perf_counter() - started)
+            self.expected -= 1
+            if self.expected == 0:
+                self.acked.set()
+
+    def send(self, recipient_id: int, content: str):
+        self.pending[content] = time.perf_counter()
+        self.inbox.put_nowait(json.dumps({
+            "type": "message",
+            "content": content,
+            "recipient_id": recipient_id,
+        }))
+
+
+def seed_users(count: int) -> list:
+    """Пары психолог - пациент: писать можно только своему собеседнику"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        users = []
+        for i in range(count):
+            user = User(
+                first_name="Bench",
+                last_name=str(i),
+                email=f"bench{i}_{time.time_ns()}@example.com",
+                hashed_password="-",
+                role=UserRole.PSYCHOLOGIST if i % 2 == 0 else UserRole.USER,
+            )
+            if i % 2:
+                user.psychologist = users[-1]
+            users.append(user)
+        db.add_all(users)
+        db.commit()
+        return [user.id for user in users]
+    finally:
+        db.close()
+
+
+async def start_remote_worker(user_ids: list) -> tuple:
+    """
+    Подключить менеджер к fakeredis и поднять второй "воркер" - RedisBroker,
+    подписанный на всех пользователей. Возвращает (брокер, счётчик фреймов).
+    """
+    import fakeredis
+
+    server = fakeredis.FakeServer()
+
+    def client():
+        return fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+
+    manager = messages_router.manager
+    manager.broker = RedisBroker(client=client())
+    manager.broker.set_handler(manager._deliver_local)
+
+    received = {"message": 0}
+
+    async def count(user_id: int, message: dict):
+        if message.get("type") == "message":
+            received["message"] += 1
+
+    remote = RedisBroker(client=client())
+    remote.set_handler(count)
+    await remote.start()
+    for user_id in user_ids:
+        await remote.subscribe(user_id)
+    return remote, received
+
+
+async def run(sockets: int, messages: int, mode: str, broker: str):
+    if mode == "inline":
+        async def run_inline(func, *args, **kwargs):
+            db = SessionLocal()
+            try:
+                return func(db, *args, **kwargs)
+            finally:
+                db.close()
+        messages_router.run_db = run_inline
+    elif mode == "group":
+        messages_router.message_writer = GroupCommitWriter()
+
+    user_ids = seed_users(sockets + sockets % 2)
+    remote = None
+    if broker == "redis":
+        remote, received = await start_remote_worker(user_ids)
+    latencies: list = []
+    clients = [BenchWebSocket(user_id, latencies) for user_id in user_ids]
+    handlers = [
+        asyncio.create_task(messages_router.websocket_endpoint(
+            client, client.user_id,
+            issue_tokens(client.user_id, "psychologist" if index % 2 == 0 else "user")["access_token"]
+        ))
+        for index, client in enumerate(clients)
+    ]
+    await asyncio.sleep(0.5)
+
+    started = time.perf_counter()
+    for client in clients:
+        client.expected = messages
+    for round_no in range(messages):
+        for index, client in enumerate(clients):
+            peer = clients[index ^ 1].user_id
+            client.send(peer, f"{client.user_id}:{round_no}")
+        await asyncio.sleep(0)
+    await asyncio.gather(*(client.acked.wait() for client in clients))
+    elapsed = time.perf_counter() - started
+
+    for client in clients:
+        client.inbox.put_nowait(None)
+    await asyncio.gather(*handlers, return_exceptions=True)
+
+    if remote is not None:
+        # Подписчик получает опубликованное асинхронно
+        for _ in range(50):
+            if received["message"] >= 2 * len(latencies):
+                break
+            await asyncio.sleep(0.1)
+        await remote.stop()
+        await messages_router.manager.broker.stop()
+
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"mode={mode} broker={broker} sockets={sockets} messages={len(latencies)}")
+    print(f"throughput: {len(latencies) / elapsed:.0f} msg/s")
+    print(f"p50: {p50 * 1000:.1f} ms  p99: {p99 * 1000:.1f} ms  max: {latencies[-1] * 1000:.1f} ms")
+    if remote is not None:
+        # Каждое сообщение публикуется отправителю (эхо) и получателю
+        print(f"remote worker received: {received['message']} of {2 * len(latencies)} frames")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--mode", choices=["pool", "inline", "group"], default="pool")
+    parser.add_argument("--broker", choices=["memory", "redis"], default="memory")
+    args = parser.parse_args()
+    if args.broker == "redis":
+        try:
+            import fakeredis  # noqa: F401
+        except ImportError:
+            parser.exit(1, "--broker redis requires fakeredis: pip install -r requirements-dev.txt\n")
+    asyncio.run(run(args.sockets, args.messages, args.mode, args.broker))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Общие фикстуры тестов: отдельная база, клиент API, пользователи.
+
+    cd back && pip install -r requirements-dev.txt && python -m pytest
+
+По умолчанию база - SQLite во временной папке; TEST_DATABASE_URL задаёт
+другую (например, Postgres в CI для проверки планов запросов).
+"""
+import itertools
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+
+# До импорта app: настройки читают DATABASE_URL при импорте
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/test.db"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.database import SessionLocal, engine  # noqa: E402
+from app.models import User, UserRole  # noqa: E402
+
+_emails = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def client():
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def make_user(db):
+    """Создать пользователя: make_user(UserRole.USER, linked_psychologist_id=...)"""
+    def make(role: UserRole = UserRole.USER, **fields) -> User:
+        user = User(
+            first_name="Test",
+            last_name=str(role.value),
+            email=f"test{next(_emails)}_{os.getpid()}@example.com",
+            hashed_password="-",
+            role=role,
+            **fields,
+        )
+        db.add(user)
+        db.commit()
+        return user
+    return make
+
+
+def auth_headers(user: User) -> dict:
+    """Заголовок с access-токеном пользователя (без логина и bcrypt)"""
+    from app.security import issue_tokens
+
+    token = issue_tokens(user.id, user.role.value)["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@contextmanager
+def capture_queries(pattern: str):
+    """Собрать SQL-запросы, совпавшие с pattern, выполненные внутри блока"""
+    matcher = re.compile(pattern, re.IGNORECASE | re.DOTALL)
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if matcher.search(statement):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
@@ -0,0 +1,37 @@
+"""
+Метрики воркеров отдаются только с X-Metrics-Token, а не по роли
+пользователя: психологом может зарегистрироваться кто угодно.
+"""
+import pytest
+
+from app.config import settings
+from app.models import UserRole
+from tests.conftest import auth_headers
+
+METRICS_PATHS = [
+    "/api/psychologist/activity/metrics",
+    "/api/messages/ws/metrics",
+    "/api/auth/metrics",
+]
+
+
+@pytest.fixture
+def metrics_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "operator-secret")
+    return "operator-secret"
+
+
+@pytest.mark.parametrize("path", METRICS_PATHS)
+def test_metrics_require_operator_token(client, make_user, metrics_token, path):
+    psychologist = make_user(UserRole.PSYCHOLOGIST)
+
+    assert client.get(path, headers=auth_headers(psychologist)).status_code == 403
+    assert client.get(path, headers={"X-Metrics-Token": "wrong"}).status_code == 403
+    assert client.get(path, headers={"X-Metrics-Token": metrics_token}).status_code == 200
+
+
+@pytest.mark.parametrize("path", METRICS_PATHS)
+def test_metrics_disabled_without_token_setting(client, monkeypatch, path):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+
+    assert client.get(path, headers={"X-Metrics-Token": ""}).status_code == 404
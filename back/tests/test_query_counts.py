@@ -0,0 +1,72 @@
+"""
+Не больше одного SELECT по users на запрос.
+
+Снимок пользователя из токена уже в кэше (обычное состояние после
+первого запроса), поэтому считаются только загрузки внутри обработчика:
+получатель, собеседник, пациенты в списке сеансов.
+"""
+from datetime import date, time
+
+import pytest
+
+from app.crud import session as session_crud
+from app.models import Message, UserRole
+from app.schemas.session import SessionCreate
+from tests.conftest import auth_headers, capture_queries
+
+USERS_SELECT = r"^\s*SELECT\b.*\bFROM users\b"
+
+
+@pytest.fixture
+def chat(db, make_user):
+    """Психолог, три его пациента с сеансами и сообщение в переписке"""
+    psychologist = make_user(UserRole.PSYCHOLOGIST)
+    patients = [make_user(UserRole.USER, linked_psychologist_id=psychologist.id) for _ in range(3)]
+    for hour, patient in enumerate(patients, start=10):
+        session_crud.create_session(db, SessionCreate(
+            psychologist_id=psychologist.id, scheduled_date=date.today(), scheduled_time=time(hour)
+        ), patient.id)
+    db.add(Message(sender_id=patients[0].id, recipient_id=psychologist.id, content="hello"))
+    db.commit()
+    return psychologist, patients[0]
+
+
+def send_message(client, psychologist, patient):
+    return client.post("/api/messages/", headers=auth_headers(patient),
+                       json={"recipient_id": psychologist.id, "content": "hi"})
+
+
+def chat_history(client, psychologist, patient):
+    return client.get(f"/api/messages/history/{patient.id}", headers=auth_headers(psychologist))
+
+
+def upload(client, psychologist, patient):
+    return client.post("/api/messages/upload", headers=auth_headers(patient),
+                       data={"recipient_id": str(psychologist.id)},
+                       files={"file": ("note.txt", b"hello", "text/plain")})
+
+
+def psychologist_sessions(client, psychologist, patient):
+    return client.get("/api/sessions/my", headers=auth_headers(psychologist))
+
+
+def patient_sessions(client, psychologist, patient):
+    return client.get("/api/sessions/my", headers=auth_headers(patient))
+
+
+@pytest.mark.parametrize("call", [
+    send_message, chat_history, upload, psychologist_sessions, patient_sessions,
+])
+def test_at_most_one_users_select_per_request(client, chat, call, tmp_path, monkeypatch):
+    psychologist, patient = chat
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "uploads").mkdir()
+    # Прогрев кэша пользователей из токена
+    for user in (psychologist, patient):
+        assert client.get("/api/users/me", headers=auth_headers(user)).status_code == 200
+
+    with capture_queries(USERS_SELECT) as statements:
+        response = call(client, psychologist, patient)
+
+    assert response.status_code == 200, response.text
+    assert len(statements) <= 1, statements
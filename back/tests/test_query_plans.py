@@ -0,0 +1,38 @@
+"""
+Горячие пути читают проверяемые таблицы по индексу, а не целиком.
+
+Те же проверки, что и python -m app.utils.query_plans, по одному тесту
+на путь. На Postgres (TEST_DATABASE_URL) seq scan отключается внутри
+транзакции EXPLAIN; на SQLite смотрится EXPLAIN QUERY PLAN.
+"""
+import pytest
+
+from app.utils import query_plans
+
+SEED_ROWS = 2000
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    from app.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        return query_plans.seed(db, SEED_ROWS)
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("path", list(query_plans.hot_paths(0, 0)))
+def test_hot_path_uses_indexes(seeded, db, path):
+    func, args = query_plans.hot_paths(*seeded)[path]
+    statements = query_plans.capture_statements(db, func, *args)
+    assert statements, "путь не выполнил ни одного запроса"
+
+    for statement, parameters in statements:
+        tables = [
+            table for table in query_plans.sequential_scans(db, statement, parameters)
+            if table in query_plans.CHECKED_TABLES
+        ]
+        assert not tables, f"{statement}\nSEQ SCAN: {', '.join(tables)}"
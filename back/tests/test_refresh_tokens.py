@@ -0,0 +1,46 @@
+"""
+Ротация refresh-токенов: повтор отзывает цепочку, смена пароля - все
+выданные раньше токены.
+"""
+from app.security import get_password_hash, issue_tokens
+
+
+def refresh(client, refresh_token):
+    return client.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+
+
+def test_reused_refresh_token_revokes_family(client, make_user):
+    user = make_user()
+    first = issue_tokens(user.id, user.role.value)["refresh_token"]
+    second = refresh(client, first).json()["refresh_token"]
+
+    # Украденный first предъявлен повторно: отклонён, и цепочка отозвана
+    assert refresh(client, first).status_code == 401
+    assert refresh(client, second).status_code == 401
+
+
+def test_other_families_survive_reuse(client, make_user):
+    user = make_user()
+    stolen = issue_tokens(user.id, user.role.value)["refresh_token"]
+    other = issue_tokens(user.id, user.role.value)["refresh_token"]
+    refresh(client, stolen)
+
+    assert refresh(client, stolen).status_code == 401
+    assert refresh(client, other).status_code == 200
+
+
+def test_password_change_invalidates_refresh_tokens(client, db, make_user):
+    user = make_user()
+    user.hashed_password = get_password_hash("old-password", rounds=4)
+    db.commit()
+    tokens = issue_tokens(user.id, user.role.value)
+
+    response = client.put(
+        "/api/users/change-password",
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+        json={"current_password": "old-password", "new_password": "new-password"},
+    )
+
+    assert response.status_code == 200, response.text
+    assert refresh(client, tokens["refresh_token"]).status_code == 401
+    assert refresh(client, response.json()["refresh_token"]).status_code == 200
@@ -26,13 +26,55 @@ api.interceptors.request.use(
 	},
 )
 
+// Сохранить пару токенов после логина или обновления
+export const saveTokens = tokenData => {
+	localStorage.setItem('token', tokenData.access_token)
+	if (tokenData.refresh_token) {
+		localStorage.setItem('refresh_token', tokenData.refresh_token)
+	}
+}
+
+// Один запрос обновления на все одновременные 401
+let refreshPromise = null
+
+const refreshTokens = () => {
+	if (!refreshPromise) {
+		const refreshToken = localStorage.getItem('refresh_token')
+		refreshPromise = axios
+			.post(`${API_BASE_URL}/auth/refresh`, { refresh_token: refreshToken })
+			.then(response => saveTokens(response.data))
+			.finally(() => {
+				refreshPromise = null
+			})
+	}
+	return refreshPromise
+}
+
 // Interceptor для обработки ответов и ошибок
 api.interceptors.response.use(
 	response => response,
-	error => {
+	async error => {
+		const request = error.config
+		// Access-токен истёк: обновляем по refresh-токену и повторяем запрос
+		if (
+			error.response?.status === 401 &&
+			request &&
+			!request._retried &&
+			!request.url?.startsWith('/auth/') &&
+			localStorage.getItem('refresh_token')
+		) {
+			request._retried = true
+			try {
+				await refreshTokens()
+				return api(request)
+			} catch {
+				// Refresh-токен недействителен - ниже отправляем на логин
+			}
+		}
 		// Если получили 401, удаляем токен и перенаправляем на логин
 		if (error.response?.status === 401) {
 			localStorage.removeItem('token')
+			localStorage.removeItem('refresh_token')
 			localStorage.removeItem('user')
 			window.location.href = '/login'
 		}
@@ -62,6 +104,19 @@ export const authAPI = {
 		return response.data
 	},
 
+	// Выход: отзываем токены на сервере
+	logout: async () => {
+		// Токены читаем сразу: вызывающий код очищает localStorage, не дожидаясь ответа
+		const token = localStorage.getItem('token')
+		const refreshToken = localStorage.getItem('refresh_token')
+		if (!token) return
+		await axios.post(
+			`${API_BASE_URL}/auth/logout`,
+			refreshToken ? { refresh_token: refreshToken } : null,
+			{ headers: { Authorization: `Bearer ${token}` } },
+		)
+	},
+
 	// Получить текущего пользователя
 	getCurrentUser: async () => {
 		const response = await api.get('/users/me')
@@ -166,9 +221,17 @@ export const messagesAPI = {
 		return response.data
 	},
 
-	// Получить историю чата
+	// Получить последние сообщения чата
 	getChatHistory: async recipientId => {
 		const response = await api.get(`/messages/history/${recipientId}`)
+		return response.data.messages
+	},
+
+	// Получить страницу истории по курсору ({ before } - старее, { after } - новее)
+	getChatHistoryPage: async (recipientId, cursor = {}, limit = 50) => {
+		const response = await api.get(`/messages/history/${recipientId}`, {
+			params: { ...cursor, limit },
+		})
 		return response.data
 	},
 
@@ -1,5 +1,5 @@
 import { createContext, useContext, useEffect, useState } from 'react'
-import { authAPI } from '../api/api'
+import { authAPI, saveTokens } from '../api/api'
 
 const AuthContext = createContext(null)
 
@@ -23,6 +23,7 @@ export const AuthProvider = ({ children }) => {
 				} catch (err) {
 					// Токен невалидный, очищаем
 					localStorage.removeItem('token')
+					localStorage.removeItem('refresh_token')
 					localStorage.removeItem('user')
 					setUser(null)
 				}
@@ -42,7 +43,7 @@ export const AuthProvider = ({ children }) => {
 
 			// Затем логинимся для получения токена
 			const tokenData = await authAPI.login(userData.email, userData.password)
-			localStorage.setItem('token', tokenData.access_token)
+			saveTokens(tokenData)
 
 			// Получаем данные пользователя
 			const currentUser = await authAPI.getCurrentUser()
@@ -62,7 +63,7 @@ export const AuthProvider = ({ children }) => {
 		try {
 			setError(null)
 			const tokenData = await authAPI.login(email, password)
-			localStorage.setItem('token', tokenData.access_token)
+			saveTokens(tokenData)
 
 			// Получаем данные пользователя
 			const currentUser = await authAPI.getCurrentUser()
@@ -80,7 +81,10 @@ export const AuthProvider = ({ children }) => {
 
 	// Выход
 	const logout = () => {
+		// Отзыв на сервере не блокирует выход
+		authAPI.logout().catch(() => {})
 		localStorage.removeItem('token')
+		localStorage.removeItem('refresh_token')
 		localStorage.removeItem('user')
 		setUser(null)
 	}
@@ -20,6 +20,8 @@ export const useWebSocket = (userId, options = {}) => {
 	const heartbeatTimerRef = useRef(null)
 	const reconnectTimerRef = useRef(null)
 	const isManualDisconnectRef = useRef(false)
+	// Последний полученный seq по каждому собеседнику (для resume)
+	const lastSeqRef = useRef({})
 
 	const [isConnected, setIsConnected] = useState(false)
 	const [onlineUsers, setOnlineUsers] = useState([])
@@ -83,6 +85,36 @@ export const useWebSocket = (userId, options = {}) => {
 		}, delay)
 	}, [reconnectDelay, maxReconnectAttempts, onError])
 
+	// Учёт seq полученного сообщения; сообщения собеседника подтверждаем ack
+	const trackMessage = useCallback(
+		message => {
+			if (message?.seq == null) return
+			const isOwn = Number(message.sender_id) === Number(userId)
+			const peerId = isOwn ? message.recipient_id : message.sender_id
+			lastSeqRef.current[peerId] = Math.max(
+				lastSeqRef.current[peerId] || 0,
+				message.seq,
+			)
+			if (!isOwn) {
+				wsRef.current?.send(
+					JSON.stringify({ type: 'ack', peer_id: peerId, seq: message.seq }),
+				)
+			}
+		},
+		[userId],
+	)
+
+	// После переподключения запрашиваем пропущенные сообщения
+	const sendResume = useCallback(peerId => {
+		wsRef.current?.send(
+			JSON.stringify({
+				type: 'resume',
+				peer_id: Number(peerId),
+				last_seq: lastSeqRef.current[peerId] || 0,
+			}),
+		)
+	}, [])
+
 	// Обработка входящих сообщений
 	const handleMessage = useCallback(
 		event => {
@@ -110,9 +142,34 @@ export const useWebSocket = (userId, options = {}) => {
 						setOnlineUsers(data.online_users || [])
 						break
 
+					case 'presence':
+						// Дельты присутствия контактов, пакетом за тик
+						setOnlineUsers(prev => {
+							const online = new Set(prev)
+							for (const event of data.events || []) {
+								if (event.type === 'user_online') online.add(event.user_id)
+								else if (event.type === 'user_offline') online.delete(event.user_id)
+							}
+							return [...online]
+						})
+						break
+
+					case 'resume':
+						// Пропущенные сообщения отдаём как обычные
+						for (const message of data.messages || []) {
+							trackMessage(message)
+							onMessage?.({ type: 'message', message })
+						}
+						if (data.has_more) sendResume(data.peer_id)
+						break
+
 					case 'message':
+						trackMessage(data.message)
+						onMessage?.(data)
+						break
+
 					case 'typing':
-					case 'read_receipt':
+					case 'receipt':
 						onMessage?.(data)
 						break
 
@@ -123,7 +180,7 @@ export const useWebSocket = (userId, options = {}) => {
 				console.error('Error parsing WebSocket message:', error)
 			}
 		},
-		[onMessage],
+		[onMessage, trackMessage, sendResume],
 	)
 
 	// Обработка ошибок
@@ -158,7 +215,9 @@ export const useWebSocket = (userId, options = {}) => {
 		if (!userId) return
 
 		isManualDisconnectRef.current = false
-		const wsUrl = url || `ws://localhost:8000/api/messages/ws/${userId}`
+		// Токен читается при каждом подключении: после refresh он уже новый
+		const token = encodeURIComponent(localStorage.getItem('token') || '')
+		const wsUrl = url || `ws://localhost:8000/api/messages/ws/${userId}?token=${token}`
 
 		try {
 			wsRef.current = new WebSocket(wsUrl)
@@ -168,6 +227,7 @@ export const useWebSocket = (userId, options = {}) => {
 				setIsConnected(true)
 				reconnectAttemptsRef.current = 0
 				startHeartbeat()
+				Object.keys(lastSeqRef.current).forEach(sendResume)
 				onConnect?.()
 			}
 
@@ -187,6 +247,7 @@ export const useWebSocket = (userId, options = {}) => {
 		handleError,
 		handleDisconnect,
 		startHeartbeat,
+		sendResume,
 	])
 
 	// Отключение
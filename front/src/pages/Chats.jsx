@@ -46,7 +46,12 @@ const Chats = () => {
 			data => {
 				switch (data.type) {
 					case 'message':
-						setMessages(prev => [...prev, data.message])
+						// После resume сообщение может прийти повторно
+						setMessages(prev =>
+							prev.some(msg => msg.id === data.message.id)
+								? prev
+								: [...prev, data.message],
+						)
 						break
 					case 'typing':
 						if (data.user_id !== user?.id) {
@@ -56,10 +61,16 @@ const Chats = () => {
 							}, 3000)
 						}
 						break
-					case 'read_receipt':
+					case 'receipt':
+						// Квитанция собеседника: доставлено/прочитано до up_to_seq
+						if (data.status !== 'read') break
 						setMessages(prev =>
 							prev.map(msg =>
-								msg.id === data.message_id ? { ...msg, is_read: true } : msg,
+								msg.recipient_id === data.peer_id &&
+								msg.seq != null &&
+								msg.seq <= data.up_to_seq
+									? { ...msg, is_read: true }
+									: msg,
 							),
 						)
 						break
@@ -122,7 +133,8 @@ const Chats = () => {
 	}, [messages])
 
 	const connectWebSocket = () => {
-		const wsUrl = `ws://localhost:8000/api/messages/ws/${user.id}`
+		const token = encodeURIComponent(localStorage.getItem('token') || '')
+		const wsUrl = `ws://localhost:8000/api/messages/ws/${user.id}?token=${token}`
 		ws.current = new WebSocket(wsUrl)
 
 		ws.current.onopen = () => {
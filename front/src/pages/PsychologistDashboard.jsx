@@ -76,8 +76,8 @@ const PsychologistDashboard = () => {
                     sort: sortBy,
                     filter_status: filterStatus === 'all' ? null : filterStatus
                 })
-                // Handle potential array vs response object
-				setPatients(Array.isArray(data.data) ? data.data : data)
+                // Ответ - страница { patients, total, page, per_page }
+				setPatients(data.data.patients)
 			} catch (err) {
 				console.error('Ошибка загрузки пациентов:', err)
                 // Fallback to old API if new one fails (e.g. 404)
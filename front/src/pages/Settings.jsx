@@ -23,7 +23,7 @@ import {
 } from 'lucide-react'
 import { useEffect, useRef, useState } from 'react'
 import { useNavigate } from 'react-router-dom'
-import api from '../api/api'
+import api, { saveTokens } from '../api/api'
 import { useAuth } from '../context/AuthContext'
 
 import ConfirmationModal from '../components/ui/ConfirmationModal'
@@ -285,10 +285,12 @@ const SettingsPage = () => {
 
 		try {
 			setLoading(true)
-			await api.put('/users/change-password', {
+			const response = await api.put('/users/change-password', {
 				current_password: currentPassword,
 				new_password: newPassword,
 			})
+			// Старые refresh-токены отозваны - сохраняем выданную пару
+			saveTokens(response.data)
 			showSuccess('Пароль успешно изменен')
 			setCurrentPassword('')
 			setNewPassword('')